@@ -0,0 +1,78 @@
+"""
+Compares delivery latency and throughput of the in-memory and Mongo channel layers.
+
+    python -m benchmarks.channel_layer --messages 5000 --groups 100 --output channel_layer.json
+
+The Mongo run uses two layer instances so every message takes the cross-process
+path (capped collection + tailer) rather than the local shortcut.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+django.setup()
+
+from channels.layers import InMemoryChannelLayer  # noqa: E402
+from core.channel_layers import MongoChannelLayer  # noqa: E402
+from benchmarks.stats import summarize  # noqa: E402
+
+
+async def run(sender, receiver, messages, groups):
+    channels = [await receiver.new_channel() for _ in range(groups)]
+    for i, channel in enumerate(channels):
+        await receiver.group_add(f'bench_{i}', channel)
+
+    latencies = []
+
+    async def drain(channel, expected):
+        for _ in range(expected):
+            message = await receiver.receive(channel)
+            latencies.append(time.perf_counter() - message['sent_at'])
+
+    per_group = messages // groups
+    consumers = [asyncio.create_task(drain(channel, per_group)) for channel in channels]
+    # Let the Mongo tailer attach before the clock starts
+    await asyncio.sleep(0.5)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        sender.group_send(f'bench_{i % groups}', {'type': 'bench', 'sent_at': time.perf_counter()})
+        for i in range(per_group * groups)
+    ])
+    await asyncio.wait_for(asyncio.gather(*consumers), timeout=120)
+    elapsed = time.perf_counter() - start
+
+    for i, channel in enumerate(channels):
+        await receiver.group_discard(f'bench_{i}', channel)
+    return summarize(latencies, elapsed)
+
+
+async def main(args):
+    capacity = max(args.messages, 100)
+    results = {
+        'messages': args.messages,
+        'groups': args.groups,
+        'in_memory': await run(*[InMemoryChannelLayer(capacity=capacity)] * 2, args.messages, args.groups),
+    }
+    mongo_sender, mongo_receiver = MongoChannelLayer(capacity=capacity), MongoChannelLayer(capacity=capacity)
+    results['mongo'] = await run(mongo_sender, mongo_receiver, args.messages, args.groups)
+    await mongo_receiver.close()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--groups', type=int, default=100)
+    parser.add_argument('--output')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,61 @@
+import http.client
+import json
+import time
+import uuid
+from urllib.parse import urlsplit
+
+
+def encode_multipart(fields, files):
+    # `files` maps field name -> (filename, bytes)
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in (fields or {}).items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class BenchClient:
+    """Minimal keep-alive JSON client; one per worker thread."""
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.prefix = parts.path.rstrip('/')
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.netloc, timeout=timeout)
+
+    def request(self, method, path, body=None, token=None, files=None):
+        """
+        Returns (status, parsed_json_or_None, seconds). With `files` the body
+        fields and files are sent as multipart/form-data.
+        """
+        headers = {'Accept': 'application/json'}
+        payload = None
+        if files:
+            payload, headers['Content-Type'] = encode_multipart(body, files)
+        elif body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+
+        started = time.perf_counter()
+        try:
+            self.connection.request(method, self.prefix + path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+            raw = response.read()
+        except (http.client.HTTPException, OSError):
+            # Server closed the keep-alive connection; reconnect once
+            self.connection.close()
+            self.connection.request(method, self.prefix + path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+            raw = response.read()
+        elapsed = time.perf_counter() - started
+
+        try:
+            data = json.loads(raw) if raw else None
+        except ValueError:
+            data = None
+        return response.status, data, elapsed
@@ -0,0 +1,36 @@
+"""
+Prints the per-scenario change between two benchmarks.run result files.
+
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+
+
+def change(before, after):
+    if not before or after is None:
+        return '     n/a'
+    return f'{(after - before) / before * 100:+7.1f}%'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('before')
+    parser.add_argument('after')
+    args = parser.parse_args()
+
+    with open(args.before) as fh:
+        before = json.load(fh)['scenarios']
+    with open(args.after) as fh:
+        after = json.load(fh)['scenarios']
+
+    print(f"{'scenario':28} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name in sorted(set(before) & set(after)):
+        old, new = before[name], after[name]
+        print(f"{name:28} {change(old['throughput_per_s'], new['throughput_per_s']):>9} "
+              f"{change(old['p50_ms'], new['p50_ms']):>9} {change(old['p95_ms'], new['p95_ms']):>9} "
+              f"{change(old['p99_ms'], new['p99_ms']):>9}")
+
+
+if __name__ == '__main__':
+    main()
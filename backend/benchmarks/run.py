@@ -0,0 +1,192 @@
+"""
+Drives the HTTP API with a fixed mix of scenarios and writes per-endpoint
+throughput and latency percentiles to a JSON file.
+
+    python -m benchmarks.seed --scale medium --drop
+    python manage.py runserver --noreload   # or daphne core.asgi:application
+    python -m benchmarks.run --duration 30 --concurrency 16 --output before.json
+
+Sample ids and accounts are read from the same database the seeder wrote to,
+so run it with the server's MONGO_URI / MONGO_DB_NAME.
+"""
+import argparse
+import datetime
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+
+from benchmarks.client import BenchClient
+from benchmarks.scenarios import SCENARIOS, SCENARIOS_BY_NAME
+from benchmarks.seed import BENCH_PASSWORD
+from benchmarks.stats import summarize
+from users.models import UserModel
+from events.models import EventModel
+
+SAMPLE_EVENTS = 1000
+
+
+class Context:
+    """Ids and logged-in accounts shared by every worker."""
+    def __init__(self, event_ids, participants, organizers):
+        self.event_ids = event_ids
+        self.participants = participants
+        self.organizers = organizers
+
+
+class Worker:
+    def __init__(self, ctx, base_url, index, seed):
+        self.ctx = ctx
+        self.client = BenchClient(base_url)
+        self.rng = random.Random(seed + index)
+        self.participant = ctx.participants[index % len(ctx.participants)]
+        self.organizer = ctx.organizers[index % len(ctx.organizers)]
+        self.results = {}
+
+    def token(self, role):
+        return self.participant['access'] if role == 'participant' else self.organizer['access']
+
+    def run_once(self, scenario):
+        built = scenario.build(self)
+        if built is None:
+            # Set-up found nothing to act on (e.g. no team to join); not a measurement
+            self._result(scenario.name)['skipped'] += 1
+            return
+        method, path, body, token, files = built
+        status, _, seconds = self.client.request(method, path, body, token, files)
+        result = self._result(scenario.name)
+        result['latencies'].append(seconds)
+        result['statuses'][status] = result['statuses'].get(status, 0) + 1
+
+    def _result(self, name):
+        if name not in self.results:
+            self.results[name] = {'latencies': [], 'statuses': {}, 'skipped': 0}
+        return self.results[name]
+
+
+def login(client, email):
+    status, data, _ = client.request('POST', '/auth/login/', {'email': email, 'password': BENCH_PASSWORD})
+    if status != 200:
+        raise SystemExit(f'Could not log in {email} ({status}); was the database seeded with benchmarks.seed?')
+    return {'email': email, 'access': data['access'], 'refresh': data.get('refresh')}
+
+
+def build_context(base_url, accounts):
+    client = BenchClient(base_url)
+    event_ids = [str(e['_id']) for e in EventModel.collection.find({}, {'_id': 1}).limit(SAMPLE_EVENTS)]
+    if not event_ids:
+        raise SystemExit('No events found; seed the database first')
+
+    participants = []
+    for user in UserModel.collection.find({'role': 'participant', 'email': {'$regex': r'@bench\.local$'}},
+                                          {'email': 1}).limit(accounts):
+        participant = login(client, user['email'])
+        participant['id'] = str(user['_id'])
+        participants.append(participant)
+
+    organizers = []
+    for user in UserModel.collection.find({'role': 'organizer', 'email': {'$regex': r'@bench\.local$'}},
+                                          {'email': 1}).limit(accounts):
+        owned = [str(e['_id']) for e in EventModel.collection.find({'organizer': str(user['_id'])}, {'_id': 1}).limit(50)]
+        if owned:
+            organizer = login(client, user['email'])
+            organizer['event_ids'] = owned
+            organizers.append(organizer)
+    if not participants or not organizers:
+        raise SystemExit('Seeded participants and organizers with events are required')
+    return Context(event_ids, participants, organizers)
+
+
+def run_scenario(scenario, workers, duration, iterations):
+    def loop(worker):
+        if iterations:
+            for _ in range(iterations):
+                worker.run_once(scenario)
+            return
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            worker.run_once(scenario)
+
+    threads = [threading.Thread(target=loop, args=(worker,)) for worker in workers]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies, statuses, skipped = [], {}, 0
+    for worker in workers:
+        result = worker.results.pop(scenario.name, None)
+        if not result:
+            continue
+        latencies.extend(result['latencies'])
+        skipped += result['skipped']
+        for code, count in result['statuses'].items():
+            statuses[str(code)] = statuses.get(str(code), 0) + count
+
+    summary = summarize(latencies, elapsed)
+    summary.update({'method': scenario.method, 'statuses': statuses, 'skipped': skipped})
+    return summary
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000/api')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per scenario')
+    parser.add_argument('--iterations', type=int, default=0,
+                        help='Requests per worker per scenario; overrides --duration')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--scenarios', default='', help='Comma separated names; default is all')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='benchmark-results.json')
+    args = parser.parse_args()
+
+    if args.scenarios:
+        unknown = [name for name in args.scenarios.split(',') if name not in SCENARIOS_BY_NAME]
+        if unknown:
+            parser.error(f'Unknown scenarios: {", ".join(unknown)}')
+        selected = [SCENARIOS_BY_NAME[name] for name in args.scenarios.split(',')]
+    else:
+        selected = SCENARIOS
+
+    ctx = build_context(args.base_url, args.concurrency)
+    workers = [Worker(ctx, args.base_url, i, args.seed) for i in range(args.concurrency)]
+
+    results = {}
+    for scenario in selected:
+        results[scenario.name] = run_scenario(scenario, workers, args.duration, args.iterations)
+        summary = results[scenario.name]
+        print(f"{scenario.name:28} {summary['count']:>7} req  {summary['throughput_per_s'] or 0:>8.1f} req/s  "
+              f"p50 {summary['p50_ms'] or 0:>8.1f}  p95 {summary['p95_ms'] or 0:>8.1f}  "
+              f"p99 {summary['p99_ms'] or 0:>8.1f} ms  {summary['statuses']}")
+
+    report = {
+        'meta': {
+            'started_at': datetime.datetime.utcnow().isoformat(),
+            'revision': git_revision(),
+            'base_url': args.base_url,
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'iterations': args.iterations,
+            'seed': args.seed,
+            'python': platform.python_version(),
+        },
+        'scenarios': results,
+    }
+    with open(args.output, 'w') as fh:
+        json.dump(report, fh, indent=2)
+    print(f'Wrote {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+One scenario per route in core/urls.py. Each scenario describes a single
+measured request; `before` runs unmeasured set-up (e.g. registering before a
+cancel) and returns state the path/body builders can use.
+"""
+import itertools
+
+from benchmarks.seed import BENCH_PASSWORD, CATEGORIES, STATUSES, WORDS
+from users.tokens import refresh_token
+
+_unique = itertools.count()
+
+# Rows per roster import; the created event has room for 1000
+ROSTER_ROWS = 200
+
+
+class Scenario:
+    def __init__(self, name, method, path, auth=None, body=None, before=None, files=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.auth = auth
+        self.body = body
+        self.before = before
+        self.files = files
+
+    def build(self, worker):
+        state = self.before(worker) if self.before else None
+        if self.before and state is None:
+            return None
+        path = self.path(worker, state) if callable(self.path) else self.path
+        body = self.body(worker, state) if self.body else None
+        files = self.files(worker, state) if self.files else None
+        token = worker.token(self.auth) if self.auth else None
+        return self.method, path, body, token, files
+
+
+def _event(worker, state=None):
+    return worker.rng.choice(worker.ctx.event_ids)
+
+
+def _own_event(worker, state=None):
+    return worker.rng.choice(worker.organizer['event_ids'])
+
+
+def _new_event_body(worker, state=None):
+    return {
+        'title': f'Bench {worker.rng.choice(WORDS).title()} {next(_unique)}',
+        'description': 'Created by the benchmark suite',
+        'category': worker.rng.choice(CATEGORIES),
+        'date': '2026-06-01',
+        'time': '10:00',
+        'location': 'Online',
+        'max_participants': 1000,
+        'status': 'upcoming',
+    }
+
+
+def _register(worker, state=None):
+    # Unmeasured: make sure the participant holds a registration to act on
+    status, data, _ = worker.client.request('POST', '/registrations/', {'event': _event(worker)},
+                                            worker.token('participant'))
+    return data if status == 201 else None
+
+
+def _refresh_token(worker, state=None):
+    # Unmeasured: refresh tokens are single use, so each request gets a fresh one
+    return refresh_token(worker.participant['id'])
+
+
+def _roster_file(worker, state=None):
+    # New addresses every time, so each import also creates its users
+    batch = next(_unique)
+    rows = ['email,name'] + [f'bench-roster-{batch}-{i}-{worker.rng.random()}@bench.local,Roster {i}'
+                             for i in range(ROSTER_ROWS)]
+    return {'file': ('roster.csv', '\n'.join(rows).encode())}
+
+
+def _created_event(worker):
+    status, data, _ = worker.client.request('POST', '/events/', _new_event_body(worker), worker.token('organizer'))
+    return data if status == 201 else None
+
+
+def _team_to_join(worker):
+    status, data, _ = worker.client.request('GET', f'/teams/event/{_event(worker)}/?limit=20&open=true',
+                                            token=worker.token('participant'))
+    teams = (data or {}).get('results', []) if status == 200 else []
+    return worker.rng.choice(teams) if teams else None
+
+
+def _joined_team(worker):
+    reg = _register(worker)
+    if not reg:
+        return None
+    status, data, _ = worker.client.request('POST', '/teams/', {'event': reg['event'], 'team_name': 'Bench', 'max_size': 4},
+                                            worker.token('participant'))
+    return data if status == 201 else None
+
+
+def _notification(worker):
+    status, data, _ = worker.client.request('GET', '/notifications/', token=worker.token('participant'))
+    notifications = (data or {}).get('results', []) if status == 200 else []
+    return worker.rng.choice(notifications) if notifications else None
+
+
+def _broadcast_job(worker):
+    status, data, _ = worker.client.request('POST', '/notifications/send/',
+                                            {'event_id': _own_event(worker), 'message': 'Bench broadcast'},
+                                            worker.token('organizer'))
+    return data['job'] if status == 202 else None
+
+
+SCENARIOS = [
+    # auth
+    Scenario('auth_register', 'POST', '/auth/register/',
+             body=lambda w, s: {'email': f'bench-new-{next(_unique)}-{w.rng.random()}@bench.local',
+                                'name': 'Bench User', 'password': BENCH_PASSWORD}),
+    Scenario('auth_login', 'POST', '/auth/login/',
+             body=lambda w, s: {'email': w.participant['email'], 'password': BENCH_PASSWORD}),
+    Scenario('auth_refresh', 'POST', '/auth/refresh/', before=_refresh_token,
+             body=lambda w, s: {'refresh': s}),
+    Scenario('auth_logout', 'POST', '/auth/logout/', before=_refresh_token,
+             body=lambda w, s: {'refresh': s}),
+    Scenario('auth_me', 'GET', '/auth/me/', auth='participant'),
+
+    # events
+    Scenario('events_list', 'GET', '/events/'),
+    Scenario('events_list_filtered', 'GET',
+             lambda w, s: f'/events/?category={w.rng.choice(CATEGORIES)}&status={w.rng.choice(STATUSES)}'),
+    Scenario('events_search', 'GET', lambda w, s: f'/events/?search={w.rng.choice(WORDS)}'),
+    Scenario('events_suggest', 'GET', lambda w, s: f'/events/suggest/?q={w.rng.choice(WORDS)[:3]}'),
+    Scenario('events_detail', 'GET', lambda w, s: f'/events/{_event(w)}/'),
+    Scenario('events_my', 'GET', '/events/my-events/', auth='organizer'),
+    Scenario('events_stats', 'GET', '/events/stats/', auth='organizer'),
+    Scenario('events_upcoming', 'GET', '/events/?upcoming=true&status=upcoming'),
+    Scenario('events_create', 'POST', '/events/', auth='organizer', body=_new_event_body),
+    Scenario('events_update', 'PUT', lambda w, s: f'/events/{_own_event(w)}/', auth='organizer',
+             body=lambda w, s: {'location': w.rng.choice(['Online', 'Pune', 'Delhi'])}),
+    Scenario('events_delete', 'DELETE', lambda w, s: f"/events/{s['id']}/", auth='organizer',
+             before=_created_event),
+
+    # registrations
+    Scenario('registrations_register', 'POST', '/registrations/', auth='participant',
+             body=lambda w, s: {'event': _event(w)}),
+    Scenario('registrations_my', 'GET', '/registrations/my/', auth='participant'),
+    Scenario('registrations_event', 'GET', lambda w, s: f'/registrations/event/{_own_event(w)}/', auth='organizer'),
+    Scenario('registrations_import', 'POST', lambda w, s: f"/registrations/event/{s['id']}/import/",
+             auth='organizer', before=_created_event, files=_roster_file),
+    Scenario('registrations_cancel', 'DELETE', lambda w, s: f"/registrations/{s['id']}/", auth='participant',
+             before=_register),
+
+    # teams
+    Scenario('teams_create', 'POST', '/teams/', auth='participant', before=_register,
+             body=lambda w, s: {'event': s['event'], 'team_name': 'Bench Team', 'max_size': 4}),
+    Scenario('teams_event', 'GET', lambda w, s: f'/teams/event/{_event(w)}/', auth='participant'),
+    Scenario('teams_event_open', 'GET', lambda w, s: f'/teams/event/{_event(w)}/?open=true', auth='participant'),
+    Scenario('teams_join', 'POST', lambda w, s: f"/teams/{s['id']}/join/", auth='participant',
+             before=_team_to_join),
+    Scenario('teams_leave', 'DELETE', lambda w, s: f"/teams/{s['id']}/leave/", auth='participant',
+             before=_team_to_join),
+    # dry_run keeps repeated runs measuring the same planning work
+    Scenario('teams_matchmake', 'POST', lambda w, s: f'/teams/event/{_own_event(w)}/matchmake/', auth='organizer',
+             body=lambda w, s: {'team_size': 4, 'dry_run': True}),
+    Scenario('teams_my', 'GET', lambda w, s: f"/teams/my-team/{s['event']}/", auth='participant',
+             before=_joined_team),
+
+    # notifications
+    Scenario('notifications_list', 'GET', '/notifications/', auth='participant'),
+    Scenario('notifications_unread_count', 'GET', '/notifications/unread-count/', auth='participant'),
+    Scenario('notifications_send', 'POST', '/notifications/send/', auth='organizer',
+             body=lambda w, s: {'event_id': _own_event(w), 'message': 'Bench broadcast'}),
+    Scenario('notifications_job_status', 'GET', lambda w, s: f"/notifications/jobs/{s['id']}/", auth='organizer',
+             before=_broadcast_job),
+    Scenario('notifications_read', 'PUT', lambda w, s: f"/notifications/{s['id']}/read/", auth='participant',
+             before=_notification),
+    Scenario('notifications_read_all', 'PUT', '/notifications/read-all/', auth='participant'),
+
+    # ops
+    Scenario('metrics', 'GET', '/metrics/'),
+]
+
+SCENARIOS_BY_NAME = {scenario.name: scenario for scenario in SCENARIOS}
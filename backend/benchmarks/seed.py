@@ -0,0 +1,243 @@
+"""
+Seeds the configured MongoDB (MONGO_URI / MONGO_DB_NAME) with a reproducible,
+realistically shaped dataset for the HTTP benchmarks.
+
+    MONGO_DB_NAME=events_bench python -m benchmarks.seed --scale full --drop
+
+Scales (events / registrations / teams / notifications):
+    full   100k / 1M / 50k / 5M
+    medium  10k / 100k / 5k / 500k
+    small    1k / 10k / 500 / 50k
+
+Every seeded user's password is BENCH_PASSWORD. The same --seed always
+produces the same field values; only the ObjectIds differ between runs.
+"""
+import argparse
+import datetime
+import os
+import random
+import time
+from collections import Counter
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+django.setup()
+
+from bson.objectid import ObjectId  # noqa: E402
+from django.contrib.auth.hashers import make_password  # noqa: E402
+from core.indexes import get_models, ensure_indexes  # noqa: E402
+from events.search import build_prefixes  # noqa: E402
+from users.models import UserModel  # noqa: E402
+from events.models import EventModel  # noqa: E402
+from registrations.models import RegistrationModel  # noqa: E402
+from teams.models import TeamModel  # noqa: E402
+from notifications.models import NotificationModel, NotificationCounterModel, read_expiry  # noqa: E402
+
+BENCH_PASSWORD = 'bench-password'
+BATCH_SIZE = 10000
+
+SCALES = {
+    'full': {'events': 100_000, 'registrations': 1_000_000, 'teams': 50_000, 'notifications': 5_000_000},
+    'medium': {'events': 10_000, 'registrations': 100_000, 'teams': 5_000, 'notifications': 500_000},
+    'small': {'events': 1_000, 'registrations': 10_000, 'teams': 500, 'notifications': 50_000},
+}
+
+CATEGORIES = ['Technology', 'Music', 'Sports', 'Workshop']
+STATUSES = ['upcoming', 'upcoming', 'upcoming', 'ongoing', 'completed']
+CITIES = ['Pune', 'Mumbai', 'Bengaluru', 'Delhi', 'Hyderabad', 'Chennai', 'Kolkata', 'Online']
+WORDS = ['hackathon', 'summit', 'meetup', 'conference', 'festival', 'workshop', 'bootcamp', 'league',
+         'championship', 'concert', 'jam', 'expo', 'sprint', 'masterclass', 'showcase', 'open']
+TOPICS = ['AI', 'Cloud', 'Rock', 'Jazz', 'Football', 'Cricket', 'Design', 'Robotics', 'Web', 'Data',
+          'Security', 'Startup', 'Indie', 'Classical', 'Chess', 'Marathon']
+NOTIFICATION_TYPES = ['info', 'success', 'warning']
+
+BASE_TIME = datetime.datetime(2025, 1, 1)
+
+
+def timestamp(rng, days=365):
+    return (BASE_TIME + datetime.timedelta(seconds=rng.randrange(days * 86400))).isoformat()
+
+
+def build_user(rng, i, role, password_hash):
+    return {
+        '_id': ObjectId(),
+        'email': f'{role}{i}@bench.local',
+        'name': f'{rng.choice(TOPICS)} {role.title()} {i}',
+        'password': password_hash,
+        'role': role,
+        'is_active': True,
+    }
+
+
+def build_event(rng, i, organizer_id):
+    title = f'{rng.choice(TOPICS)} {rng.choice(WORDS).title()} {i}'
+    capacity = rng.choice([50, 100, 200, 500, 1000])
+    start = BASE_TIME + datetime.timedelta(days=rng.randrange(730), hours=rng.randrange(8, 21),
+                                           minutes=rng.choice([0, 30]))
+    event = {
+        '_id': ObjectId(),
+        'title': title,
+        'description': ' '.join(rng.choice(WORDS + TOPICS) for _ in range(rng.randrange(40, 200))),
+        'category': rng.choice(CATEGORIES),
+        'date': start.strftime('%Y-%m-%d'),
+        'time': start.strftime('%H:%M'),
+        'starts_at': start,
+        'location': rng.choice(CITIES),
+        'banner_image': f'https://via.placeholder.com/800x400?text=Event+{i}',
+        'max_participants': str(capacity),
+        'capacity': capacity,
+        'registered_count': 0,
+        'organizer': str(organizer_id),
+        'status': rng.choice(STATUSES),
+        'created_at': timestamp(rng),
+    }
+    event['search_prefixes'] = build_prefixes(event)
+    return event
+
+
+def build_registration(rng, user_id, event, team_id=None):
+    registration = {
+        'user': str(user_id),
+        'event': str(event['_id']),
+        'event_summary': EventModel.summary(event),
+        'status': 'confirmed',
+        'registered_at': timestamp(rng),
+    }
+    if team_id:
+        registration['team'] = str(team_id)
+    return registration
+
+
+def build_team(rng, event, members):
+    return {
+        '_id': ObjectId(),
+        'event': str(event['_id']),
+        'team_name': f'{rng.choice(TOPICS)} {rng.choice(WORDS).title()}s',
+        'leader': members[0],
+        'members': members,
+        'max_size': 4,
+        'member_count': len(members),
+        'open_slots': 4 - len(members),
+        'created_at': timestamp(rng),
+    }
+
+
+def build_notification(rng, user_id):
+    notification = {
+        'user': str(user_id),
+        'message': f'{rng.choice(TOPICS)} {rng.choice(WORDS)} update',
+        'type': rng.choice(NOTIFICATION_TYPES),
+        'is_read': rng.random() < 0.6,
+        'created_at': timestamp(rng),
+    }
+    if notification['is_read']:
+        notification['expire_at'] = read_expiry()
+    return notification
+
+
+class BatchWriter:
+    def __init__(self, collection):
+        self.collection = collection
+        self.buffer = []
+        self.count = 0
+
+    def add(self, doc):
+        self.buffer.append(doc)
+        if len(self.buffer) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.collection.insert_many(self.buffer, ordered=False)
+            self.count += len(self.buffer)
+            self.buffer = []
+
+
+def seed(scale, rng):
+    sizes = SCALES[scale]
+    # One hash for everybody: seeding should not be bound by PBKDF2
+    password_hash = make_password(BENCH_PASSWORD)
+
+    organizers = [build_user(rng, i, 'organizer', password_hash) for i in range(max(10, sizes['events'] // 50))]
+    participants = [build_user(rng, i, 'participant', password_hash)
+                    for i in range(max(100, sizes['registrations'] // 5))]
+    for chunk_start in range(0, len(organizers) + len(participants), BATCH_SIZE):
+        UserModel.collection.insert_many((organizers + participants)[chunk_start:chunk_start + BATCH_SIZE])
+
+    events = [build_event(rng, i, rng.choice(organizers)['_id']) for i in range(sizes['events'])]
+
+    # Spread registrations over events with a long tail: a few very popular events
+    weights = [1.0 / (rank + 1) ** 0.8 for rank in range(len(events))]
+    per_event = [0] * len(events)
+    for index in rng.choices(range(len(events)), weights=weights, k=sizes['registrations']):
+        per_event[index] += 1
+
+    registrations = BatchWriter(RegistrationModel.collection)
+    teams = BatchWriter(TeamModel.collection)
+    teams_left = sizes['teams']
+    for event, wanted in zip(events, per_event):
+        wanted = min(wanted, event['capacity'], len(participants))
+        registrants = [str(u['_id']) for u in rng.sample(participants, wanted)]
+        event['registered_count'] = len(registrants)
+
+        # Team up the first registrants of as many events as the budget allows
+        team_of = {}
+        unteamed = list(registrants)
+        while teams_left and len(unteamed) >= 2 and rng.random() < 0.7:
+            size = rng.randint(2, 4)
+            members, unteamed = unteamed[:size], unteamed[size:]
+            team = build_team(rng, event, members)
+            teams.add(team)
+            team_of.update((member, team['_id']) for member in members)
+            teams_left -= 1
+
+        for user_id in registrants:
+            registrations.add(build_registration(rng, user_id, event, team_of.get(user_id)))
+    registrations.flush()
+    teams.flush()
+
+    for chunk_start in range(0, len(events), BATCH_SIZE):
+        EventModel.collection.insert_many(events[chunk_start:chunk_start + BATCH_SIZE])
+
+    notifications = BatchWriter(NotificationModel.collection)
+    unread = Counter()
+    for _ in range(sizes['notifications']):
+        notification = build_notification(rng, rng.choice(participants)['_id'])
+        notifications.add(notification)
+        if not notification['is_read']:
+            unread[notification['user']] += 1
+    notifications.flush()
+    NotificationCounterModel.set_many(unread)
+
+    return {
+        'users': len(organizers) + len(participants),
+        'events': len(events),
+        'registrations': registrations.count,
+        'teams': teams.count,
+        'notifications': notifications.count,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--drop', action='store_true', help='Empty the collections first')
+    args = parser.parse_args()
+
+    models = get_models()
+    if args.drop:
+        for model in models:
+            model.collection.drop()
+
+    started = time.perf_counter()
+    counts = seed(args.scale, random.Random(args.seed))
+    # Building indexes after the bulk load is much faster than maintaining them during it
+    for model in models:
+        ensure_indexes(model)
+    print(f'Seeded {counts} in {time.perf_counter() - started:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed):
+    """Throughput and latency percentiles (ms) for a list of latencies in seconds."""
+    values = sorted(latencies)
+    return {
+        'count': len(values),
+        'elapsed_s': round(elapsed, 4),
+        'throughput_per_s': round(len(values) / elapsed, 2) if elapsed else None,
+        'p50_ms': round(percentile(values, 50) * 1000, 3) if values else None,
+        'p95_ms': round(percentile(values, 95) * 1000, 3) if values else None,
+        'p99_ms': round(percentile(values, 99) * 1000, 3) if values else None,
+    }
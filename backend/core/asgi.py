@@ -2,11 +2,17 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# The async views share one long-lived loop per worker here (see ASYNC_VIEWS)
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 django_asgi_app = get_asgi_application()
 
 from channels.routing import ProtocolTypeRouter, URLRouter
 from notifications.routing import websocket_urlpatterns
 from channels.auth import AuthMiddlewareStack
+from notifications.jobs import recover_on_startup
+
+# Fail broadcast jobs orphaned by the process this one replaced
+recover_on_startup()
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
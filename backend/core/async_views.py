@@ -0,0 +1,75 @@
+import json
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import JsonResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.permissions import AllowAny
+
+
+class AsyncAPIView(View):
+    """
+    Async counterpart of DRF's APIView for the hot endpoints served under ASGI.
+    Runs our JWT authentication and the usual DRF permission classes, then an
+    async handler that returns JSON. HTTP methods that only the sync DRF view
+    implements are forwarded to `sync_view` in a worker thread, so one URL can
+    mix async reads with the existing sync writes.
+    """
+    permission_classes = [AllowAny]
+    sync_view = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Same as DRF: auth is token based, not cookie based
+        view.csrf_exempt = True
+        return view
+
+    def get_permissions(self):
+        return [permission() for permission in self.permission_classes]
+
+    async def dispatch(self, request, *args, **kwargs):
+        method = request.method.lower()
+        handler = getattr(self, method, None) if method in self.http_method_names else None
+        if handler is None or method == 'options':
+            if self.sync_view is not None:
+                return await self.forward(request, *args, **kwargs)
+            return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+
+        # Helpers shared with the DRF views read request.query_params
+        request.query_params = request.GET
+        try:
+            await self.initial(request)
+            return await handler(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            response = JsonResponse({'detail': str(exc.detail)}, status=exc.status_code)
+            if exc.status_code == 401:
+                # Same challenge DRF sends via authenticate_header
+                response['WWW-Authenticate'] = 'Bearer'
+            return response
+
+    async def initial(self, request):
+        from users.authentication import PyMongoJWTAuthentication
+        # Raises AuthenticationFailed just like the DRF authentication class
+        result = await PyMongoJWTAuthentication().aauthenticate(request)
+        request.user, request.auth = result if result else (AnonymousUser(), None)
+
+        for permission in self.get_permissions():
+            if not permission.has_permission(request, self):
+                if request.auth is None:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied(getattr(permission, 'message', None))
+
+    async def forward(self, request, *args, **kwargs):
+        return await sync_to_async(self.sync_view.as_view())(request, *args, **kwargs)
+
+    def parse_body(self, request):
+        if request.content_type == 'application/json':
+            try:
+                return json.loads(request.body or b'{}')
+            except ValueError:
+                raise exceptions.ParseError()
+        return request.POST.dict()
+
+    def respond(self, data, status=200):
+        return JsonResponse(data, status=status, safe=False)
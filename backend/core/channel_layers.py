@@ -0,0 +1,297 @@
+import asyncio
+import copy
+import datetime
+import logging
+import random
+import string
+import time
+import weakref
+from pymongo import ASCENDING, CursorType
+from pymongo.errors import CollectionInvalid, DuplicateKeyError, OperationFailure
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+from core import metrics
+from core.mongo import get_async_db
+
+logger = logging.getLogger(__name__)
+
+
+def _random_name(length=12):
+    return ''.join(random.choice(string.ascii_letters) for _ in range(length))
+
+
+class _Outbox:
+    # Pending sends for one event loop, written by a single insert_many
+    def __init__(self):
+        self.items = []
+        self.flushing = None
+
+
+class MongoChannelLayer(BaseChannelLayer):
+    """
+    Cross-process channel layer that uses the existing MongoDB deployment as its
+    broker, so realtime messages reach websockets held by any worker.
+
+    Messages for channels owned by this process are delivered straight into
+    local queues. Everything else is written to a capped collection that every
+    process tails with a tailable await cursor. Group membership lives in a
+    TTL-indexed collection; memberships of channels still connected to this
+    process are refreshed every `group_expiry / 4`, so only those left behind
+    by a dead process expire. Sends issued within `flush_interval` of each
+    other are resolved with one group lookup and written with one insert_many.
+    """
+    extensions = ['groups', 'flush']
+
+    def __init__(self, expiry=60, group_expiry=86400, capacity=100, channel_capacity=None,
+                 messages_collection='channel_messages', groups_collection='channel_groups',
+                 collection_size=64 * 1024 * 1024, flush_interval=0.002):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity)
+        self.group_expiry = group_expiry
+        self.messages_collection = messages_collection
+        self.groups_collection = groups_collection
+        self.collection_size = collection_size
+        self.flush_interval = flush_interval
+        # Channel names containing this prefix belong to this process
+        self.client_prefix = _random_name()
+        self._queues = {}
+        self._local_groups = {}
+        self._receive_loop = None
+        self._tailer = None
+        self._refresher = None
+        self._ready = False
+        self._outboxes = weakref.WeakKeyDictionary()
+        self.counters = {'sent_local': 0, 'sent_remote': 0, 'inserts': 0, 'received_remote': 0, 'dropped_full': 0}
+        metrics.register('channel_layer', self.stats)
+
+    def stats(self):
+        return dict(self.counters, local_channels=len(self._queues))
+
+    # Setup
+
+    async def _collections(self):
+        db = get_async_db()
+        messages, groups = db[self.messages_collection], db[self.groups_collection]
+        if not self._ready:
+            try:
+                await db.create_collection(self.messages_collection, capped=True, size=self.collection_size)
+                # Tailable cursors die immediately on an empty capped collection
+                await messages.insert_one({'targets': [], 'expires': 0})
+            except (CollectionInvalid, OperationFailure):
+                pass
+            await groups.create_index([('group', ASCENDING), ('channel', ASCENDING)], unique=True)
+            await groups.create_index('channel')
+            await groups.create_index('expires_at', expireAfterSeconds=0)
+            self._ready = True
+        return messages, groups
+
+    def _bind_loop(self):
+        if self._receive_loop is None:
+            self._receive_loop = asyncio.get_running_loop()
+
+    def _ensure_tailer(self):
+        if self._tailer is None or self._tailer.done():
+            self._tailer = self._receive_loop.create_task(self._tail())
+
+    def _ensure_refresher(self):
+        if self._refresher is None or self._refresher.done():
+            self._refresher = self._receive_loop.create_task(self._refresh_groups())
+
+    def _queue(self, channel):
+        queue = self._queues.get(channel)
+        if queue is None:
+            queue = self._queues[channel] = asyncio.Queue(maxsize=self.get_capacity(channel))
+        return queue
+
+    # Channel API
+
+    async def new_channel(self, prefix='specific.'):
+        self._bind_loop()
+        channel = f'{prefix}{self.client_prefix}!{_random_name()}'
+        # Register now so messages that arrive before the first receive() are kept
+        self._queue(channel)
+        return channel
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        if channel in self._queues:
+            if not self._deliver_local(channel, message):
+                raise ChannelFull(channel)
+            return
+        await self._enqueue('channel', channel, message)
+
+    async def receive(self, channel):
+        self._bind_loop()
+        self._ensure_tailer()
+        while True:
+            expires, message = await self._queue(channel).get()
+            if expires >= time.time():
+                return message
+
+    async def flush(self):
+        _, groups = await self._collections()
+        await groups.delete_many({})
+        self._queues.clear()
+        self._local_groups.clear()
+
+    async def close(self):
+        for task in (self._tailer, self._refresher):
+            if task is not None:
+                task.cancel()
+        self._tailer = self._refresher = None
+
+    # Groups API
+
+    def _group_expires_at(self):
+        return datetime.datetime.utcnow() + datetime.timedelta(seconds=self.group_expiry)
+
+    async def group_add(self, group, channel):
+        _, groups = await self._collections()
+        try:
+            await groups.update_one({'group': group, 'channel': channel},
+                                    {'$set': {'expires_at': self._group_expires_at()}}, upsert=True)
+        except DuplicateKeyError:
+            # Concurrent upsert of the same membership
+            pass
+        if channel in self._queues:
+            self._local_groups.setdefault(channel, set()).add(group)
+            self._ensure_refresher()
+
+    async def group_discard(self, group, channel):
+        _, groups = await self._collections()
+        await groups.delete_one({'group': group, 'channel': channel})
+        remaining = self._local_groups.get(channel)
+        if remaining is not None:
+            remaining.discard(group)
+            # Forget disconnected channels so the queue map does not grow forever
+            if not remaining and self._queues.get(channel) is not None and self._queues[channel].empty():
+                del self._local_groups[channel]
+                del self._queues[channel]
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        await self._enqueue('group', group, message)
+
+    # Delivery
+
+    def _deliver_local(self, channel, message):
+        """Puts a message on a local queue from any thread. Returns False when full."""
+        queue = self._queues.get(channel)
+        if queue is None:
+            return False
+        item = (time.time() + self.expiry, copy.deepcopy(message))
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._receive_loop:
+            if queue.full():
+                self.counters['dropped_full'] += 1
+                return False
+            queue.put_nowait(item)
+        else:
+            # Sent from a worker thread's loop (e.g. async_to_sync); hand over safely
+            self._receive_loop.call_soon_threadsafe(self._put_nowait, queue, item)
+        self.counters['sent_local'] += 1
+        return True
+
+    def _put_nowait(self, queue, item):
+        try:
+            queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.counters['dropped_full'] += 1
+
+    async def _enqueue(self, kind, name, message):
+        loop = asyncio.get_running_loop()
+        outbox = self._outboxes.get(loop)
+        if outbox is None:
+            outbox = self._outboxes[loop] = _Outbox()
+        outbox.items.append((kind, name, message))
+        if outbox.flushing is None:
+            outbox.flushing = loop.create_task(self._flush(outbox))
+        await asyncio.shield(outbox.flushing)
+
+    async def _flush(self, outbox):
+        await asyncio.sleep(self.flush_interval)
+        items, outbox.items = outbox.items, []
+        outbox.flushing = None
+
+        messages, groups = await self._collections()
+        group_names = list({name for kind, name, _ in items if kind == 'group'})
+        members = {}
+        if group_names:
+            now = datetime.datetime.utcnow()
+            cursor = groups.find({'group': {'$in': group_names}, 'expires_at': {'$gt': now}}, {'group': 1, 'channel': 1})
+            async for doc in cursor:
+                members.setdefault(doc['group'], []).append(doc['channel'])
+
+        docs = []
+        expires = time.time() + self.expiry
+        for kind, name, message in items:
+            targets = members.get(name, []) if kind == 'group' else [name]
+            remote = []
+            for channel in targets:
+                if channel in self._queues:
+                    # group_send drops silently when a local channel is full
+                    self._deliver_local(channel, message)
+                else:
+                    remote.append(channel)
+            if remote:
+                docs.append({'targets': remote, 'message': message, 'expires': expires})
+                self.counters['sent_remote'] += len(remote)
+
+        if docs:
+            await messages.insert_many(docs)
+            self.counters['inserts'] += 1
+
+    async def _tail(self):
+        messages, _ = await self._collections()
+        # Only deliver messages written after this process started listening
+        last = await messages.find_one({}, sort=[('$natural', -1)])
+        last_id = last['_id'] if last else None
+        while True:
+            try:
+                # ObjectIds from different workers are not ordered, so resume by
+                # position instead: scan in insertion ($natural) order and skip
+                # up to the last document already seen. If the capped collection
+                # has rotated it out, everything left is new.
+                if last_id is not None and not await messages.find_one({'_id': last_id}, {'_id': 1}):
+                    last_id = None
+                skipping = last_id is not None
+                cursor = messages.find({}, cursor_type=CursorType.TAILABLE_AWAIT, sort=[('$natural', ASCENDING)])
+                while cursor.alive:
+                    async for doc in cursor:
+                        if skipping:
+                            skipping = doc['_id'] != last_id
+                            continue
+                        last_id = doc['_id']
+                        self._dispatch(doc)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Channel layer tailer failed, restarting')
+                await asyncio.sleep(1)
+
+    async def _refresh_groups(self):
+        # A websocket can stay connected for longer than group_expiry; without
+        # this its memberships would lapse and group messages stop arriving
+        while True:
+            await asyncio.sleep(self.group_expiry / 4)
+            channels = [channel for channel, names in self._local_groups.items() if names]
+            if not channels:
+                continue
+            try:
+                _, groups = await self._collections()
+                await groups.update_many({'channel': {'$in': channels}},
+                                         {'$set': {'expires_at': self._group_expires_at()}})
+            except Exception:
+                logger.exception('Refreshing channel group memberships failed')
+
+    def _dispatch(self, doc):
+        if doc.get('expires', 0) < time.time():
+            return
+        for channel in doc.get('targets', []):
+            queue = self._queues.get(channel)
+            if queue is None:
+                continue
+            self.counters['received_remote'] += 1
+            self._put_nowait(queue, (doc['expires'], copy.deepcopy(doc['message'])))
@@ -0,0 +1,36 @@
+class InvalidFields(ValueError):
+    pass
+
+
+def get_fields_param(request, allowed, default):
+    """
+    Reads the sparse fieldset from `?fields=a,b,c`. Returns the requested names
+    in `allowed` order (so responses keep a stable shape), or `default` when the
+    parameter is absent. `id` is always included. Raises InvalidFields.
+    """
+    raw = request.query_params.get('fields')
+    if not raw:
+        return tuple(default)
+    requested = {name.strip() for name in raw.split(',') if name.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise InvalidFields(f'Unknown fields: {", ".join(sorted(unknown))}')
+    requested.add('id')
+    return tuple(name for name in allowed if name in requested)
+
+
+def fields_projection(fields, stored_as=None):
+    """
+    Mongo projection holding just the stored fields behind serialized `fields`
+    (None for the whole document). `stored_as` maps serialized names that are
+    not stored under the same key to one stored name or a tuple of them.
+    """
+    if fields is None:
+        return None
+    stored_as = stored_as or {}
+    projection = {}
+    for field in fields:
+        stored = stored_as.get(field, field)
+        for name in (stored,) if isinstance(stored, str) else stored:
+            projection[name] = 1
+    return projection
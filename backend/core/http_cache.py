@@ -0,0 +1,128 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from core import metrics
+from core.versions import CollectionVersionModel
+
+
+class ResponseCache:
+    """
+    LRU cache of rendered JSON bodies bounded by total bytes. Keys embed the
+    collection versions, so invalidation is implicit: after a write the old
+    entries are never looked up again and age out.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, body, etag):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.bytes -= len(previous[0])
+            self._data[key] = (body, etag)
+            self.bytes += len(body)
+            while self.bytes > self.max_bytes:
+                _, (old_body, _) = self._data.popitem(last=False)
+                self.bytes -= len(old_body)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE['MAX_BYTES'])
+metrics.register('response_cache', response_cache.stats)
+
+
+def _cache_key(request, versions, vary=None):
+    params = sorted((k, v) for k in request.GET for v in request.GET.getlist(k))
+    version_part = ','.join(f'{name}:{versions[name]}' for name in sorted(versions))
+    return f'{request.path}?{params}|{version_part}|{vary or ""}'
+
+
+def _render(data):
+    body = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    return body, '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+
+
+def _respond(request, body, etag):
+    # Strong validator: the body is byte-identical for a given ETag
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, no-cache'
+    return response
+
+
+def _finish(request, key, data, status):
+    if status != 200:
+        return HttpResponse(json.dumps(data, cls=DjangoJSONEncoder), status=status, content_type='application/json')
+    body, etag = _render(data)
+    response_cache.set(key, body, etag)
+    return _respond(request, body, etag)
+
+
+def cached_json_response(request, collections, build, vary=None):
+    """
+    Serves `build()` (returning (data, status)) from the response cache keyed by
+    path, query string and the current versions of `collections`, plus `vary`
+    for responses that also depend on something else (e.g. the current time).
+    Only 200s are cached. Always answers If-None-Match revalidation with a 304
+    when it can.
+    """
+    key = _cache_key(request, CollectionVersionModel.get_many(collections), vary)
+    entry = response_cache.get(key)
+    if entry is not None:
+        return _respond(request, *entry)
+    data, status = build()
+    return _finish(request, key, data, status)
+
+
+async def acached_json_response(request, collections, build, vary=None):
+    """`cached_json_response` for async views; `build` is a coroutine function."""
+    key = _cache_key(request, await CollectionVersionModel.aget_many(collections), vary)
+    entry = response_cache.get(key)
+    if entry is not None:
+        return _respond(request, *entry)
+    data, status = await build()
+    return _finish(request, key, data, status)
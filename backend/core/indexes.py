@@ -0,0 +1,99 @@
+from django.utils.module_loading import import_string
+
+# Every PyMongo model class that declares `indexes` / `query_shapes`
+MODEL_PATHS = [
+    'users.models.UserModel',
+    'users.models.RefreshTokenModel',
+    'events.models.EventModel',
+    'events.models.EventStatsModel',
+    'registrations.models.RegistrationModel',
+    'teams.models.TeamModel',
+    'notifications.models.NotificationModel',
+    'notifications.models.NotificationCounterModel',
+    'notifications.models.NotificationJobModel',
+    'core.versions.CollectionVersionModel',
+]
+
+# Index options that make two indexes with the same keys behave differently
+COMPARED_OPTIONS = ('unique', 'sparse', 'expireAfterSeconds', 'partialFilterExpression')
+
+
+def get_models():
+    return [import_string(path) for path in MODEL_PATHS]
+
+
+def _normalize(spec):
+    key = list(spec['key'].items()) if hasattr(spec['key'], 'items') else list(spec['key'])
+    if any(direction == 'text' for _, direction in key) or any(field == '_fts' for field, _ in key):
+        # Mongo reports text indexes as _fts/_ftsx, so compare the weighted fields instead
+        key = [('$text', sorted((spec.get('weights') or {}).items()))]
+    else:
+        key = [(field, direction if isinstance(direction, str) else int(direction)) for field, direction in key]
+    # `is not` so a TTL of 0 seconds is not mistaken for False
+    options = {opt: spec.get(opt) for opt in COMPARED_OPTIONS
+               if spec.get(opt) is not None and spec.get(opt) is not False}
+    return key, options
+
+
+def index_drift(model):
+    """
+    Compares a model's declared indexes with what exists on its collection.
+    Returns a dict of index names: missing, changed (same name, different
+    definition) and extra (present but not declared).
+    """
+    declared = {index.document['name']: index.document for index in model.indexes}
+    existing = {name: info for name, info in model.collection.index_information().items() if name != '_id_'}
+
+    drift = {'missing': [], 'changed': [], 'extra': []}
+    for name, spec in declared.items():
+        if name not in existing:
+            drift['missing'].append(name)
+        elif _normalize(spec) != _normalize(existing[name]):
+            drift['changed'].append(name)
+    drift['extra'] = [name for name in existing if name not in declared]
+    return drift
+
+
+def ensure_indexes(model, drop_extra=False):
+    """Builds missing indexes, rebuilds changed ones and returns the drift found."""
+    drift = index_drift(model)
+    for name in drift['changed']:
+        model.collection.drop_index(name)
+    to_create = [index for index in model.indexes if index.document['name'] in drift['missing'] + drift['changed']]
+    if to_create:
+        model.collection.create_indexes(to_create)
+    if drop_extra:
+        for name in drift['extra']:
+            model.collection.drop_index(name)
+    return drift
+
+
+def _plan_stages(plan):
+    # explain() output nests input stages differently across server versions,
+    # so walk every dict/list and collect the stage names
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan['stage']
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+def explain_shape(model, shape):
+    cursor = model.collection.find(shape.get('filter', {}))
+    if shape.get('sort'):
+        cursor = cursor.sort(shape['sort'])
+    return cursor.explain()
+
+
+def find_collection_scans(models=None):
+    """Returns (model, shape) pairs whose winning plan contains a COLLSCAN."""
+    offenders = []
+    for model in models or get_models():
+        for shape in getattr(model, 'query_shapes', []):
+            winning_plan = explain_shape(model, shape).get('queryPlanner', {}).get('winningPlan', {})
+            if 'COLLSCAN' in set(_plan_stages(winning_plan)):
+                offenders.append((model, shape))
+    return offenders
@@ -0,0 +1,95 @@
+import asyncio
+
+
+class DocumentLoader:
+    """
+    Collects document ids referenced by a response and fetches them with a single
+    `$in` query per batch. Results are memoized for the lifetime of the loader,
+    which is normally one request (see `get_loaders`). `projection` limits the
+    fetched fields to what the serializers embed.
+    """
+    def __init__(self, model, projection=None):
+        self.model = model
+        self.projection = projection
+        self._cache = {}
+        self._pending = set()
+
+    def prime(self, ids):
+        for doc_id in ids:
+            if doc_id and str(doc_id) not in self._cache:
+                self._pending.add(str(doc_id))
+        return self
+
+    def seed(self, doc):
+        # Register a document the caller already holds so it is never re-fetched
+        if doc:
+            self._cache[str(doc['_id'])] = doc
+            self._pending.discard(str(doc['_id']))
+        return self
+
+    def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, set()
+        found = self.model.get_many(pending, self.projection)
+        for doc_id in pending:
+            # Cache misses too so a dangling reference is not re-queried
+            self._cache[doc_id] = found.get(doc_id)
+
+    async def aflush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, set()
+        found = await self.model.aget_many(pending, self.projection)
+        for doc_id in pending:
+            self._cache[doc_id] = found.get(doc_id)
+
+    async def aload(self, doc_id):
+        # Async views flush here; the sync load()/load_many() then hit the cache
+        if not doc_id:
+            return None
+        self.prime([doc_id])
+        await self.aflush()
+        return self._cache.get(str(doc_id))
+
+    def load(self, doc_id):
+        if not doc_id:
+            return None
+        self.prime([doc_id])
+        self.flush()
+        return self._cache.get(str(doc_id))
+
+    def load_many(self, ids):
+        ids = [str(i) for i in ids if i]
+        self.prime(ids)
+        self.flush()
+        return [self._cache[i] for i in ids if self._cache.get(i)]
+
+
+class RequestLoaders:
+    def __init__(self):
+        # Imported lazily to keep core free of app imports at module load
+        from users.models import UserModel
+        from events.models import EventModel
+        self.users = DocumentLoader(UserModel, UserModel.reference_projection)
+        self.events = DocumentLoader(EventModel, EventModel.reference_projection)
+
+    async def aflush(self):
+        await asyncio.gather(self.users.aflush(), self.events.aflush())
+
+
+def get_loaders(request=None):
+    """
+    Returns the loaders bound to `request`, creating them on first use.
+    Without a request a fresh, unshared set is returned.
+    """
+    if request is None:
+        return RequestLoaders()
+    # DRF wraps the Django request; store on the underlying one so the cache
+    # survives across both wrappers
+    target = getattr(request, '_request', request)
+    loaders = getattr(target, '_mongo_loaders', None)
+    if loaders is None:
+        loaders = RequestLoaders()
+        target._mongo_loaders = loaders
+    return loaders
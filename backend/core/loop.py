@@ -0,0 +1,35 @@
+import asyncio
+import os
+import threading
+
+
+class BackgroundLoop:
+    """
+    One long-lived event loop on a daemon thread, for async calls made from
+    sync code (the notification fan-out pool, WSGI workers, management
+    commands). async_to_sync would start a fresh loop for every call, and
+    with it a fresh AsyncMongoClient (core/mongo.py keeps one per loop) that
+    is never closed. A process forked from the owner starts its own loop.
+    """
+    def __init__(self, name='background-loop'):
+        self.name = name
+        self._lock = threading.Lock()
+        self._loop = None
+        self._pid = None
+
+    def get_loop(self):
+        pid = os.getpid()
+        if self._loop is None or self._pid != pid:
+            with self._lock:
+                if self._loop is None or self._pid != pid:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name=self.name, daemon=True).start()
+                    self._loop, self._pid = loop, pid
+        return self._loop
+
+    def run(self, coro, timeout=None):
+        """Runs `coro` on the shared loop and blocks the calling thread for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.get_loop()).result(timeout)
+
+
+background_loop = BackgroundLoop()
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from core.indexes import find_collection_scans
+
+
+class Command(BaseCommand):
+    help = "Runs explain() on every declared model query shape and fails on COLLSCAN plans"
+
+    def handle(self, *args, **options):
+        offenders = find_collection_scans()
+        for model, shape in offenders:
+            self.stderr.write(self.style.ERROR(f'{model.collection.name}: COLLSCAN for {shape}'))
+        if offenders:
+            raise SystemExit(1)
+        self.stdout.write(self.style.SUCCESS('No collection scans found'))
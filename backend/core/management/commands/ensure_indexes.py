@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from pymongo.errors import OperationFailure
+from core.indexes import get_models, index_drift, ensure_indexes
+
+
+class Command(BaseCommand):
+    help = 'Builds the indexes declared on each PyMongo model and reports drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report drift; exit non-zero if any is found')
+        parser.add_argument('--drop-extra', action='store_true',
+                            help='Drop indexes that exist but are not declared')
+
+    def handle(self, *args, **options):
+        has_drift = False
+        failed = False
+        for model in get_models():
+            collection = model.collection.name
+            try:
+                drift = index_drift(model) if options['check'] else ensure_indexes(model, options['drop_extra'])
+            except OperationFailure as e:
+                # Typically a unique index that existing duplicate documents violate
+                self.stderr.write(self.style.ERROR(f'{collection}: {e}'))
+                failed = True
+                continue
+
+            for kind in ('missing', 'changed', 'extra'):
+                for name in drift[kind]:
+                    has_drift = True
+                    self.stdout.write(f'{collection}: {kind} index {name}')
+            if not any(drift.values()):
+                self.stdout.write(self.style.SUCCESS(f'{collection}: up to date'))
+
+        if failed or (options['check'] and has_drift):
+            raise SystemExit(1)
@@ -0,0 +1,11 @@
+# name -> zero-argument callable returning a JSON-serializable dict. Kept free
+# of DRF imports: users.cache registers here while users.models is importing.
+_providers = {}
+
+
+def register(name, provider):
+    _providers[name] = provider
+
+
+def snapshot():
+    return {name: provider() for name, provider in _providers.items()}
@@ -0,0 +1,50 @@
+import logging
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+from core import metrics
+from core.query_log import capture_queries
+
+logger = logging.getLogger(__name__)
+
+_totals = {'requests': 0, 'queries': 0, 'n_plus_one_requests': 0}
+metrics.register('mongo_queries', lambda: dict(_totals))
+
+
+def _finish(request, response, log):
+    _totals['requests'] += 1
+    _totals['queries'] += log.count
+
+    repeated = log.repeated(settings.QUERY_MONITORING['REPEAT_THRESHOLD'])
+    if repeated:
+        _totals['n_plus_one_requests'] += 1
+        worst = max(repeated, key=repeated.get)
+        logger.warning('Possible N+1 on %s %s: %d queries, %r ran %d times',
+                       request.method, request.path, log.count, worst, repeated[worst])
+
+    if settings.DEBUG:
+        response['X-Mongo-Queries'] = str(log.count)
+        response['X-Mongo-Time-Ms'] = f'{log.duration * 1000:.1f}'
+        if repeated:
+            response['X-Mongo-Repeated-Queries'] = str(max(repeated.values()))
+    return response
+
+
+@sync_and_async_middleware
+def QueryCountMiddleware(get_response):
+    """
+    Counts and times every Mongo command issued while handling a request.
+    Totals go out as X-Mongo-* headers when DEBUG is on, and a request that runs
+    one query shape more than REPEAT_THRESHOLD times is logged as a likely N+1.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            with capture_queries() as log:
+                response = await get_response(request)
+            return _finish(request, response, log)
+    else:
+        def middleware(request):
+            with capture_queries() as log:
+                response = get_response(request)
+            return _finish(request, response, log)
+    return middleware
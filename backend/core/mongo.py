@@ -1,10 +1,142 @@
 import os
-from pymongo import MongoClient
+import asyncio
+import threading
+import weakref
+from bson.objectid import ObjectId
+from pymongo import MongoClient, AsyncMongoClient
+from pymongo.read_preferences import SecondaryPreferred
 from django.conf import settings
+from core.query_log import query_counter
 
-# Initialize PyMongo client
-client = MongoClient(os.environ.get('MONGO_URI', 'mongodb://localhost:27017/'))
-db = client[os.environ.get('MONGO_DB_NAME', 'events_db')]
+
+def _client_options():
+    options = settings.MONGO
+    return {
+        'maxPoolSize': options['MAX_POOL_SIZE'],
+        'minPoolSize': options['MIN_POOL_SIZE'],
+        'maxIdleTimeMS': options['MAX_IDLE_TIME_MS'],
+        'connectTimeoutMS': options['CONNECT_TIMEOUT_MS'],
+        'serverSelectionTimeoutMS': options['SERVER_SELECTION_TIMEOUT_MS'],
+        'socketTimeoutMS': options['SOCKET_TIMEOUT_MS'],
+        # query_counter attributes commands to the current request (core/middleware.py)
+        'event_listeners': [query_counter],
+    }
+
+
+class ClientManager:
+    """
+    Owns this process's MongoClient. Nothing connects until the first query,
+    and a process forked from the one that created the client (gunicorn
+    --preload, multiprocessing) builds its own instead of sharing sockets and
+    monitor threads with its parent.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client = None
+        self._pid = None
+
+    def get_client(self):
+        pid = os.getpid()
+        if self._client is None or self._pid != pid:
+            with self._lock:
+                if self._client is None or self._pid != pid:
+                    # The parent's client is just dropped; closing it here would
+                    # tear down sockets the parent is still using
+                    self._client = MongoClient(settings.MONGO['URI'], connect=False, **_client_options())
+                    self._pid = pid
+        return self._client
+
+    def get_db(self):
+        return self.get_client()[settings.MONGO['DB_NAME']]
+
+    def close(self):
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+
+
+manager = ClientManager()
+
+
+class LazyCollection:
+    """
+    Stands in for a pymongo Collection in model class attributes. `name` is
+    known up front; everything else is looked up on this process's client
+    when first used.
+    """
+    def __init__(self, name):
+        self.name = name
+        self._client = None
+        self._collection = None
+
+    def _resolve(self):
+        client = manager.get_client()
+        if self._client is not client:
+            self._collection = client[settings.MONGO['DB_NAME']][self.name]
+            self._client = client
+        return self._collection
+
+    def __getattr__(self, attr):
+        if attr.startswith('__'):
+            # copy/pickle probe dunders before __init__ has run
+            raise AttributeError(attr)
+        return getattr(self._resolve(), attr)
+
+    def __repr__(self):
+        return f'LazyCollection({self.name!r})'
+
+
+class LazyDatabase:
+    def __getitem__(self, name):
+        return LazyCollection(name)
+
+    def __getattr__(self, attr):
+        return getattr(manager.get_db(), attr)
+
+
+db = LazyDatabase()
+
+# Async clients are bound to the event loop they were created on, so keep one per loop
+_async_clients = weakref.WeakKeyDictionary()
 
 def get_db():
-    return db
+    return manager.get_db()
+
+def to_object_ids(ids):
+    # Silently skips malformed ids, matching get_by_id returning None for them
+    object_ids = []
+    for doc_id in ids:
+        try:
+            object_ids.append(ObjectId(doc_id))
+        except Exception:
+            continue
+    return object_ids
+
+def get_async_db():
+    loop = asyncio.get_running_loop()
+    async_client = _async_clients.get(loop)
+    if async_client is None:
+        async_client = AsyncMongoClient(settings.MONGO['URI'], connect=False, **_client_options())
+        _async_clients[loop] = async_client
+    return async_client[settings.MONGO['DB_NAME']]
+
+def _secondary_reads():
+    if not settings.MONGO['SECONDARY_READS']:
+        return None
+    return SecondaryPreferred(max_staleness=settings.MONGO['MAX_STALENESS_SECONDS'])
+
+def read_collection(collection):
+    """
+    The same collection with reads routed to a secondary no more than
+    MAX_STALENESS_SECONDS behind, when SECONDARY_READS is on. Only for reads
+    that tolerate that lag (team listings, inbox, exports); writes,
+    read-your-own-write lookups and anything cached under a collection
+    version (core/http_cache.py) use the collection itself (primary), so a
+    new version is never filled from a secondary that has not caught up.
+    Works for the sync and the async collections.
+    """
+    read_preference = _secondary_reads()
+    if read_preference is None:
+        return collection
+    return collection.with_options(read_preference=read_preference)
@@ -0,0 +1,108 @@
+import base64
+from bson import json_util
+from django.conf import settings
+
+MAX_PAGE_SIZE = 100
+DEFAULT_SORT = (('_id', -1),)
+
+
+class InvalidPageParams(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    # json_util keeps ObjectId/datetime types intact through the round trip
+    raw = json_util.dumps(values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except Exception:
+        raise InvalidPageParams('Invalid cursor')
+    if not isinstance(values, dict):
+        raise InvalidPageParams('Invalid cursor')
+    return values
+
+
+def check_cursor(after, sort):
+    # A cursor from another sort, or one edited by hand, would otherwise only
+    # fail inside fetch_page; operator documents must never reach the filter
+    for field, _ in sort:
+        if field not in after or isinstance(after[field], (dict, list)):
+            raise InvalidPageParams('Invalid cursor')
+
+
+def get_page_params(request, sort=DEFAULT_SORT):
+    """
+    Reads `?limit=` and `?cursor=` from the request. Returns (limit, after) where
+    `after` is the decoded keyset position or None for the first page. The
+    cursor is checked against `sort`; pass None for non-keyset (offset) cursors.
+    """
+    default = settings.REST_FRAMEWORK.get('PAGE_SIZE', 10)
+    try:
+        limit = int(request.query_params.get('limit', default))
+    except (TypeError, ValueError):
+        raise InvalidPageParams('limit must be an integer')
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    token = request.query_params.get('cursor')
+    after = decode_cursor(token) if token else None
+    if after is not None and sort is not None:
+        check_cursor(after, sort)
+    return limit, after
+
+
+def _keyset_filter(sort, after):
+    # Builds the "strictly after this row" condition for a compound sort, e.g.
+    # (a, -1), (_id, -1) -> {a < x} OR {a == x AND _id < y}
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        if field not in after:
+            raise InvalidPageParams('Invalid cursor')
+        clause = {f: after[f] for f, _ in sort[:i]}
+        clause[field] = {'$gt' if direction > 0 else '$lt': after[field]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {'$or': clauses}
+
+
+def _page_query(filters, after, sort):
+    query = dict(filters or {})
+    if after:
+        keyset = _keyset_filter(sort, after)
+        query = {'$and': [query, keyset]} if query else keyset
+    return query
+
+
+def _finish_page(docs, limit, sort):
+    # One extra row tells us whether another page exists without a count()
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    last = docs[-1]
+    return docs, encode_cursor({field: last.get(field) for field, _ in sort})
+
+
+def fetch_page(collection, filters=None, limit=10, after=None, sort=DEFAULT_SORT, projection=None):
+    """
+    Keyset pagination over `collection`. `sort` must end with `_id` so every row
+    has a unique position. Returns (documents, next_cursor_token_or_None).
+    """
+    sort = list(sort)
+    query = _page_query(filters, after, sort)
+    docs = list(collection.find(query, projection).sort(sort).limit(limit + 1))
+    return _finish_page(docs, limit, sort)
+
+
+async def afetch_page(collection, filters=None, limit=10, after=None, sort=DEFAULT_SORT, projection=None):
+    """`fetch_page` for an async (AsyncMongoClient) collection."""
+    sort = list(sort)
+    query = _page_query(filters, after, sort)
+    docs = await collection.find(query, projection).sort(sort).limit(limit + 1).to_list(None)
+    return _finish_page(docs, limit, sort)
+
+
+def page_response_data(results, next_cursor):
+    return {'next': next_cursor, 'results': results}
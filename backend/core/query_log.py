@@ -0,0 +1,114 @@
+import contextvars
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# The log of the request (or test block) currently running. Contextvars follow
+# async tasks and are copied into sync_to_async threads, so commands issued
+# from either client are attributed to the right request.
+_current_log = contextvars.ContextVar('mongo_query_log', default=None)
+
+# Commands that are driver housekeeping rather than queries issued by our code
+IGNORED_COMMANDS = {'hello', 'ismaster', 'isMaster', 'ping', 'buildInfo', 'endSessions', 'saslStart',
+                    'saslContinue', 'killCursors'}
+
+# Command name -> (key holding the filter, whether it is a list of statements)
+FILTER_KEYS = {
+    'find': ('filter', False),
+    'count': ('query', False),
+    'countDocuments': ('query', False),
+    'distinct': ('query', False),
+    'findAndModify': ('query', False),
+    'update': ('updates', True),
+    'delete': ('deletes', True),
+    'aggregate': ('pipeline', False),
+}
+
+
+def query_shape(value):
+    """Replaces every literal with '?' so queries differing only in values compare equal."""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, dict) for item in value):
+            return [query_shape(item) for item in value]
+        return '?'
+    return '?'
+
+
+def command_shape(event):
+    name = event.command_name
+    collection = event.command.get(name) if name != 'getMore' else event.command.get('collection')
+    key, is_list = FILTER_KEYS.get(name, (None, False))
+    shape = None
+    if key:
+        shape = event.command.get(key)
+        if is_list and shape:
+            # Statement filters live under 'q' in update/delete commands
+            shape = [statement.get('q') for statement in shape]
+        shape = query_shape(shape)
+    return f'{name} {collection} {shape}' if shape is not None else f'{name} {collection}'
+
+
+class QueryLog:
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.commands = []
+        self._pending = {}
+
+    def started(self, command_id, shape):
+        self._pending[command_id] = shape
+        self.count += 1
+        self.shapes[shape] += 1
+        if self.parent is not None:
+            self.parent.started(command_id, shape)
+
+    def finished(self, command_id, duration):
+        shape = self._pending.pop(command_id, None)
+        if shape is not None:
+            self.duration += duration
+            self.commands.append((shape, duration))
+        if self.parent is not None:
+            self.parent.finished(command_id, duration)
+
+    def repeated(self, threshold):
+        """Shapes run more than `threshold` times; getMore batches are not N+1 queries."""
+        return {shape: count for shape, count in self.shapes.items()
+                if count > threshold and not shape.startswith('getMore ')}
+
+
+class QueryCounter(monitoring.CommandListener):
+    """Command listener registered on every client in core.mongo."""
+    def started(self, event):
+        log = _current_log.get()
+        if log is None or event.command_name in IGNORED_COMMANDS:
+            return
+        log.started((event.connection_id, event.request_id), command_shape(event))
+
+    def succeeded(self, event):
+        log = _current_log.get()
+        if log is not None:
+            log.finished((event.connection_id, event.request_id), event.duration_micros / 1e6)
+
+    def failed(self, event):
+        self.succeeded(event)
+
+
+query_counter = QueryCounter()
+
+
+@contextmanager
+def capture_queries():
+    """Counts the Mongo commands issued inside the block, including nested requests."""
+    log = QueryLog(parent=_current_log.get())
+    token = _current_log.set(log)
+    try:
+        yield log
+    finally:
+        _current_log.reset(token)
@@ -28,6 +28,7 @@ INSTALLED_APPS = [
     'channels',
     
     # Local apps
+    'core',
     'users',
     'events',
     'registrations',
@@ -76,6 +77,26 @@ DATABASES = {
 
 # AUTH_USER_MODEL = 'users.User' # Removed as we use custom PyMongo auth
 
+def _optional_int(name):
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+# PyMongo client (core/mongo.py), created lazily once per process. With
+# SECONDARY_READS on, listing/inbox/stats reads may be served by a secondary
+# up to MAX_STALENESS_SECONDS behind (Mongo requires at least 90).
+MONGO = {
+    'URI': os.environ.get('MONGO_URI', 'mongodb://localhost:27017/'),
+    'DB_NAME': os.environ.get('MONGO_DB_NAME', 'events_db'),
+    'MAX_POOL_SIZE': int(os.environ.get('MONGO_MAX_POOL_SIZE', 100)),
+    'MIN_POOL_SIZE': int(os.environ.get('MONGO_MIN_POOL_SIZE', 0)),
+    'MAX_IDLE_TIME_MS': _optional_int('MONGO_MAX_IDLE_TIME_MS'),
+    'CONNECT_TIMEOUT_MS': int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', 5000)),
+    'SERVER_SELECTION_TIMEOUT_MS': int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+    'SOCKET_TIMEOUT_MS': _optional_int('MONGO_SOCKET_TIMEOUT_MS'),
+    'SECONDARY_READS': os.environ.get('MONGO_SECONDARY_READS', 'False') == 'True',
+    'MAX_STALENESS_SECONDS': int(os.environ.get('MONGO_MAX_STALENESS_SECONDS', 90)),
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',},
@@ -96,6 +117,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+# Lets the browser dev tools / frontend read the DEBUG query counters
+CORS_EXPOSE_HEADERS = ['X-Mongo-Queries', 'X-Mongo-Time-Ms', 'X-Mongo-Repeated-Queries']
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
@@ -108,16 +131,98 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+# Lifetimes used by users/tokens.py. Access tokens are checked statelessly, so
+# keep them short; refresh tokens are rotated and revocable (refresh_tokens)
 SIMPLE_JWT = {
-    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
-    'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=int(os.environ.get('ACCESS_TOKEN_MINUTES', 15))),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=int(os.environ.get('REFRESH_TOKEN_DAYS', 7))),
     'AUTH_HEADER_TYPES': ('Bearer',),
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
 }
 
+# Serve the hot endpoints (event list/detail, register, inbox) with the native
+# async views and AsyncMongoClient. On by default only when core/asgi.py is the
+# entry point: under WSGI (and Django's test client) every async request runs on
+# a fresh event loop, which would build and leak an AsyncMongoClient each time.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False') == 'True'
+
+# In-process cache of authenticated principals (see users/cache.py)
+AUTH_PRINCIPAL_CACHE = {
+    'MAX_SIZE': int(os.environ.get('AUTH_PRINCIPAL_CACHE_SIZE', 10000)),
+    'TTL': int(os.environ.get('AUTH_PRINCIPAL_CACHE_TTL', 60)),
+}
+# Build the principal from the token's signed role/name/email claims and skip the
+# users lookup entirely. Role changes then only apply once the token is reissued.
+AUTH_TRUST_TOKEN_CLAIMS = os.environ.get('AUTH_TRUST_TOKEN_CLAIMS', 'False') == 'True'
+
+# Register/login hash passwords in a bounded pool (users/hashing.py). Once
+# MAX_QUEUE jobs are waiting, further requests get a 503 instead of queueing.
+PASSWORD_HASHING = {
+    'WORKERS': int(os.environ.get('PASSWORD_HASHING_WORKERS', min(4, os.cpu_count() or 1))),
+    'MAX_QUEUE': int(os.environ.get('PASSWORD_HASHING_MAX_QUEUE', 32)),
+}
+
+# Rendered catalogue responses (core/http_cache.py), bounded by total body size
+RESPONSE_CACHE = {
+    'MAX_BYTES': int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+}
+
+# Organizer dashboard counters (events/stats.py) are re-aggregated once their
+# cached copy is older than MAX_AGE seconds; writes keep them current in between
+EVENT_STATS = {
+    'MAX_AGE': int(os.environ.get('EVENT_STATS_MAX_AGE', 300)),
+}
+
+# Per-request Mongo command accounting (core/middleware.py). Requests that run
+# one query shape more than REPEAT_THRESHOLD times are logged as likely N+1s.
+QUERY_MONITORING = {
+    'ENABLED': os.environ.get('QUERY_MONITORING', 'True') == 'True',
+    'REPEAT_THRESHOLD': int(os.environ.get('QUERY_REPEAT_THRESHOLD', 10)),
+}
+if QUERY_MONITORING['ENABLED']:
+    MIDDLEWARE.insert(0, 'core.middleware.QueryCountMiddleware')
+
+# Exposes process-local counters at /api/metrics/
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', str(DEBUG)) == 'True'
+
+# Background broadcast of organizer notifications (notifications/jobs.py).
+# Jobs run in the accepting process and are not durable: once a job has had no
+# heartbeat for STALE_AFTER seconds (its process exited) it is marked failed
+# on the next worker startup, and the organizer has to send it again.
+NOTIFICATION_FANOUT = {
+    'WORKERS': int(os.environ.get('NOTIFICATION_FANOUT_WORKERS', 2)),
+    'CHUNK_SIZE': int(os.environ.get('NOTIFICATION_FANOUT_CHUNK_SIZE', 1000)),
+    'STALE_AFTER': int(os.environ.get('NOTIFICATION_FANOUT_STALE_AFTER', 300)),
+}
+
+# Inbox retention, both deletions are permanent (there is no archive): read
+# notifications are removed by a TTL index READ_DAYS after being read; unread
+# ones older than UNREAD_DAYS are deleted when prune_notifications runs
+NOTIFICATION_RETENTION = {
+    'READ_DAYS': int(os.environ.get('NOTIFICATION_READ_RETENTION_DAYS', 30)),
+    'UNREAD_DAYS': int(os.environ.get('NOTIFICATION_UNREAD_RETENTION_DAYS', 180)),
+}
+
+# Websocket delivery (notifications/consumers.py). OVERFLOW_POLICY is
+# 'drop_oldest' (keep the newest MAX_QUEUE) or 'summarize' (send a count instead)
+NOTIFICATION_SOCKET = {
+    'COALESCE_WINDOW': float(os.environ.get('NOTIFICATION_COALESCE_WINDOW', 0.05)),
+    'MAX_QUEUE': int(os.environ.get('NOTIFICATION_SOCKET_MAX_QUEUE', 100)),
+    'OVERFLOW_POLICY': os.environ.get('NOTIFICATION_SOCKET_OVERFLOW', 'drop_oldest'),
+    'REPLAY_LIMIT': int(os.environ.get('NOTIFICATION_REPLAY_LIMIT', 100)),
+}
+
+# The Mongo layer delivers across worker processes; set
+# CHANNEL_LAYER_BACKEND=channels.layers.InMemoryChannelLayer for a single process
+CHANNEL_LAYER_BACKEND = os.environ.get('CHANNEL_LAYER_BACKEND', 'core.channel_layers.MongoChannelLayer')
+
 CHANNEL_LAYERS = {
     "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer"
+        "BACKEND": CHANNEL_LAYER_BACKEND,
+        "CONFIG": {
+            "capacity": int(os.environ.get('CHANNEL_CAPACITY', 100)),
+            "expiry": 60,
+        }
     }
 }
@@ -0,0 +1,108 @@
+from contextlib import contextmanager
+from bson.objectid import ObjectId
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.test import SimpleTestCase, override_settings
+from core.http_cache import response_cache
+from core.indexes import ensure_indexes, find_collection_scans, get_models
+from core.mongo import manager
+from core.query_log import capture_queries
+
+TEST_PASSWORD = 'test-pass-1234'
+
+
+class MongoTestCase(SimpleTestCase):
+    """
+    Runs each test against an empty `<DB_NAME>_test` database with every
+    declared index built, fast password hashing, the in-memory channel layer
+    and cleared process caches. Needs a reachable MONGO_URI.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._test_settings = override_settings(
+            MONGO=dict(settings.MONGO, DB_NAME=f"{settings.MONGO['DB_NAME']}_test", SECONDARY_READS=False),
+            PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+            CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+        )
+        cls._test_settings.enable()
+        # Collections resolved before the override still point at the real database
+        manager.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        manager.get_client().drop_database(settings.MONGO['DB_NAME'])
+        cls._test_settings.disable()
+        manager.close()
+        super().tearDownClass()
+
+    def setUp(self):
+        from users.cache import principal_cache
+        manager.get_client().drop_database(settings.MONGO['DB_NAME'])
+        for model in get_models():
+            ensure_indexes(model)
+        # Versions restart at 0 in the fresh database, so old cache keys would match
+        response_cache.clear()
+        principal_cache.clear()
+
+    def make_user(self, role='participant', **fields):
+        from users.models import UserModel
+        user = dict({
+            'email': f'{role}-{ObjectId()}@test.local',
+            'name': role.title(),
+            'password': make_password(TEST_PASSWORD),
+            'role': role,
+            'is_active': True,
+        }, **fields)
+        user['_id'] = UserModel.collection.insert_one(user).inserted_id
+        return user
+
+    def make_event(self, organizer, **fields):
+        from events.models import EventModel
+        return EventModel.create(dict({
+            'title': 'Test Event',
+            'description': 'Created by the test suite',
+            'category': 'Tech',
+            'date': '2030-01-01',
+            'time': '10:00',
+            'location': 'Online',
+            'max_participants': '100',
+            'status': 'upcoming',
+            'organizer': str(organizer['_id']),
+        }, **fields))
+
+    def auth(self, user):
+        # Extra kwargs for self.client requests made as `user`
+        from users.tokens import access_token
+        return {'HTTP_AUTHORIZATION': f'Bearer {access_token(user)}'}
+
+
+class MongoQueryPlanMixin:
+    """
+    TestCase mixin that fails when any model query shape needs a collection scan.
+    Builds the declared indexes first so the check reflects a deployed database.
+    """
+    def assertNoCollectionScans(self, models=None):
+        models = models or get_models()
+        for model in models:
+            ensure_indexes(model)
+        offenders = find_collection_scans(models)
+        if offenders:
+            details = ', '.join(f'{model.collection.name} {shape}' for model, shape in offenders)
+            self.fail(f'Queries fall back to COLLSCAN: {details}')
+
+
+class MongoQueryCountMixin:
+    """
+    TestCase mixin for query budgets, e.g.
+
+        with self.assertMaxQueries(4):
+            self.client.get('/api/teams/event/<id>/')
+    """
+    @contextmanager
+    def assertMaxQueries(self, n):
+        with capture_queries() as log:
+            yield log
+        if log.count > n:
+            details = '\n'.join(f'  {count}x {shape}' for shape, count in log.shapes.most_common())
+            self.fail(f'{log.count} Mongo queries executed, expected at most {n}:\n{details}')
@@ -0,0 +1,283 @@
+import asyncio
+import copy
+import datetime
+from types import SimpleNamespace
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from pymongo.read_preferences import Primary, SecondaryPreferred
+from core.cache import TTLCache
+from core.channel_layers import MongoChannelLayer
+from core.fields import InvalidFields, fields_projection, get_fields_param
+from core.http_cache import ResponseCache
+from core.mongo import ClientManager, LazyCollection, db, read_collection
+from core.pagination import (
+    DEFAULT_SORT, InvalidPageParams, decode_cursor, encode_cursor, fetch_page, get_page_params,
+)
+from core.testing import MongoQueryPlanMixin, MongoTestCase
+from events.models import STARTS_AT_SORT
+
+
+def page_request(**params):
+    return SimpleNamespace(query_params=params)
+
+
+class QueryPlanTests(MongoQueryPlanMixin, MongoTestCase):
+    def test_declared_query_shapes_use_indexes(self):
+        self.assertNoCollectionScans()
+
+
+class KeysetPaginationTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.collection = db['pagination_test']
+
+    def collect(self, sort, limit):
+        seen, after = [], None
+        while True:
+            docs, next_cursor = fetch_page(self.collection, {}, limit, after, sort)
+            seen.extend(docs)
+            if next_cursor is None:
+                return seen
+            after = decode_cursor(next_cursor)
+
+    def test_pages_cover_every_document_once_newest_first(self):
+        ids = self.collection.insert_many([{'n': i} for i in range(25)]).inserted_ids
+        docs = self.collect(DEFAULT_SORT, 10)
+        self.assertEqual([d['_id'] for d in docs], sorted(ids, reverse=True))
+
+    def test_compound_sort_pages_through_ties(self):
+        # Several documents share each starts_at, so the _id tie-breaker decides the position
+        base = datetime.datetime(2030, 1, 1)
+        self.collection.insert_many([{'starts_at': base + datetime.timedelta(days=i % 3)} for i in range(12)])
+        docs = self.collect(STARTS_AT_SORT, 5)
+        self.assertEqual(len(docs), 12)
+        self.assertEqual(len({d['_id'] for d in docs}), 12)
+        keys = [(d['starts_at'], d['_id']) for d in docs]
+        self.assertEqual(keys, sorted(keys))
+
+    def test_last_page_has_no_next_cursor(self):
+        self.collection.insert_many([{'n': i} for i in range(3)])
+        docs, next_cursor = fetch_page(self.collection, {}, 3)
+        self.assertEqual(len(docs), 3)
+        self.assertIsNone(next_cursor)
+
+
+class PageParamsTests(SimpleTestCase):
+    def test_limit_is_clamped(self):
+        self.assertEqual(get_page_params(page_request(limit='1000'))[0], 100)
+        self.assertEqual(get_page_params(page_request(limit='0'))[0], 1)
+
+    def test_rejects_malformed_cursor(self):
+        with self.assertRaises(InvalidPageParams):
+            get_page_params(page_request(cursor='not-a-cursor'))
+
+    def test_rejects_cursor_from_another_sort(self):
+        cursor = encode_cursor({'_id': 'x'})
+        with self.assertRaises(InvalidPageParams):
+            get_page_params(page_request(cursor=cursor), STARTS_AT_SORT)
+
+    def test_rejects_operator_values(self):
+        cursor = encode_cursor({'_id': {'$gt': ''}})
+        with self.assertRaises(InvalidPageParams):
+            get_page_params(page_request(cursor=cursor))
+
+    def test_offset_cursor_skips_keyset_check(self):
+        cursor = encode_cursor({'offset': 10})
+        self.assertEqual(get_page_params(page_request(cursor=cursor), None)[1], {'offset': 10})
+
+
+class ListCursorTests(MongoTestCase):
+    def test_list_endpoints_answer_bad_cursors_with_400(self):
+        participant = self.make_user()
+        organizer = self.make_user('organizer')
+        event = self.make_event(organizer)
+        stale = encode_cursor({'offset': 10})
+        requests = [
+            ('/api/events/?upcoming=true', {}),
+            ('/api/events/my-events/', self.auth(organizer)),
+            ('/api/registrations/my/', self.auth(participant)),
+            (f"/api/registrations/event/{event['_id']}/", self.auth(organizer)),
+            (f"/api/teams/event/{event['_id']}/", self.auth(participant)),
+            ('/api/notifications/', self.auth(participant)),
+        ]
+        for path, headers in requests:
+            separator = '&' if '?' in path else '?'
+            with self.subTest(path=path):
+                response = self.client.get(f'{path}{separator}cursor={stale}', **headers)
+                self.assertEqual(response.status_code, 400)
+
+
+class TTLCacheTests(SimpleTestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_entries_expire(self):
+        cache = TTLCache(ttl=0)
+        cache.set('a', 1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_invalidate_and_hit_rate(self):
+        cache = TTLCache()
+        cache.set('a', 1)
+        cache.get('a')
+        cache.invalidate('a')
+        cache.get('a')
+        self.assertEqual(cache.stats()['hit_rate'], 0.5)
+
+
+class MetricsViewTests(SimpleTestCase):
+    @override_settings(METRICS_ENABLED=True)
+    def test_snapshot_includes_the_principal_cache(self):
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('auth_principal_cache', response.json())
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled_by_default_outside_debug(self):
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 404)
+
+
+class MongoChannelLayerTests(MongoTestCase):
+    def run_layers(self, scenario, count=1, **options):
+        async def run():
+            layers = [MongoChannelLayer(**options) for _ in range(count)]
+            try:
+                return await scenario(*layers)
+            finally:
+                for layer in layers:
+                    await layer.close()
+        return async_to_sync(run)()
+
+    def test_group_send_reaches_another_process(self):
+        async def scenario(sender, receiver):
+            channel = await receiver.new_channel()
+            await receiver.group_add('event-1', channel)
+            receiver._ensure_tailer()
+            # Give the tailer time to position itself before anything is written
+            await asyncio.sleep(0.5)
+            await sender.group_send('event-1', {'type': 'notify', 'n': 1})
+            return await asyncio.wait_for(receiver.receive(channel), 5), sender.counters
+        message, counters = self.run_layers(scenario, count=2)
+        self.assertEqual(message, {'type': 'notify', 'n': 1})
+        self.assertEqual(counters['sent_remote'], 1)
+
+    def test_local_channels_skip_the_collection(self):
+        async def scenario(layer):
+            channel = await layer.new_channel()
+            await layer.group_add('event-1', channel)
+            await layer.group_send('event-1', {'type': 'notify'})
+            return await asyncio.wait_for(layer.receive(channel), 5), layer.counters
+        message, counters = self.run_layers(scenario)
+        self.assertEqual(message, {'type': 'notify'})
+        self.assertEqual((counters['sent_local'], counters['inserts']), (1, 0))
+
+    def test_live_memberships_outlast_group_expiry(self):
+        async def scenario(layer):
+            channel = await layer.new_channel()
+            await layer.group_add('event-1', channel)
+            await asyncio.sleep(1.5)
+            await layer.group_send('event-1', {'type': 'notify'})
+            return await asyncio.wait_for(layer.receive(channel), 2)
+        self.assertEqual(self.run_layers(scenario, group_expiry=0.4), {'type': 'notify'})
+
+    def test_discarded_channel_gets_nothing(self):
+        async def scenario(layer):
+            channel = await layer.new_channel()
+            await layer.group_add('event-1', channel)
+            await layer.group_discard('event-1', channel)
+            await layer.group_send('event-1', {'type': 'notify'})
+            return layer.counters
+        counters = self.run_layers(scenario)
+        self.assertEqual((counters['sent_local'], counters['sent_remote']), (0, 0))
+
+
+class ResponseCacheTests(SimpleTestCase):
+    def test_bounded_by_total_bytes(self):
+        cache = ResponseCache(max_bytes=10)
+        cache.set('a', b'12345', '"a"')
+        cache.set('b', b'12345', '"b"')
+        cache.get('a')
+        cache.set('c', b'123', '"c"')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), (b'12345', '"a"'))
+        self.assertEqual(cache.stats()['bytes'], 8)
+
+    def test_oversized_bodies_are_not_stored(self):
+        cache = ResponseCache(max_bytes=4)
+        cache.set('a', b'12345', '"a"')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['bytes'], 0)
+
+
+class FieldsTests(SimpleTestCase):
+    def test_requested_fields_keep_allowed_order_and_id(self):
+        request = page_request(fields='b, a')
+        self.assertEqual(get_fields_param(request, ('id', 'a', 'b', 'c'), ('id', 'c')), ('id', 'a', 'b'))
+        self.assertEqual(get_fields_param(page_request(), ('id', 'a'), ('id',)), ('id',))
+
+    def test_unknown_fields_are_rejected(self):
+        with self.assertRaises(InvalidFields):
+            get_fields_param(page_request(fields='a,secret'), ('id', 'a'), ('id',))
+
+    def test_projection_maps_serialized_names_to_stored_ones(self):
+        stored_as = {'id': '_id', 'details': ('ref', 'snapshot')}
+        self.assertEqual(fields_projection(('id', 'name', 'details'), stored_as),
+                         {'_id': 1, 'name': 1, 'ref': 1, 'snapshot': 1})
+        self.assertIsNone(fields_projection(None, stored_as))
+
+
+class ClientManagerTests(SimpleTestCase):
+    # Clients are created with connect=False, so none of this needs a server
+    def setUp(self):
+        self.manager = ClientManager()
+        self.addCleanup(self.manager.close)
+
+    def test_client_is_created_once_per_process(self):
+        client = self.manager.get_client()
+        self.assertIs(self.manager.get_client(), client)
+        with mock.patch('core.mongo.os.getpid', return_value=-1):
+            forked = self.manager.get_client()
+        self.assertIsNot(forked, client)
+        forked.close()
+
+    def test_close_drops_the_client(self):
+        client = self.manager.get_client()
+        self.manager.close()
+        self.assertIsNot(self.manager.get_client(), client)
+
+    def test_lazy_collection_follows_the_current_client(self):
+        collection = LazyCollection('events')
+        with mock.patch('core.mongo.manager', self.manager):
+            self.assertEqual(collection.full_name, f"{settings.MONGO['DB_NAME']}.events")
+            first = collection._resolve()
+            self.manager.close()
+            self.assertIsNot(collection._resolve(), first)
+        # copy probes dunders before __init__ has run
+        self.assertEqual(copy.copy(collection).name, 'events')
+
+
+class ReadRoutingTests(SimpleTestCase):
+    def setUp(self):
+        manager = ClientManager()
+        self.addCleanup(manager.close)
+        self.collection = manager.get_db()['events']
+
+    @override_settings(MONGO=dict(settings.MONGO, SECONDARY_READS=False))
+    def test_primary_by_default(self):
+        self.assertIs(read_collection(self.collection), self.collection)
+
+    @override_settings(MONGO=dict(settings.MONGO, SECONDARY_READS=True, MAX_STALENESS_SECONDS=120))
+    def test_secondary_reads_are_bounded_by_staleness(self):
+        routed = read_collection(self.collection)
+        self.assertIsInstance(routed.read_preference, SecondaryPreferred)
+        self.assertEqual(routed.read_preference.max_staleness, 120)
+        self.assertIsInstance(self.collection.read_preference, Primary)
@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from core.views import MetricsView
 
 urlpatterns = [
     path('api/auth/', include('users.urls')),
@@ -9,6 +10,7 @@ urlpatterns = [
     path('api/registrations/', include('registrations.urls')),
     path('api/teams/', include('teams.urls')),
     path('api/notifications/', include('notifications.urls')),
+    path('api/metrics/', MetricsView.as_view(), name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,33 @@
+from core.mongo import db, get_async_db
+
+
+class CollectionVersionModel:
+    """
+    Monotonic per-collection version counters. Writers bump the version of the
+    collection they change; readers fold the versions into cache keys so a
+    write anywhere invalidates cached responses in every worker.
+    """
+    collection = db['collection_versions']
+
+    # Documents are keyed by collection name in _id
+    indexes = []
+    query_shapes = []
+
+    @classmethod
+    def bump(cls, name):
+        cls.collection.update_one({'_id': name}, {'$inc': {'v': 1}}, upsert=True)
+
+    @classmethod
+    async def abump(cls, name):
+        await get_async_db()[cls.collection.name].update_one({'_id': name}, {'$inc': {'v': 1}}, upsert=True)
+
+    @classmethod
+    def get_many(cls, names):
+        found = {doc['_id']: doc['v'] for doc in cls.collection.find({'_id': {'$in': list(names)}})}
+        return {name: found.get(name, 0) for name in names}
+
+    @classmethod
+    async def aget_many(cls, names):
+        docs = await get_async_db()[cls.collection.name].find({'_id': {'$in': list(names)}}).to_list(None)
+        found = {doc['_id']: doc['v'] for doc in docs}
+        return {name: found.get(name, 0) for name in names}
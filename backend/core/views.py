@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.http import Http404
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import AllowAny
+from core import metrics
+
+
+class MetricsView(APIView):
+    """Process-local counters (caches, pools, ...). Disabled unless METRICS_ENABLED."""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request):
+        if not settings.METRICS_ENABLED:
+            raise Http404
+        return Response(metrics.snapshot())
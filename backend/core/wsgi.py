@@ -3,3 +3,7 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 application = get_wsgi_application()
+
+# Fail broadcast jobs orphaned by the process this one replaced
+from notifications.jobs import recover_on_startup
+recover_on_startup()
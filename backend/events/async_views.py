@@ -0,0 +1,56 @@
+from rest_framework.permissions import AllowAny
+from core.async_views import AsyncAPIView
+from core.loaders import get_loaders
+from core.http_cache import acached_json_response
+from core.pagination import page_response_data, encode_cursor, InvalidPageParams
+from core.fields import InvalidFields
+from .models import EventModel, projection_for
+from .views import (
+    EventListCreateView, EventDetailView, CATALOGUE_COLLECTIONS, InvalidDateFilter, catalogue_vary,
+    event_list_params, serialize_event, serialize_events,
+)
+
+# Async GET handlers for the catalogue; writes are forwarded to the sync views
+
+class AsyncEventListCreateView(AsyncAPIView):
+    sync_view = EventListCreateView
+    permission_classes = [AllowAny]
+
+    async def get(self, request):
+        return await acached_json_response(request, CATALOGUE_COLLECTIONS, lambda: self.list_data(request),
+                                           vary=catalogue_vary(request))
+
+    async def list_data(self, request):
+        try:
+            filters, search, limit, after, fields, sort = event_list_params(request)
+        except (InvalidPageParams, InvalidFields, InvalidDateFilter) as e:
+            return {'error': str(e)}, 400
+
+        projection = projection_for(fields)
+        if search:
+            offset = after.get('offset', 0)
+            events, has_more, prefix_mode = await EventModel.asearch(search, filters, limit, offset, after.get('prefix'), projection)
+            next_cursor = encode_cursor({'offset': offset + limit, 'prefix': prefix_mode}) if has_more else None
+        else:
+            events, next_cursor = await EventModel.aget_page(filters, limit, after, projection, sort)
+
+        loaders = get_loaders(request)
+        if 'organizer_details' in fields:
+            loaders.users.prime(e.get('organizer') for e in events)
+            await loaders.aflush()
+        return page_response_data(serialize_events(events, loaders, fields), next_cursor), 200
+
+class AsyncEventDetailView(AsyncAPIView):
+    sync_view = EventDetailView
+    permission_classes = [AllowAny]
+
+    async def get(self, request, pk):
+        return await acached_json_response(request, CATALOGUE_COLLECTIONS, lambda: self.detail_data(request, pk))
+
+    async def detail_data(self, request, pk):
+        event = await EventModel.aget_by_id(pk)
+        if not event: return {'detail': 'Not found'}, 404
+
+        loaders = get_loaders(request)
+        await loaders.users.aload(event.get('organizer'))
+        return serialize_event(event, loaders), 200
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+from events.models import EventModel, parse_starts_at
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Writes the UTC starts_at datetime on events from their date/time strings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Recompute every event instead of only those without starts_at')
+
+    def handle(self, *args, **options):
+        query = {} if options['all'] else {'starts_at': {'$exists': False}}
+        ops = []
+        updated = 0
+        unparsable = 0
+        for event in EventModel.collection.find(query, {'date': 1, 'time': 1, 'starts_at': 1}).batch_size(BATCH_SIZE):
+            starts_at = parse_starts_at(event.get('date'), event.get('time'))
+            if starts_at is None:
+                unparsable += 1
+            # Unparsable dates are stored as null too, so they are not retried on every run
+            if starts_at != event.get('starts_at') or 'starts_at' not in event:
+                ops.append(UpdateOne({'_id': event['_id']}, {'$set': {'starts_at': starts_at}}))
+            if len(ops) >= BATCH_SIZE:
+                updated += EventModel.collection.bulk_write(ops, ordered=False).modified_count
+                ops = []
+        if ops:
+            updated += EventModel.collection.bulk_write(ops, ordered=False).modified_count
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated starts_at on {updated} events ({unparsable} with an unparsable date left null)'
+        ))
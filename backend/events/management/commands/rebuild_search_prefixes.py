@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+from events.models import EventModel
+from events.search import build_prefixes, PREFIX_FIELDS
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the autocomplete prefix terms stored on every event'
+
+    def handle(self, *args, **options):
+        projection = {field: 1 for field in PREFIX_FIELDS + ('search_prefixes',)}
+        ops = []
+        updated = 0
+        for event in EventModel.collection.find({}, projection).batch_size(BATCH_SIZE):
+            prefixes = build_prefixes(event)
+            if prefixes != event.get('search_prefixes'):
+                ops.append(UpdateOne({'_id': event['_id']}, {'$set': {'search_prefixes': prefixes}}))
+            if len(ops) >= BATCH_SIZE:
+                updated += EventModel.collection.bulk_write(ops, ordered=False).modified_count
+                ops = []
+        if ops:
+            updated += EventModel.collection.bulk_write(ops, ordered=False).modified_count
+        self.stdout.write(self.style.SUCCESS(f'Updated search prefixes on {updated} events'))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+from events.models import EventModel, parse_capacity
+from registrations.models import RegistrationModel
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds each event\'s registered_count and capacity from the registrations collection'
+
+    def handle(self, *args, **options):
+        counts = {
+            row['_id']: row['count']
+            for row in RegistrationModel.collection.aggregate([
+                {'$group': {'_id': '$event', 'count': {'$sum': 1}}}
+            ], allowDiskUse=True)
+        }
+
+        projection = {'max_participants': 1, 'capacity': 1, 'registered_count': 1}
+        ops = []
+        fixed = 0
+        for event in EventModel.collection.find({}, projection).batch_size(BATCH_SIZE):
+            expected = {
+                'registered_count': counts.get(str(event['_id']), 0),
+                'capacity': parse_capacity(event.get('max_participants')),
+            }
+            if any(event.get(k, -1) != v for k, v in expected.items()):
+                ops.append(UpdateOne({'_id': event['_id']}, {'$set': expected}))
+            if len(ops) >= BATCH_SIZE:
+                fixed += EventModel.collection.bulk_write(ops, ordered=False).modified_count
+                ops = []
+        if ops:
+            fixed += EventModel.collection.bulk_write(ops, ordered=False).modified_count
+
+        self.stdout.write(self.style.SUCCESS(f'Reconciled seat counters on {fixed} events'))
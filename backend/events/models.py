@@ -1,14 +1,113 @@
-from core.mongo import db
+import datetime
+from core.mongo import db, get_async_db, to_object_ids
 from bson.objectid import ObjectId
+from pymongo import IndexModel, UpdateOne, ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError
+from core.versions import CollectionVersionModel
+from core.pagination import fetch_page, afetch_page, DEFAULT_SORT
+from core.fields import fields_projection
+from .search import SEARCH_FIELDS, build_prefixes, prefix_terms
+
+def parse_capacity(value):
+    # max_participants arrives as whatever the client posted; None means unlimited
+    try:
+        capacity = int(value)
+    except (TypeError, ValueError):
+        return None
+    return max(capacity, 0)
+
+def parse_starts_at(date, time=None):
+    """
+    Combines the posted `date` and `time` strings into the naive UTC datetime
+    stored as `starts_at` (the form PyMongo returns). Values with an offset are
+    converted; values without one are taken as UTC. None when unparsable.
+    """
+    if not date:
+        return None
+    date = str(date).strip()
+    candidates = [f'{date}T{str(time).strip()}', date] if time and 'T' not in date else [date]
+    for text in candidates:
+        try:
+            value = datetime.datetime.fromisoformat(text.replace('Z', '+00:00'))
+        except ValueError:
+            continue
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return value
+    return None
+
+# Soonest first; used whenever a listing filters on starts_at
+STARTS_AT_SORT = (('starts_at', 1), ('_id', 1))
+
+# Serialized names that are not stored under the same key
+_STORED_AS = {'id': '_id', 'organizer_details': 'organizer'}
+
+def projection_for(fields):
+    """Mongo projection holding just the stored fields behind serialized `fields`."""
+    return fields_projection(fields, _STORED_AS)
 
 class EventModel:
     collection = db['events']
 
+    indexes = [
+        IndexModel([('organizer', ASCENDING), ('_id', DESCENDING)], name='organizer_recent'),
+        IndexModel([('category', ASCENDING), ('_id', DESCENDING)], name='category_recent'),
+        IndexModel([('status', ASCENDING), ('category', ASCENDING), ('_id', DESCENDING)], name='status_category_recent'),
+        IndexModel([(field, 'text') for field in SEARCH_FIELDS], name='event_text',
+                   weights={'title': 10, 'category': 5, 'location': 3, 'description': 1}),
+        # _id after the term so prefix matches come back newest first without an in-memory sort
+        IndexModel([('search_prefixes', ASCENDING), ('_id', DESCENDING)], name='search_prefixes'),
+        # Date-range and upcoming listings: equality filters first, then the starts_at range/sort
+        IndexModel([('starts_at', ASCENDING), ('_id', ASCENDING)], name='starts_at'),
+        IndexModel([('status', ASCENDING), ('starts_at', ASCENDING), ('_id', ASCENDING)], name='status_starts_at'),
+        IndexModel([('category', ASCENDING), ('starts_at', ASCENDING), ('_id', ASCENDING)], name='category_starts_at'),
+        IndexModel([('status', ASCENDING), ('category', ASCENDING), ('starts_at', ASCENDING), ('_id', ASCENDING)],
+                   name='status_category_starts_at'),
+    ]
+
+    query_shapes = [
+        {'filter': {}, 'sort': [('_id', DESCENDING)]},
+        {'filter': {'organizer': 'x'}, 'sort': [('_id', DESCENDING)]},
+        {'filter': {'category': 'x'}, 'sort': [('_id', DESCENDING)]},
+        {'filter': {'status': 'x'}, 'sort': [('_id', DESCENDING)]},
+        {'filter': {'status': 'x', 'category': 'x'}, 'sort': [('_id', DESCENDING)]},
+        {'filter': {'$text': {'$search': 'x'}}},
+        {'filter': {'search_prefixes': {'$all': ['xy']}}, 'sort': [('_id', DESCENDING)]},
+        {'filter': {'starts_at': {'$gte': datetime.datetime(2000, 1, 1)}}, 'sort': list(STARTS_AT_SORT)},
+        {'filter': {'status': 'x', 'starts_at': {'$gte': datetime.datetime(2000, 1, 1)}}, 'sort': list(STARTS_AT_SORT)},
+        {'filter': {'category': 'x', 'starts_at': {'$gte': datetime.datetime(2000, 1, 1)}}, 'sort': list(STARTS_AT_SORT)},
+        {'filter': {'status': 'x', 'category': 'x', 'starts_at': {'$gte': datetime.datetime(2000, 1, 1)}},
+         'sort': list(STARTS_AT_SORT)},
+    ]
+
+    # Fields registration and team responses embed about their event; registrations
+    # also store them as an `event_summary` snapshot
+    reference_projection = {'title': 1, 'date': 1, 'time': 1, 'location': 1, 'banner_image': 1, 'status': 1}
+
+    @classmethod
+    def summary(cls, event):
+        # Always built in reference_projection order so snapshots compare equal
+        return {field: event.get(field) for field in cls.reference_projection}
+
     @classmethod
     def get_all(cls, filters=None):
         filters = filters or {}
         return list(cls.collection.find(filters))
 
+    @classmethod
+    def get_page(cls, filters=None, limit=10, after=None, projection=None, sort=DEFAULT_SORT):
+        # Catalogue reads stay on the primary: their responses are cached under
+        # the collection version (core/http_cache.py), which is read there too
+        return fetch_page(cls.collection, filters, limit, after, sort,
+                          cls._with_sort_fields(projection, sort))
+
+    @classmethod
+    def _with_sort_fields(cls, projection, sort):
+        # The next cursor is built from the sort fields, so they must be fetched
+        if projection is None:
+            return None
+        return dict(projection, **{field: 1 for field, _ in sort})
+
     @classmethod
     def get_by_id(cls, event_id):
         try:
@@ -16,17 +115,102 @@ class EventModel:
         except:
             return None
 
+    @classmethod
+    def get_many(cls, event_ids, projection=None):
+        object_ids = to_object_ids(event_ids)
+        if not object_ids:
+            return {}
+        return {str(e['_id']): e for e in cls.collection.find({'_id': {'$in': object_ids}}, projection)}
+
+    @classmethod
+    def search(cls, text, filters=None, limit=10, offset=0, prefix=None, projection=None):
+        """
+        Relevance-ranked search over title, description, category and location
+        using the text index. When nothing matches whole words (e.g. a partially
+        typed word) it falls back to the indexed prefix terms; pass `prefix` to
+        pin the mode when paging. Returns (events, has_more, prefix_mode).
+        """
+        collection = cls.collection
+        docs = []
+        if not prefix:
+            docs = list(cls._text_cursor(collection, text, filters, limit, offset, projection))
+            if docs or prefix is False or offset:
+                return docs[:limit], len(docs) > limit, False
+
+        cursor = cls._prefix_cursor(collection, text, filters, limit, offset, projection)
+        if cursor is not None:
+            docs = list(cursor)
+        return docs[:limit], len(docs) > limit, True
+
+    @classmethod
+    def _text_cursor(cls, collection, text, filters, limit, offset, projection=None):
+        query = dict(filters or {}, **{'$text': {'$search': text}})
+        score = dict(projection or {}, score={'$meta': 'textScore'})
+        return (collection.find(query, score)
+                .sort([('score', {'$meta': 'textScore'}), ('_id', DESCENDING)])
+                .skip(offset).limit(limit + 1))
+
+    @classmethod
+    def _prefix_cursor(cls, collection, text, filters, limit, offset, projection=None):
+        terms = prefix_terms(text)
+        if not terms:
+            return None
+        query = dict(filters or {}, search_prefixes={'$all': terms})
+        return collection.find(query, projection).sort('_id', DESCENDING).skip(offset).limit(limit + 1)
+
+    @classmethod
+    def suggest(cls, text, limit=8):
+        terms = prefix_terms(text)
+        if not terms:
+            return []
+        return list(cls.collection.find(
+            {'search_prefixes': {'$all': terms}},
+            {'title': 1, 'category': 1}
+        ).sort('_id', DESCENDING).limit(limit))
+
     @classmethod
     def create(cls, data):
+        data['search_prefixes'] = build_prefixes(data)
+        data['capacity'] = parse_capacity(data.get('max_participants'))
+        data['registered_count'] = 0
+        data['starts_at'] = parse_starts_at(data.get('date'), data.get('time'))
         result = cls.collection.insert_one(data)
         data['_id'] = result.inserted_id
+        CollectionVersionModel.bump('events')
         return data
 
     @classmethod
     def update(cls, event_id, data):
+        # Only ever derived from max_participants, so the seat limit and the
+        # displayed one cannot disagree
+        data.pop('capacity', None)
+        if 'max_participants' in data:
+            data['capacity'] = parse_capacity(data['max_participants'])
+        # The seat counter is owned by reserve_seat/release_seat
+        data.pop('registered_count', None)
+        # Derived from date/time below
+        data.pop('starts_at', None)
         try:
             cls.collection.update_one({'_id': ObjectId(event_id)}, {'$set': data})
-            return cls.get_by_id(event_id)
+            event = cls.get_by_id(event_id)
+            # Keep the autocomplete terms and start time in step with the fields
+            # they derive from, in one write
+            derived = {}
+            if event and build_prefixes(event) != event.get('search_prefixes'):
+                derived['search_prefixes'] = build_prefixes(event)
+            if event and parse_starts_at(event.get('date'), event.get('time')) != event.get('starts_at'):
+                derived['starts_at'] = parse_starts_at(event.get('date'), event.get('time'))
+            if derived:
+                cls.collection.update_one({'_id': event['_id']}, {'$set': derived})
+                event.update(derived)
+            # Only once every write is in: a response cached under the new
+            # version must not see the old prefixes or start time
+            CollectionVersionModel.bump('events')
+            # Rewrite the snapshot on every registration of the event in one update_many
+            if event and any(field in data for field in cls.reference_projection):
+                from registrations.models import RegistrationModel
+                RegistrationModel.set_event_summary(event_id, cls.summary(event))
+            return event
         except:
             return None
 
@@ -34,6 +218,203 @@ class EventModel:
     def delete(cls, event_id):
         try:
             result = cls.collection.delete_one({'_id': ObjectId(event_id)})
+            CollectionVersionModel.bump('events')
+            EventStatsModel.delete(event_id)
             return result.deleted_count > 0
         except:
             return False
+
+    @classmethod
+    def reserve_seat(cls, event_id):
+        """
+        Atomically takes one seat if the event has capacity left. Returns False
+        when the event is full or does not exist.
+        """
+        try:
+            result = cls.collection.update_one(cls._seat_available(event_id), {'$inc': {'registered_count': 1}})
+            return result.modified_count == 1
+        except:
+            return False
+
+    @classmethod
+    def _seat_available(cls, event_id, seats=1):
+        taken = {'$add': [{'$ifNull': ['$registered_count', 0]}, seats]}
+        # Events created before `capacity` existed are limited by max_participants,
+        # parsed like parse_capacity (unparseable means unlimited)
+        legacy = {'$convert': {'input': '$max_participants', 'to': 'int', 'onError': None, 'onNull': None}}
+        return {
+            '_id': ObjectId(event_id),
+            '$or': [
+                {'capacity': {'$exists': True, '$eq': None}},
+                {'$expr': {'$lte': [taken, '$capacity']}},
+                {'capacity': {'$exists': False},
+                 '$expr': {'$or': [{'$eq': [legacy, None]}, {'$lte': [taken, legacy]}]}},
+            ]
+        }
+
+    @classmethod
+    def capacity_of(cls, event):
+        # Same fallback as _seat_available for events without a stored capacity
+        if 'capacity' in event:
+            return event['capacity']
+        return parse_capacity(event.get('max_participants'))
+
+    @classmethod
+    def reserve_seats(cls, event_id, seats):
+        """
+        Takes up to `seats` seats in one conditional update, shrinking the request
+        to what is left when the event cannot fit all of them. Returns the number
+        of seats taken.
+        """
+        for _ in range(3):
+            if seats <= 0:
+                return 0
+            try:
+                result = cls.collection.update_one(cls._seat_available(event_id, seats), {'$inc': {'registered_count': seats}})
+            except:
+                return 0
+            if result.modified_count == 1:
+                return seats
+            event = cls.collection.find_one({'_id': ObjectId(event_id)},
+                                            {'capacity': 1, 'max_participants': 1, 'registered_count': 1})
+            if not event:
+                return 0
+            capacity = cls.capacity_of(event)
+            if capacity is not None:
+                seats = min(seats, capacity - event.get('registered_count', 0))
+        return 0
+
+    @classmethod
+    def release_seat(cls, event_id, seats=1):
+        try:
+            cls.collection.update_one(
+                {'_id': ObjectId(event_id), 'registered_count': {'$gte': seats}},
+                {'$inc': {'registered_count': -seats}}
+            )
+            return True
+        except:
+            return False
+
+    # Async API (AsyncMongoClient) used by the async views; mirrors the sync methods above
+
+    @classmethod
+    def acollection(cls):
+        return get_async_db()[cls.collection.name]
+
+    @classmethod
+    async def aget_page(cls, filters=None, limit=10, after=None, projection=None, sort=DEFAULT_SORT):
+        return await afetch_page(cls.acollection(), filters, limit, after, sort,
+                                 cls._with_sort_fields(projection, sort))
+
+    @classmethod
+    async def aget_by_id(cls, event_id):
+        try:
+            return await cls.acollection().find_one({'_id': ObjectId(event_id)})
+        except:
+            return None
+
+    @classmethod
+    async def aget_many(cls, event_ids, projection=None):
+        object_ids = to_object_ids(event_ids)
+        if not object_ids:
+            return {}
+        events = await cls.acollection().find({'_id': {'$in': object_ids}}, projection).to_list(None)
+        return {str(e['_id']): e for e in events}
+
+    @classmethod
+    async def asearch(cls, text, filters=None, limit=10, offset=0, prefix=None, projection=None):
+        collection = cls.acollection()
+        docs = []
+        if not prefix:
+            docs = await cls._text_cursor(collection, text, filters, limit, offset, projection).to_list(None)
+            if docs or prefix is False or offset:
+                return docs[:limit], len(docs) > limit, False
+
+        cursor = cls._prefix_cursor(collection, text, filters, limit, offset, projection)
+        if cursor is not None:
+            docs = await cursor.to_list(None)
+        return docs[:limit], len(docs) > limit, True
+
+    @classmethod
+    async def areserve_seat(cls, event_id):
+        try:
+            result = await cls.acollection().update_one(cls._seat_available(event_id), {'$inc': {'registered_count': 1}})
+            return result.modified_count == 1
+        except:
+            return False
+
+    @classmethod
+    async def arelease_seat(cls, event_id):
+        try:
+            await cls.acollection().update_one(
+                {'_id': ObjectId(event_id), 'registered_count': {'$gt': 0}},
+                {'$inc': {'registered_count': -1}}
+            )
+            return True
+        except:
+            return False
+
+
+class EventStatsModel:
+    """
+    Cached dashboard counters per event ({_id: event_id, registrations,
+    cancellations, teams, team_members, team_capacity, unteamed, computed_at,
+    writes}). Built by the aggregation in events/stats.py, then kept current by
+    $inc from the registration and team write paths. `add` upserts, so a
+    cancellation made before the first read is not lost; such a document has no
+    computed_at, and the rest of its counters are re-aggregated on first read.
+    Every `add` also bumps `writes`, which set_many uses to avoid overwriting
+    increments that landed while an aggregation was running.
+    """
+    collection = db['event_stats']
+
+    # Only ever addressed by _id (the event id)
+    indexes = []
+    query_shapes = []
+
+    @classmethod
+    def get_many(cls, event_ids):
+        return {doc['_id']: doc for doc in cls.collection.find({'_id': {'$in': [str(i) for i in event_ids]}})}
+
+    @classmethod
+    def add(cls, event_id, **deltas):
+        deltas = {field: value for field, value in deltas.items() if value}
+        if deltas:
+            cls.collection.update_one({'_id': str(event_id)}, {'$inc': dict(deltas, writes=1)}, upsert=True)
+
+    @classmethod
+    def set_many(cls, stats, writes_seen):
+        """
+        Stores recomputed counters. `writes_seen` maps each event id to the
+        `writes` value read before aggregating (None when there was no
+        document); an event whose counters were incremented since keeps them,
+        and is re-aggregated on a later read instead. Cancellations are not
+        derivable from the remaining documents, so a recompute keeps the
+        stored count.
+        """
+        ops = [UpdateOne({'_id': event_id, 'writes': writes_seen.get(event_id)},
+                         {'$set': values, '$setOnInsert': {'cancellations': 0}}, upsert=True)
+               for event_id, values in stats.items()]
+        if not ops:
+            return
+        try:
+            cls.collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            # A duplicate key is an upsert whose filter missed because an add()
+            # created or bumped the document meanwhile: that is the skip
+            if any(error['code'] != 11000 for error in e.details['writeErrors']):
+                raise
+
+    @classmethod
+    def delete(cls, event_id):
+        cls.collection.delete_one({'_id': str(event_id)})
+
+    @classmethod
+    def acollection(cls):
+        return get_async_db()[cls.collection.name]
+
+    @classmethod
+    async def aadd(cls, event_id, **deltas):
+        deltas = {field: value for field, value in deltas.items() if value}
+        if deltas:
+            await cls.acollection().update_one({'_id': str(event_id)}, {'$inc': dict(deltas, writes=1)}, upsert=True)
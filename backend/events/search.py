@@ -0,0 +1,30 @@
+import re
+
+# Fields the autocomplete prefixes are built from; description is left to the
+# text index since its prefixes would bloat every document
+PREFIX_FIELDS = ('title', 'category', 'location')
+SEARCH_FIELDS = ('title', 'description', 'category', 'location')
+MIN_PREFIX = 2
+MAX_PREFIX = 15
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(str(text or '').lower())
+
+
+def build_prefixes(event):
+    """Returns the sorted edge n-grams of every word in the event's prefix fields."""
+    prefixes = set()
+    for field in PREFIX_FIELDS:
+        for token in tokenize(event.get(field)):
+            for end in range(MIN_PREFIX, min(len(token), MAX_PREFIX) + 1):
+                prefixes.add(token[:end])
+    return sorted(prefixes)
+
+
+def prefix_terms(text):
+    # Terms shorter than MIN_PREFIX are not indexed, and longer ones are
+    # truncated to the indexed length
+    return [t[:MAX_PREFIX] for t in tokenize(text) if len(t) >= MIN_PREFIX]
@@ -0,0 +1,77 @@
+import datetime
+from django.conf import settings
+from registrations.models import RegistrationModel
+from teams.models import TeamModel
+from .models import EventStatsModel
+
+# Fields produced by aggregate(); cancellations only ever come from the write paths
+COUNTERS = ('registrations', 'unteamed', 'teams', 'team_members', 'team_capacity')
+
+
+def aggregate(event_ids):
+    """
+    Recomputes the counters of `event_ids` with one $group over registrations
+    and one over teams, both driven by the event_recent indexes. Reads the
+    primary: a lagging secondary would store counts missing recent writes.
+    """
+    event_ids = [str(i) for i in event_ids]
+    now = datetime.datetime.utcnow()
+    stats = {event_id: dict({field: 0 for field in COUNTERS}, computed_at=now) for event_id in event_ids}
+
+    registrations = RegistrationModel.collection.aggregate([
+        {'$match': {'event': {'$in': event_ids}}},
+        {'$group': {
+            '_id': '$event',
+            'registrations': {'$sum': 1},
+            'unteamed': {'$sum': {'$cond': [{'$ifNull': ['$team', False]}, 0, 1]}},
+        }},
+    ])
+    for row in registrations:
+        stats[row['_id']].update(registrations=row['registrations'], unteamed=row['unteamed'])
+
+    teams = TeamModel.collection.aggregate([
+        {'$match': {'event': {'$in': event_ids}}},
+        {'$group': {
+            '_id': '$event',
+            'teams': {'$sum': 1},
+            'team_members': {'$sum': {'$size': {'$ifNull': ['$members', []]}}},
+            'team_capacity': {'$sum': {'$ifNull': ['$max_size', 4]}},
+        }},
+    ])
+    for row in teams:
+        stats[row['_id']].update(teams=row['teams'], team_members=row['team_members'],
+                                 team_capacity=row['team_capacity'])
+    return stats
+
+
+def serialize_stats(event_id, doc):
+    capacity = doc.get('team_capacity') or 0
+    return {
+        'event': event_id,
+        'registrations': doc.get('registrations', 0),
+        'cancellations': doc.get('cancellations', 0),
+        'teams': doc.get('teams', 0),
+        # Share of all team seats that are taken
+        'average_team_fill': round(doc.get('team_members', 0) / capacity, 2) if capacity else 0,
+        'unteamed': doc.get('unteamed', 0),
+    }
+
+
+def get_stats(event_ids):
+    """
+    Cached counters for `event_ids`. Events with no cached document, or one
+    older than EVENT_STATS['MAX_AGE'] seconds, are re-aggregated in one batch,
+    which also corrects any drift in the incremental counters.
+    """
+    event_ids = [str(i) for i in event_ids]
+    cached = EventStatsModel.get_many(event_ids)
+    oldest = datetime.datetime.utcnow() - datetime.timedelta(seconds=settings.EVENT_STATS['MAX_AGE'])
+    stale = [i for i in event_ids if i not in cached or cached[i].get('computed_at', oldest) <= oldest]
+    if stale:
+        # `writes` is read before aggregating, so increments made from here on
+        # make set_many leave the document alone
+        fresh = aggregate(stale)
+        EventStatsModel.set_many(fresh, {i: cached[i].get('writes') for i in stale if i in cached})
+        for event_id, values in fresh.items():
+            cached[event_id] = dict(cached.get(event_id) or {}, **values)
+    return [serialize_stats(event_id, cached[event_id]) for event_id in event_ids]
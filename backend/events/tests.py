@@ -0,0 +1,285 @@
+import datetime
+import io
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from core.testing import MongoQueryCountMixin, MongoTestCase
+from registrations.models import RegistrationModel
+from teams.models import TeamModel
+from users.models import UserModel
+from . import stats
+from .models import EventModel, EventStatsModel, parse_starts_at
+
+
+class SeatReservationTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.organizer = self.make_user('organizer')
+
+    def registered_count(self, event):
+        return EventModel.get_by_id(event['_id']).get('registered_count')
+
+    def test_reserve_seat_stops_at_capacity(self):
+        event = self.make_event(self.organizer, max_participants='2')
+        results = [EventModel.reserve_seat(event['_id']) for _ in range(3)]
+        self.assertEqual(results, [True, True, False])
+        self.assertEqual(self.registered_count(event), 2)
+
+        EventModel.release_seat(event['_id'])
+        self.assertEqual(self.registered_count(event), 1)
+
+    def test_concurrent_reservations_never_oversell(self):
+        event = self.make_event(self.organizer, max_participants='5')
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            results = list(pool.map(lambda _: EventModel.reserve_seat(event['_id']), range(20)))
+        self.assertEqual(results.count(True), 5)
+        self.assertEqual(self.registered_count(event), 5)
+
+    def test_reserve_seats_shrinks_to_what_is_left(self):
+        event = self.make_event(self.organizer, max_participants='5')
+        self.assertEqual(EventModel.reserve_seats(event['_id'], 3), 3)
+        self.assertEqual(EventModel.reserve_seats(event['_id'], 5), 2)
+        self.assertEqual(EventModel.reserve_seats(event['_id'], 1), 0)
+        self.assertEqual(self.registered_count(event), 5)
+
+    def test_no_capacity_means_unlimited(self):
+        event = self.make_event(self.organizer, max_participants='')
+        self.assertIsNone(event['capacity'])
+        self.assertTrue(all(EventModel.reserve_seat(event['_id']) for _ in range(10)))
+
+    def test_legacy_event_falls_back_to_max_participants(self):
+        # Stored before `capacity` and `registered_count` existed
+        result = EventModel.collection.insert_one({'title': 'Legacy', 'max_participants': '1'})
+        self.assertTrue(EventModel.reserve_seat(result.inserted_id))
+        self.assertFalse(EventModel.reserve_seat(result.inserted_id))
+
+    def test_register_endpoint_reports_full_event(self):
+        event = self.make_event(self.organizer, max_participants='1')
+        first, second = self.make_user(), self.make_user()
+        response = self.client.post('/api/registrations/', {'event': str(event['_id'])},
+                                    content_type='application/json', **self.auth(first))
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post('/api/registrations/', {'event': str(event['_id'])},
+                                    content_type='application/json', **self.auth(second))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.registered_count(event), 1)
+
+    def test_update_derives_capacity_from_max_participants_only(self):
+        event = self.make_event(self.organizer, max_participants='2')
+        EventModel.update(event['_id'], {'capacity': 50})
+        self.assertEqual(EventModel.get_by_id(event['_id'])['capacity'], 2)
+        EventModel.update(event['_id'], {'max_participants': '3', 'capacity': 50})
+        self.assertEqual(EventModel.get_by_id(event['_id'])['capacity'], 3)
+
+
+
+class EventStatsTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.organizer = self.make_user('organizer')
+        self.event = self.make_event(self.organizer)
+        self.event_id = str(self.event['_id'])
+        self.users = [str(self.make_user()['_id']) for _ in range(3)]
+        for user in self.users:
+            RegistrationModel.create({'user': user, 'event': self.event_id})
+
+    def stats(self):
+        response = self.client.get(f'/api/events/stats/?ids={self.event_id}', **self.auth(self.organizer))
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results'][0]
+
+    def stored(self):
+        return EventStatsModel.get_many([self.event_id])[self.event_id]
+
+    def test_counters_follow_registrations_and_teams(self):
+        TeamModel.create({'event': self.event_id, 'team_name': 'A', 'leader': self.users[0],
+                          'members': [self.users[0]], 'max_size': 2})
+        RegistrationModel.claim_team(self.users[0], self.event_id, 'team')
+        self.assertEqual(self.stats(), {'event': self.event_id, 'registrations': 3, 'cancellations': 0,
+                                        'teams': 1, 'average_team_fill': 0.5, 'unteamed': 2})
+
+    def test_cancellation_before_first_read_is_kept(self):
+        EventStatsModel.add(self.event_id, cancellations=1)
+        self.assertEqual(self.stats()['cancellations'], 1)
+        self.assertEqual(self.stored()['cancellations'], 1)
+
+    def test_stale_counters_are_recomputed(self):
+        long_ago = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+        # Drift, written without add() so no increment is pending
+        EventStatsModel.collection.update_one({'_id': self.event_id},
+                                              {'$set': {'registrations': 99, 'computed_at': long_ago}})
+        self.assertEqual(self.stats()['registrations'], 3)
+        self.assertEqual(self.stored()['registrations'], 3)
+
+    def test_increments_during_a_recompute_are_not_overwritten(self):
+        aggregate = stats.aggregate
+
+        def racing_aggregate(event_ids):
+            fresh = aggregate(event_ids)
+            # A registration lands after the $group has counted
+            RegistrationModel.create({'user': str(self.make_user()['_id']), 'event': self.event_id})
+            return fresh
+
+        with mock.patch.object(stats, 'aggregate', racing_aggregate):
+            self.assertEqual(self.stats()['registrations'], 3)
+        stored = self.stored()
+        self.assertEqual(stored['registrations'], 4)
+        # Left uncomputed, so the next read aggregates again
+        self.assertNotIn('computed_at', stored)
+        self.assertEqual(self.stats()['registrations'], 4)
+
+
+class CatalogueQueryTests(MongoQueryCountMixin, MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        organizers = [self.make_user('organizer') for _ in range(3)]
+        self.events = [self.make_event(organizers[i % 3], title=f'Event {i}') for i in range(15)]
+
+    def test_list_query_count_does_not_grow_with_the_page(self):
+        # Versions, the page itself and one $in for all the organizers
+        with self.assertMaxQueries(3):
+            response = self.client.get('/api/events/?limit=10&fields=id,title,organizer_details')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 10)
+
+    def test_filtered_and_upcoming_lists(self):
+        for path in ('/api/events/?category=Tech&status=upcoming', '/api/events/?upcoming=true'):
+            with self.subTest(path=path), self.assertMaxQueries(3):
+                self.assertEqual(self.client.get(path).status_code, 200)
+
+    def test_detail_query_count(self):
+        path = f"/api/events/{self.events[0]['_id']}/"
+        with self.assertMaxQueries(3):
+            self.assertEqual(self.client.get(path).status_code, 200)
+        # Served from the response cache: only the version lookup
+        with self.assertMaxQueries(1):
+            self.assertEqual(self.client.get(path).status_code, 200)
+
+
+class EventSearchTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        organizer = self.make_user('organizer')
+        self.workshop = self.make_event(organizer, title='Python Workshop')
+        # Newer, so it would come first if relevance were ignored
+        self.meetup = self.make_event(organizer, title='Data Meetup', description='An intro to python basics')
+
+    def test_title_matches_rank_above_description_matches(self):
+        events, has_more, prefix_mode = EventModel.search('python')
+        self.assertEqual([e['_id'] for e in events], [self.workshop['_id'], self.meetup['_id']])
+        self.assertEqual((has_more, prefix_mode), (False, False))
+
+    def test_partial_word_falls_back_to_prefixes(self):
+        # Only title, category and location are prefix-indexed
+        events, _, prefix_mode = EventModel.search('pyth')
+        self.assertEqual([e['_id'] for e in events], [self.workshop['_id']])
+        self.assertTrue(prefix_mode)
+
+    def test_search_pages_by_offset(self):
+        self.make_event(self.make_user('organizer'), title='Python Sprint')
+        response = self.client.get('/api/events/?search=python&limit=2')
+        first = response.json()
+        self.assertEqual(len(first['results']), 2)
+        response = self.client.get(f"/api/events/?search=python&limit=2&cursor={first['next']}")
+        second = response.json()
+        self.assertEqual(len(second['results']), 1)
+        self.assertIsNone(second['next'])
+        ids = {e['id'] for e in first['results'] + second['results']}
+        self.assertEqual(len(ids), 3)
+
+    def test_suggest_matches_every_word_as_a_prefix(self):
+        response = self.client.get('/api/events/suggest/', {'q': 'py wor'})
+        self.assertEqual([e['id'] for e in response.json()], [str(self.workshop['_id'])])
+        self.assertEqual(self.client.get('/api/events/suggest/?q=p').json(), [])
+
+
+class CatalogueCacheTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.organizer = self.make_user('organizer')
+        self.event = self.make_event(self.organizer)
+        self.path = f"/api/events/{self.event['_id']}/"
+
+    def test_matching_if_none_match_gets_a_304(self):
+        response = self.client.get(self.path)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response = self.client.get(self.path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get('/api/events/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_event_update_changes_body_and_etag(self):
+        etag = self.client.get(self.path)['ETag']
+        EventModel.update(self.event['_id'], {'title': 'Renamed'})
+        response = self.client.get(self.path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['title'], 'Renamed')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_organizer_rename_invalidates_cached_details(self):
+        self.client.get(self.path)
+        UserModel.update(self.organizer['_id'], {'name': 'Renamed Organizer'})
+        self.assertEqual(self.client.get(self.path).json()['organizer_details']['name'], 'Renamed Organizer')
+
+    def test_errors_are_not_cached(self):
+        missing = '/api/events/000000000000000000000000/'
+        self.assertEqual(self.client.get(missing).status_code, 404)
+        self.assertNotIn('ETag', self.client.get(missing))
+
+
+class ParseStartsAtTests(SimpleTestCase):
+    def test_date_and_time_are_combined(self):
+        self.assertEqual(parse_starts_at('2030-01-01', '10:30'), datetime.datetime(2030, 1, 1, 10, 30))
+
+    def test_offsets_are_converted_to_naive_utc(self):
+        self.assertEqual(parse_starts_at('2030-01-01T10:00+02:00'), datetime.datetime(2030, 1, 1, 8))
+        self.assertEqual(parse_starts_at('2030-01-01T10:00Z'), datetime.datetime(2030, 1, 1, 10))
+
+    def test_bad_time_falls_back_to_the_date(self):
+        self.assertEqual(parse_starts_at('2030-01-01', 'morning'), datetime.datetime(2030, 1, 1))
+
+    def test_unparsable_is_none(self):
+        self.assertIsNone(parse_starts_at('next tuesday'))
+        self.assertIsNone(parse_starts_at(None))
+
+
+class StartsAtFilterTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.organizer = self.make_user('organizer')
+        self.events = {day: self.make_event(self.organizer, title=f'Day {day}', date=f'2030-01-0{day}')
+                       for day in (3, 1, 2)}
+
+    def titles(self, query):
+        response = self.client.get(f'/api/events/?{query}&fields=title')
+        self.assertEqual(response.status_code, 200)
+        return [e['title'] for e in response.json()['results']]
+
+    def test_create_and_update_derive_starts_at(self):
+        event = self.events[1]
+        self.assertEqual(EventModel.get_by_id(event['_id'])['starts_at'], datetime.datetime(2030, 1, 1, 10))
+        EventModel.update(event['_id'], {'time': '18:00', 'starts_at': datetime.datetime(2000, 1, 1)})
+        self.assertEqual(EventModel.get_by_id(event['_id'])['starts_at'], datetime.datetime(2030, 1, 1, 18))
+
+    def test_range_is_soonest_first(self):
+        self.assertEqual(self.titles('from=2030-01-01'), ['Day 1', 'Day 2', 'Day 3'])
+        self.assertEqual(self.titles('from=2030-01-02T00:00Z'), ['Day 2', 'Day 3'])
+
+    def test_bare_to_date_covers_the_whole_day(self):
+        self.assertEqual(self.titles('to=2030-01-02'), ['Day 1', 'Day 2'])
+        self.assertEqual(self.titles('to=2030-01-02T09:00'), ['Day 1'])
+
+    def test_upcoming_leaves_out_past_events(self):
+        self.make_event(self.organizer, title='Past', date='2001-01-01')
+        self.assertEqual(self.titles('upcoming=true'), ['Day 1', 'Day 2', 'Day 3'])
+
+    def test_invalid_dates_are_rejected(self):
+        self.assertEqual(self.client.get('/api/events/?from=soon').status_code, 400)
+
+    def test_backfill_fills_missing_starts_at(self):
+        EventModel.collection.update_many({}, {'$unset': {'starts_at': 1}})
+        call_command('backfill_starts_at', stdout=io.StringIO())
+        self.assertEqual(self.titles('from=2030-01-01'), ['Day 1', 'Day 2', 'Day 3'])
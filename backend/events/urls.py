@@ -1,8 +1,16 @@
+from django.conf import settings
 from django.urls import path
-from .views import EventListCreateView, EventDetailView, OrganizerEventsView
+from .views import EventListCreateView, EventDetailView, OrganizerEventsView, EventSuggestView, EventStatsView
+from .async_views import AsyncEventListCreateView, AsyncEventDetailView
+
+# Under ASGI the hot read paths are served by native async views
+list_view = AsyncEventListCreateView if settings.ASYNC_VIEWS else EventListCreateView
+detail_view = AsyncEventDetailView if settings.ASYNC_VIEWS else EventDetailView
 
 urlpatterns = [
-    path('', EventListCreateView.as_view(), name='event-list-create'),
+    path('', list_view.as_view(), name='event-list-create'),
+    path('suggest/', EventSuggestView.as_view(), name='event-suggest'),
     path('my-events/', OrganizerEventsView.as_view(), name='organizer-events'),
-    path('<str:pk>/', EventDetailView.as_view(), name='event-detail'),
+    path('stats/', EventStatsView.as_view(), name='event-stats'),
+    path('<str:pk>/', detail_view.as_view(), name='event-detail'),
 ]
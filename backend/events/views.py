@@ -2,38 +2,135 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from .models import EventModel
-from users.models import UserModel
+from pymongo import DESCENDING
+from .models import EventModel, STARTS_AT_SORT, parse_starts_at, projection_for
+from .stats import get_stats
+from core.mongo import to_object_ids
 from core.permissions import IsOrganizer
+from core.loaders import get_loaders
+from core.pagination import get_page_params, page_response_data, encode_cursor, InvalidPageParams, DEFAULT_SORT
+from core.http_cache import cached_json_response
+from core.fields import get_fields_param, InvalidFields
 import datetime
 
+# Collections whose writes change catalogue responses (events + organizer names)
+CATALOGUE_COLLECTIONS = ('events', 'users')
+
+# Events per stats request
+MAX_STATS_EVENTS = 100
+
+# Every field serialize_event can emit, in response order
+EVENT_FIELDS = (
+    'id', 'title', 'description', 'category', 'date', 'time', 'starts_at', 'location', 'banner_image',
+    'max_participants', 'organizer', 'organizer_details', 'status', 'created_at',
+)
+# Default for listings: what the event cards render. Leaves out the long
+# description and the organizer lookup; detail views return EVENT_FIELDS.
+EVENT_SUMMARY_FIELDS = (
+    'id', 'title', 'category', 'date', 'time', 'starts_at', 'location', 'banner_image',
+    'max_participants', 'organizer', 'status',
+)
+
 # Helper to serialize MongoDB documents securely
-def serialize_event(event):
+def serialize_event(event, loaders=None, fields=EVENT_FIELDS):
     if not event: return None
-    
-    # Resolve Organizer Name
-    organizer = UserModel.get_by_id(event.get('organizer'))
-    organizer_details = {
-        'id': str(organizer['_id']),
-        'name': organizer.get('name'),
-        'email': organizer.get('email')
-    } if organizer else None
-
-    return {
-        'id': str(event.get('_id')),
-        'title': event.get('title'),
-        'description': event.get('description'),
-        'category': event.get('category'),
-        'date': event.get('date'),
-        'time': event.get('time'),
-        'location': event.get('location'),
-        'banner_image': event.get('banner_image'),
-        'max_participants': event.get('max_participants'),
-        'organizer': event.get('organizer'), # store as string 
-        'organizer_details': organizer_details,
-        'status': event.get('status'),
-        'created_at': event.get('created_at')
-    }
+
+    data = {}
+    for field in fields:
+        if field == 'id':
+            data['id'] = str(event.get('_id'))
+        elif field == 'starts_at':
+            starts_at = event.get('starts_at')
+            data['starts_at'] = starts_at.isoformat() + 'Z' if starts_at else None
+        elif field == 'organizer_details':
+            # Resolve Organizer Name (batched when the caller primed the loader)
+            organizer = (loaders or get_loaders()).users.load(event.get('organizer'))
+            data['organizer_details'] = {
+                'id': str(organizer['_id']),
+                'name': organizer.get('name'),
+                'email': organizer.get('email')
+            } if organizer else None
+        else:
+            data[field] = event.get(field)
+    return data
+
+def serialize_events(events, loaders, fields=EVENT_FIELDS):
+    # Fetch every organizer in one query instead of one per event
+    if 'organizer_details' in fields:
+        loaders.users.prime(e.get('organizer') for e in events)
+    return [serialize_event(e, loaders, fields) for e in events]
+
+def get_list_fields(request):
+    # ?fields=title,date narrows listings further; raises InvalidFields
+    return get_fields_param(request, EVENT_FIELDS, EVENT_SUMMARY_FIELDS)
+
+class InvalidDateFilter(ValueError):
+    pass
+
+def upcoming_since(request):
+    # ?upcoming=true means "starting from now", rounded to the minute so the
+    # response cache can share a page for that minute (see catalogue_vary)
+    if request.query_params.get('upcoming') != 'true':
+        return None
+    return datetime.datetime.utcnow().replace(second=0, microsecond=0)
+
+def catalogue_vary(request):
+    since = upcoming_since(request)
+    return since.isoformat() if since else None
+
+def parse_date_filter(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None, False
+    parsed = parse_starts_at(value)
+    if parsed is None:
+        raise InvalidDateFilter(f'{name} must be an ISO 8601 date or datetime')
+    # A bare date covers that whole day
+    return parsed, len(value.strip()) == 10
+
+def starts_at_filter(request):
+    """?from= / ?to= / ?upcoming=true as one range on starts_at, or None."""
+    date_range = {}
+    start, _ = parse_date_filter(request, 'from')
+    since = upcoming_since(request)
+    if start or since:
+        date_range['$gte'] = max(d for d in (start, since) if d)
+    end, whole_day = parse_date_filter(request, 'to')
+    if end:
+        if whole_day:
+            date_range['$lt'] = end + datetime.timedelta(days=1)
+        else:
+            date_range['$lte'] = end
+    return date_range or None
+
+def event_list_params(request):
+    """
+    Parses the catalogue filters, paging, fieldset and sort for the sync and
+    async list views. Returns (filters, search, limit, after, fields, sort);
+    raises InvalidPageParams, InvalidFields or InvalidDateFilter.
+    """
+    category = request.query_params.get('category')
+    search = (request.query_params.get('search') or '').strip()
+    status_filter = request.query_params.get('status')
+
+    filters = {}
+    if category: filters['category'] = category
+    if status_filter: filters['status'] = status_filter
+    sort = DEFAULT_SORT
+    date_range = starts_at_filter(request)
+    if date_range:
+        # Served by the *_starts_at indexes as one range scan, soonest first
+        filters['starts_at'] = date_range
+        sort = STARTS_AT_SORT
+
+    limit, after = get_page_params(request, None if search else sort)
+    if search:
+        # Ranked results have no stable keyset, so search pages by offset
+        after = after or {}
+        offset = after.get('offset', 0)
+        if not isinstance(offset, int) or offset < 0:
+            raise InvalidPageParams('Invalid cursor')
+    return filters, search, limit, after, get_list_fields(request), sort
 
 class EventListCreateView(APIView):
     def get_permissions(self):
@@ -42,17 +139,24 @@ class EventListCreateView(APIView):
         return [AllowAny()]
 
     def get(self, request):
-        category = request.query_params.get('category')
-        search = request.query_params.get('search')
-        status_filter = request.query_params.get('status')
+        # Anonymous and read-heavy: served from the versioned response cache
+        return cached_json_response(request, CATALOGUE_COLLECTIONS, lambda: self.list_data(request),
+                                    vary=catalogue_vary(request))
 
-        filters = {}
-        if category: filters['category'] = category
-        if status_filter: filters['status'] = status_filter
-        if search: filters['title'] = {'$regex': search, '$options': 'i'}
+    def list_data(self, request):
+        try:
+            filters, search, limit, after, fields, sort = event_list_params(request)
+        except (InvalidPageParams, InvalidFields, InvalidDateFilter) as e:
+            return {'error': str(e)}, status.HTTP_400_BAD_REQUEST
 
-        events = EventModel.get_all(filters)
-        return Response([serialize_event(e) for e in events])
+        projection = projection_for(fields)
+        if search:
+            offset = after.get('offset', 0)
+            events, has_more, prefix_mode = EventModel.search(search, filters, limit, offset, after.get('prefix'), projection)
+            next_cursor = encode_cursor({'offset': offset + limit, 'prefix': prefix_mode}) if has_more else None
+        else:
+            events, next_cursor = EventModel.get_page(filters, limit, after, projection, sort)
+        return page_response_data(serialize_events(events, get_loaders(request), fields), next_cursor), status.HTTP_200_OK
 
     def post(self, request):
         data = request.data.dict() if hasattr(request.data, 'dict') else request.data.copy()
@@ -75,9 +179,12 @@ class EventDetailView(APIView):
         return [AllowAny()]
         
     def get(self, request, pk):
+        return cached_json_response(request, CATALOGUE_COLLECTIONS, lambda: self.detail_data(request, pk))
+
+    def detail_data(self, request, pk):
         event = EventModel.get_by_id(pk)
-        if not event: return Response({'detail': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
-        return Response(serialize_event(event))
+        if not event: return {'detail': 'Not found'}, status.HTTP_404_NOT_FOUND
+        return serialize_event(event, get_loaders(request)), status.HTTP_200_OK
         
     def put(self, request, pk):
         event = EventModel.get_by_id(pk)
@@ -107,9 +214,44 @@ class EventDetailView(APIView):
         EventModel.delete(pk)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+class EventSuggestView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        # Autocomplete: every word in ?q= is matched as a prefix
+        events = EventModel.suggest(request.query_params.get('q', ''))
+        return Response([{
+            'id': str(e['_id']),
+            'title': e.get('title'),
+            'category': e.get('category')
+        } for e in events])
+
 class OrganizerEventsView(APIView):
     permission_classes = [IsAuthenticated, IsOrganizer]
     
     def get(self, request):
-        events = EventModel.get_all({'organizer': str(request.user['_id'])})
-        return Response([serialize_event(e) for e in events])
+        try:
+            limit, after = get_page_params(request)
+            fields = get_list_fields(request)
+        except (InvalidPageParams, InvalidFields) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        events, next_cursor = EventModel.get_page({'organizer': str(request.user['_id'])}, limit, after,
+                                                  projection_for(fields))
+        return Response(page_response_data(serialize_events(events, get_loaders(request), fields), next_cursor))
+
+class EventStatsView(APIView):
+    permission_classes = [IsAuthenticated, IsOrganizer]
+
+    def get(self, request):
+        # ?ids=a,b,c picks events; by default the organizer's most recent ones
+        query = {'organizer': str(request.user['_id'])}
+        ids = [i for i in request.query_params.get('ids', '').split(',') if i]
+        if ids:
+            if len(ids) > MAX_STATS_EVENTS:
+                return Response({'error': f'At most {MAX_STATS_EVENTS} ids are allowed'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            query['_id'] = {'$in': to_object_ids(ids)}
+        # Ids of events owned by someone else are silently left out
+        owned = EventModel.collection.find(query, {'_id': 1}).sort('_id', DESCENDING).limit(MAX_STATS_EVENTS)
+        return Response({'results': get_stats(str(e['_id']) for e in owned)})
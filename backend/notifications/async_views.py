@@ -0,0 +1,26 @@
+from rest_framework.permissions import IsAuthenticated
+from core.async_views import AsyncAPIView
+from core.pagination import get_page_params, page_response_data, InvalidPageParams
+from .models import NotificationModel, NotificationCounterModel
+from .views import UserNotificationsView, UnreadCountView, serialize_notification
+
+class AsyncUserNotificationsView(AsyncAPIView):
+    sync_view = UserNotificationsView
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request):
+        user_id = str(request.user['_id'])
+        try:
+            limit, after = get_page_params(request)
+        except InvalidPageParams as e:
+            return self.respond({'error': str(e)}, status=400)
+
+        notifs, next_cursor = await NotificationModel.aget_page(user_id, limit, after)
+        return self.respond(page_response_data([serialize_notification(n) for n in notifs], next_cursor))
+
+class AsyncUnreadCountView(AsyncAPIView):
+    sync_view = UnreadCountView
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request):
+        return self.respond({'unread': await NotificationCounterModel.aget(request.user['_id'])})
@@ -1,13 +1,44 @@
+import asyncio
 import json
+from collections import deque
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
 from urllib.parse import parse_qs
+from rest_framework import exceptions
+from users.authentication import PyMongoJWTAuthentication
+from .models import NotificationModel
 
 class NotificationConsumer(AsyncWebsocketConsumer):
+    """
+    Pushes a user's notifications over a websocket.
+
+    Frames are a single notification object, or {"batch": [...], "dropped": n}
+    when several arrive within the coalescing window (or on backlog replay),
+    or {"summary": {"missed": n}} when the client is too slow and the
+    'summarize' overflow policy is active; it should then refetch over REST.
+    """
     async def connect(self):
-        # Allow any connection, we will identify by group
+        # Browsers cannot set headers on a websocket, so the access token
+        # comes in the query string; the user is whoever it was issued to
         query_string = self.scope['query_string'].decode()
         query_params = parse_qs(query_string)
-        user_id = query_params.get('user_id', [None])[0]
+        token = query_params.get('token', [None])[0]
+        user_id = None
+        if token:
+            try:
+                user_id = str(PyMongoJWTAuthentication().decode_jwt(token).get('user_id') or '')
+            except exceptions.AuthenticationFailed:
+                user_id = None
+        since = query_params.get('since', [None])[0]
+
+        options = settings.NOTIFICATION_SOCKET
+        self.coalesce_window = options['COALESCE_WINDOW']
+        self.max_queue = options['MAX_QUEUE']
+        self.overflow_policy = options['OVERFLOW_POLICY']
+        # Bounded per-connection send queue, drained by a single flusher task
+        self.pending = deque()
+        self.dropped = 0
+        self.flusher = None
         
         if user_id:
             self.room_group_name = f'user_notifications_{user_id}'
@@ -16,19 +47,59 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 self.channel_name
             )
             await self.accept()
+            if since:
+                await self.replay(user_id, since, options['REPLAY_LIMIT'])
         else:
             await self.close()
 
     async def disconnect(self, close_code):
+        if self.flusher is not None:
+            self.flusher.cancel()
         if hasattr(self, 'room_group_name'):
             await self.channel_layer.group_discard(
                 self.room_group_name,
                 self.channel_name
             )
 
+    async def replay(self, user_id, since, limit):
+        # Everything the client missed while disconnected, in one frame
+        notifs, truncated = await NotificationModel.aget_since(user_id, since, limit)
+        if notifs or truncated:
+            await self.send(text_data=json.dumps({
+                'batch': [NotificationModel.realtime_payload(n) for n in notifs],
+                'dropped': 0,
+                'truncated': truncated
+            }))
+
     async def notification_message(self, event):
         # We now pass the entire notification dict from utils
         notification = event.get('notification', {})
-        
-        # Send message to WebSocket
-        await self.send(text_data=json.dumps(notification))
+
+        if len(self.pending) >= self.max_queue:
+            self.dropped += 1
+            if self.overflow_policy == 'drop_oldest':
+                self.pending.popleft()
+                self.pending.append(notification)
+        else:
+            self.pending.append(notification)
+
+        if self.flusher is None:
+            self.flusher = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        try:
+            await asyncio.sleep(self.coalesce_window)
+            # Messages that arrive while a frame is being written wait for the next one
+            while self.pending or self.dropped:
+                batch, self.pending = list(self.pending), deque()
+                dropped, self.dropped = self.dropped, 0
+                await self.send(text_data=json.dumps(self.frame(batch, dropped)))
+        finally:
+            self.flusher = None
+
+    def frame(self, batch, dropped):
+        if dropped and self.overflow_policy == 'summarize':
+            return {'summary': {'missed': len(batch) + dropped}}
+        if len(batch) == 1 and not dropped:
+            return batch[0]
+        return {'batch': batch, 'dropped': dropped}
@@ -0,0 +1,116 @@
+import datetime
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from registrations.models import RegistrationModel
+from .models import NotificationModel, NotificationJobModel
+
+logger = logging.getLogger(__name__)
+
+# Broadcasts run off the request thread; jobs are tracked in Mongo so any
+# worker can answer the status endpoint. They are not durable: a job lives in
+# the pool of the process that accepted it, and is lost if that process exits.
+_executor = ThreadPoolExecutor(
+    max_workers=settings.NOTIFICATION_FANOUT['WORKERS'],
+    thread_name_prefix='notification-fanout',
+)
+
+# This process's queued and running jobs. Their heartbeat is refreshed with
+# every chunk sent, so only jobs of a dead process go stale.
+_active = set()
+_active_lock = threading.Lock()
+
+
+def _heartbeat():
+    with _active_lock:
+        job_ids = list(_active)
+    NotificationJobModel.heartbeat(job_ids)
+
+
+def fail_orphaned_jobs():
+    """Marks jobs left queued/running by a process that exited as failed."""
+    failed = NotificationJobModel.fail_stale(settings.NOTIFICATION_FANOUT['STALE_AFTER'])
+    if failed:
+        logger.warning('Marked %d orphaned notification broadcasts as failed', failed)
+    return failed
+
+
+def recover_on_startup():
+    """
+    Called by the WSGI/ASGI entry points. Sweeps in the background now, and
+    again once STALE_AFTER has passed, since jobs of the process this one
+    replaced only go stale then.
+    """
+    def sweep():
+        try:
+            fail_orphaned_jobs()
+        except Exception:
+            logger.exception('Sweeping orphaned notification broadcasts failed')
+
+    _executor.submit(sweep)
+    timer = threading.Timer(settings.NOTIFICATION_FANOUT['STALE_AFTER'], _executor.submit, args=(sweep,))
+    timer.daemon = True
+    timer.start()
+
+
+def start_broadcast(event_id, message, notif_type, created_by):
+    """Queues a notification to every participant of `event_id` and returns the job."""
+    job = NotificationJobModel.create({
+        'event': str(event_id),
+        'created_by': str(created_by),
+        'message': message,
+        'type': notif_type,
+        'total': RegistrationModel.collection.count_documents({'event': str(event_id)}),
+        'created_at': datetime.datetime.utcnow().isoformat(),
+    })
+    with _active_lock:
+        _active.add(job['_id'])
+    _executor.submit(run_broadcast, job['_id'])
+    return job
+
+
+def run_broadcast(job_id):
+    try:
+        if NotificationJobModel.claim(job_id):
+            _run_broadcast(job_id)
+    finally:
+        with _active_lock:
+            _active.discard(job_id)
+
+
+def _run_broadcast(job_id):
+    job = NotificationJobModel.get_by_id(job_id)
+    chunk_size = settings.NOTIFICATION_FANOUT['CHUNK_SIZE']
+    try:
+        regs = RegistrationModel.collection.find({'event': job['event']}, {'user': 1}).batch_size(chunk_size)
+        chunk = []
+        for reg in regs:
+            chunk.append({
+                'user': reg.get('user'),
+                'message': job['message'],
+                'type': job['type'],
+                'is_read': False,
+                'created_at': datetime.datetime.utcnow().isoformat()
+            })
+            if len(chunk) >= chunk_size:
+                NotificationModel.create_many(chunk)
+                NotificationJobModel.add_progress(job_id, len(chunk))
+                _heartbeat()
+                chunk = []
+        if chunk:
+            NotificationModel.create_many(chunk)
+            NotificationJobModel.add_progress(job_id, len(chunk))
+    except Exception as e:
+        logger.exception('Notification broadcast %s failed', job_id)
+        NotificationJobModel.update(job_id, {
+            'status': 'failed',
+            'error': str(e),
+            'finished_at': datetime.datetime.utcnow().isoformat(),
+        })
+        return
+
+    NotificationJobModel.update(job_id, {
+        'status': 'completed',
+        'finished_at': datetime.datetime.utcnow().isoformat(),
+    })
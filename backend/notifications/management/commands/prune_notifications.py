@@ -0,0 +1,51 @@
+import datetime
+from bson.objectid import ObjectId
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from notifications.models import NotificationModel, NotificationCounterModel, read_expiry
+
+
+class Command(BaseCommand):
+    help = ('Permanently deletes unread notifications older than NOTIFICATION_RETENTION["UNREAD_DAYS"] '
+            '(nothing is archived), schedules TTL expiry for read ones and optionally rebuilds the unread counters')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reconcile', action='store_true',
+                            help='Recompute every unread counter from the notifications collection')
+
+    def handle(self, *args, **options):
+        collection = NotificationModel.collection
+
+        # Read before expire_at existed (or before this policy): let the TTL index take them
+        scheduled = collection.update_many(
+            {'is_read': True, 'expire_at': {'$exists': False}},
+            {'$set': {'expire_at': read_expiry()}}
+        ).modified_count
+
+        # TTL deletes would skip the counters, so stale unread ones are removed here per user
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=settings.NOTIFICATION_RETENTION['UNREAD_DAYS'])
+        stale = {'is_read': False, '_id': {'$lt': ObjectId.from_datetime(cutoff)}}
+        deleted_unread = 0
+        for row in list(collection.aggregate([{'$match': stale}, {'$group': {'_id': '$user'}}], allowDiskUse=True)):
+            deleted = collection.delete_many(dict(stale, user=row['_id'])).deleted_count
+            if deleted:
+                NotificationCounterModel.add(row['_id'], -deleted)
+                deleted_unread += deleted
+
+        if options['reconcile']:
+            counts = {
+                row['_id']: row['count']
+                for row in collection.aggregate([
+                    {'$match': {'is_read': False}},
+                    {'$group': {'_id': '$user', 'count': {'$sum': 1}}}
+                ], allowDiskUse=True)
+            }
+            # Users with a counter but no unread notifications go back to zero
+            for doc in NotificationCounterModel.collection.find({'unread': {'$ne': 0}}, {'_id': 1}):
+                counts.setdefault(doc['_id'], 0)
+            NotificationCounterModel.set_many(counts)
+            self.stdout.write(f'Rebuilt {len(counts)} unread counters')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Scheduled expiry for {scheduled} read notifications, deleted {deleted_unread} stale unread'
+        ))
@@ -1,12 +1,39 @@
-from core.mongo import db
+import datetime
+import logging
+from collections import Counter
+from django.conf import settings
+from core.mongo import db, get_async_db, read_collection
+from core.pagination import fetch_page, afetch_page
 from bson.objectid import ObjectId
+from pymongo import IndexModel, UpdateOne, ASCENDING, DESCENDING
+
+logger = logging.getLogger(__name__)
+
+def read_expiry():
+    # Read notifications are removed by the expire_at TTL index after READ_DAYS
+    return datetime.datetime.utcnow() + datetime.timedelta(days=settings.NOTIFICATION_RETENTION['READ_DAYS'])
 
 class NotificationModel:
     collection = db['notifications']
 
+    indexes = [
+        IndexModel([('user', ASCENDING), ('_id', DESCENDING)], name='user_id_order'),
+        IndexModel([('is_read', ASCENDING), ('_id', ASCENDING)], name='unread_age'),
+        IndexModel([('expire_at', ASCENDING)], name='expire_at_ttl', expireAfterSeconds=0),
+    ]
+
+    query_shapes = [
+        {'filter': {'user': 'x'}, 'sort': [('_id', DESCENDING)]},
+        {'filter': {'user': 'x', 'is_read': False}},
+        {'filter': {'user': 'x', '_id': {'$gt': ObjectId('000000000000000000000000')}}, 'sort': [('_id', DESCENDING)]},
+        {'filter': {'is_read': False, '_id': {'$lt': ObjectId('000000000000000000000000')}}},
+    ]
+
     @classmethod
-    def get_user_notifications(cls, user_id):
-        return list(cls.collection.find({'user': str(user_id)}).sort('created_at', -1))
+    def get_page(cls, user_id, limit=10, after=None):
+        # Newest first on the user_id_order index; the limit is applied by Mongo.
+        # Inbox reads may lag on a secondary; the unread badge reads the primary.
+        return fetch_page(read_collection(cls.collection), {'user': str(user_id)}, limit, after)
 
     @classmethod
     def get_by_id(cls, notif_id):
@@ -15,34 +42,238 @@ class NotificationModel:
         except:
             return None
 
+    @classmethod
+    def realtime_payload(cls, data):
+        return {
+            'id': str(data['_id']),
+            'message': data.get('message'),
+            'type': data.get('type'),
+            'is_read': data.get('is_read', False),
+            'created_at': data.get('created_at')
+        }
+
     @classmethod
     def create(cls, data):
+        data.setdefault('is_read', False)
         result = cls.collection.insert_one(data)
         data['_id'] = result.inserted_id
+        if not data['is_read']:
+            NotificationCounterModel.add(data['user'], 1)
         
         # trigger socket
         try:
             from notifications.utils import send_realtime_notification
-            send_realtime_notification(data['user'], {
-                'id': str(data['_id']),
-                'message': data.get('message'),
-                'type': data.get('type'),
-                'is_read': data.get('is_read', False),
-                'created_at': data.get('created_at')
-            })
-        except Exception as e:
-            print("WebSocket notification omitted/failed:", str(e))
+            send_realtime_notification(data['user'], cls.realtime_payload(data))
+        except Exception:
+            logger.exception('WebSocket notification failed for user %s', data['user'])
             
         return data
 
+    @classmethod
+    def create_many(cls, docs):
+        """
+        Inserts one batch with a single insert_many and pushes the realtime
+        messages for the whole batch at once. Callers chunk large fan-outs.
+        """
+        if not docs:
+            return []
+        for data in docs:
+            data.setdefault('is_read', False)
+        result = cls.collection.insert_many(docs, ordered=False)
+        for data, inserted_id in zip(docs, result.inserted_ids):
+            data['_id'] = inserted_id
+        NotificationCounterModel.add_many(Counter(d['user'] for d in docs if not d['is_read']))
+
+        try:
+            from notifications.utils import send_realtime_notifications
+            send_realtime_notifications([(d['user'], cls.realtime_payload(d)) for d in docs])
+        except Exception:
+            logger.exception('WebSocket notifications failed for a batch of %d', len(docs))
+
+        return docs
+
     @classmethod
     def mark_read(cls, notif_id):
         try:
-            cls.collection.update_one({'_id': ObjectId(notif_id)}, {'$set': {'is_read': True}})
+            # Only the unread -> read transition touches the counter
+            notif = cls.collection.find_one_and_update(
+                {'_id': ObjectId(notif_id), 'is_read': False},
+                {'$set': {'is_read': True, 'expire_at': read_expiry()}},
+                projection={'user': 1}
+            )
+            if notif:
+                NotificationCounterModel.add(notif['user'], -1)
             return True
         except:
             return False
 
     @classmethod
     def mark_all_read(cls, user_id):
-        cls.collection.update_many({'user': str(user_id), 'is_read': False}, {'$set': {'is_read': True}})
+        result = cls.collection.update_many(
+            {'user': str(user_id), 'is_read': False},
+            {'$set': {'is_read': True, 'expire_at': read_expiry()}}
+        )
+        # Decrement by what was actually flipped so concurrent inserts are not lost
+        if result.modified_count:
+            NotificationCounterModel.add(user_id, -result.modified_count)
+
+    # Async API used by the async views and the websocket consumer
+
+    @classmethod
+    def acollection(cls):
+        return get_async_db()[cls.collection.name]
+
+    @classmethod
+    async def aget_page(cls, user_id, limit=10, after=None):
+        return await afetch_page(read_collection(cls.acollection()), {'user': str(user_id)}, limit, after)
+
+    @classmethod
+    async def aget_since(cls, user_id, since_id, limit=100):
+        """
+        Notifications created after `since_id`, oldest first, capped at the
+        newest `limit`. Returns (notifications, truncated).
+        """
+        try:
+            since = ObjectId(since_id)
+        except:
+            return [], False
+        cursor = cls.acollection().find({'user': str(user_id), '_id': {'$gt': since}}).sort('_id', -1).limit(limit + 1)
+        docs = await cursor.to_list(None)
+        return list(reversed(docs[:limit])), len(docs) > limit
+
+    @classmethod
+    async def acreate(cls, data):
+        data.setdefault('is_read', False)
+        result = await cls.acollection().insert_one(data)
+        data['_id'] = result.inserted_id
+        if not data['is_read']:
+            await NotificationCounterModel.aadd(data['user'], 1)
+
+        # Already on the event loop, so talk to the channel layer directly
+        try:
+            from notifications.utils import asend_realtime_notification
+            await asend_realtime_notification(data['user'], cls.realtime_payload(data))
+        except Exception:
+            logger.exception('WebSocket notification failed for user %s', data['user'])
+
+        return data
+
+class NotificationCounterModel:
+    """
+    Stored unread count per user ({_id: user_id, unread: n}), kept in step by
+    NotificationModel so the badge never has to scan the inbox.
+    """
+    collection = db['notification_counters']
+
+    # Counters are only ever addressed by _id (the user id)
+    indexes = []
+    query_shapes = []
+
+    @classmethod
+    def get(cls, user_id):
+        doc = cls.collection.find_one({'_id': str(user_id)})
+        return max(doc.get('unread', 0), 0) if doc else 0
+
+    @classmethod
+    def add(cls, user_id, amount):
+        cls.collection.update_one({'_id': str(user_id)}, {'$inc': {'unread': amount}}, upsert=True)
+
+    @classmethod
+    def add_many(cls, amounts):
+        ops = [UpdateOne({'_id': str(user_id)}, {'$inc': {'unread': amount}}, upsert=True)
+               for user_id, amount in amounts.items() if amount]
+        if ops:
+            cls.collection.bulk_write(ops, ordered=False)
+
+    @classmethod
+    def set_many(cls, counts):
+        ops = [UpdateOne({'_id': str(user_id)}, {'$set': {'unread': count}}, upsert=True)
+               for user_id, count in counts.items()]
+        if ops:
+            cls.collection.bulk_write(ops, ordered=False)
+
+    @classmethod
+    def acollection(cls):
+        return get_async_db()[cls.collection.name]
+
+    @classmethod
+    async def aget(cls, user_id):
+        doc = await cls.acollection().find_one({'_id': str(user_id)})
+        return max(doc.get('unread', 0), 0) if doc else 0
+
+    @classmethod
+    async def aadd(cls, user_id, amount):
+        await cls.acollection().update_one({'_id': str(user_id)}, {'$inc': {'unread': amount}}, upsert=True)
+
+class NotificationJobModel:
+    collection = db['notification_jobs']
+
+    # Statuses of jobs that still sit in some process's fan-out pool
+    ACTIVE = ('queued', 'running')
+
+    indexes = [
+        # Orphan sweep in notifications/jobs.py; otherwise jobs are read back by _id
+        IndexModel([('status', ASCENDING), ('heartbeat_at', ASCENDING)], name='status_heartbeat'),
+    ]
+
+    query_shapes = [
+        {'filter': {'status': {'$in': list(ACTIVE)}, 'heartbeat_at': {'$not': {'$gte': datetime.datetime(2000, 1, 1)}}}},
+    ]
+
+    @classmethod
+    def create(cls, data):
+        data.setdefault('status', 'queued')
+        data.setdefault('sent', 0)
+        data.setdefault('heartbeat_at', datetime.datetime.utcnow())
+        result = cls.collection.insert_one(data)
+        data['_id'] = result.inserted_id
+        return data
+
+    @classmethod
+    def get_by_id(cls, job_id):
+        try:
+            return cls.collection.find_one({'_id': ObjectId(job_id)})
+        except:
+            return None
+
+    @classmethod
+    def update(cls, job_id, data):
+        cls.collection.update_one({'_id': ObjectId(job_id)}, {'$set': data})
+
+    @classmethod
+    def claim(cls, job_id):
+        # Only a still-queued job starts, so one failed as orphaned never runs late
+        result = cls.collection.update_one({'_id': ObjectId(job_id), 'status': 'queued'}, {'$set': {
+            'status': 'running',
+            'started_at': datetime.datetime.utcnow().isoformat(),
+            'heartbeat_at': datetime.datetime.utcnow(),
+        }})
+        return result.modified_count == 1
+
+    @classmethod
+    def add_progress(cls, job_id, sent):
+        cls.collection.update_one({'_id': ObjectId(job_id)}, {'$inc': {'sent': sent}})
+
+    @classmethod
+    def heartbeat(cls, job_ids):
+        if job_ids:
+            cls.collection.update_many({'_id': {'$in': list(job_ids)}, 'status': {'$in': list(cls.ACTIVE)}},
+                                       {'$set': {'heartbeat_at': datetime.datetime.utcnow()}})
+
+    @classmethod
+    def fail_stale(cls, stale_after):
+        """
+        Fails queued/running jobs whose process has not heartbeaten for
+        `stale_after` seconds (it died or restarted). Returns how many.
+        """
+        now = datetime.datetime.utcnow()
+        return cls.collection.update_many(
+            # $not also matches jobs created before heartbeat_at existed
+            {'status': {'$in': list(cls.ACTIVE)},
+             'heartbeat_at': {'$not': {'$gte': now - datetime.timedelta(seconds=stale_after)}}},
+            {'$set': {
+                'status': 'failed',
+                'error': 'Interrupted: the worker running this job stopped before it finished',
+                'finished_at': now.isoformat(),
+            }}
+        ).modified_count
@@ -0,0 +1,191 @@
+import datetime
+import io
+import time
+from asgiref.sync import async_to_sync
+from bson.objectid import ObjectId
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.management import call_command
+from django.test import override_settings
+from core.testing import MongoTestCase
+from registrations.models import RegistrationModel
+from users.tokens import access_token, generate_tokens
+from .consumers import NotificationConsumer
+from .jobs import fail_orphaned_jobs, run_broadcast
+from .models import NotificationModel, NotificationJobModel, NotificationCounterModel
+
+
+class BroadcastJobTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.organizer = self.make_user('organizer')
+        self.event = self.make_event(self.organizer)
+        self.users = [self.make_user() for _ in range(5)]
+        for user in self.users:
+            RegistrationModel.create({'user': str(user['_id']), 'event': str(self.event['_id'])})
+
+    def make_job(self, **fields):
+        return NotificationJobModel.create(dict({
+            'event': str(self.event['_id']), 'created_by': str(self.organizer['_id']),
+            'message': 'Doors open at 9', 'type': 'info', 'total': len(self.users),
+        }, **fields))
+
+    @override_settings(NOTIFICATION_FANOUT=dict(settings.NOTIFICATION_FANOUT, CHUNK_SIZE=2))
+    def test_broadcast_reaches_every_participant_in_chunks(self):
+        job = self.make_job()
+        run_broadcast(job['_id'])
+        job = NotificationJobModel.get_by_id(job['_id'])
+        self.assertEqual((job['status'], job['sent']), ('completed', 5))
+        self.assertEqual(NotificationModel.collection.count_documents({'message': 'Doors open at 9'}), 5)
+        self.assertEqual(NotificationCounterModel.get(self.users[0]['_id']), 1)
+
+    def test_send_endpoint_queues_a_job(self):
+        response = self.client.post('/api/notifications/send/', {'event_id': str(self.event['_id']), 'message': 'Hi'},
+                                    content_type='application/json', **self.auth(self.organizer))
+        self.assertEqual(response.status_code, 202)
+        job = response.json()['job']
+        self.assertEqual(job['total'], 5)
+        # Let the pool finish before the next test drops the database
+        deadline = time.monotonic() + 10
+        while NotificationJobModel.get_by_id(job['id'])['status'] in NotificationJobModel.ACTIVE:
+            self.assertLess(time.monotonic(), deadline, 'Broadcast did not finish')
+            time.sleep(0.05)
+        self.assertEqual(NotificationJobModel.get_by_id(job['id'])['sent'], 5)
+
+    def test_orphaned_jobs_are_failed(self):
+        long_ago = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+        orphaned = self.make_job(status='running', heartbeat_at=long_ago)
+        legacy = self.make_job(status='queued')
+        NotificationJobModel.collection.update_one({'_id': legacy['_id']}, {'$unset': {'heartbeat_at': 1}})
+        alive = self.make_job(status='running')
+        done = self.make_job(status='completed', heartbeat_at=long_ago)
+
+        self.assertEqual(fail_orphaned_jobs(), 2)
+        statuses = {job['_id']: NotificationJobModel.get_by_id(job['_id'])['status']
+                    for job in (orphaned, legacy, alive, done)}
+        self.assertEqual(statuses, {orphaned['_id']: 'failed', legacy['_id']: 'failed',
+                                    alive['_id']: 'running', done['_id']: 'completed'})
+
+    def test_failed_job_is_not_run_late(self):
+        job = self.make_job(status='failed')
+        run_broadcast(job['_id'])
+        self.assertEqual(NotificationModel.collection.count_documents({}), 0)
+        self.assertEqual(NotificationJobModel.get_by_id(job['_id'])['status'], 'failed')
+
+
+class NotificationSocketTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+
+    def socket(self, query):
+        return WebsocketCommunicator(NotificationConsumer.as_asgi(), f'/ws/notifications/?{query}')
+
+    def connects(self, query):
+        async def attempt():
+            communicator = self.socket(query)
+            connected, _ = await communicator.connect()
+            await communicator.disconnect()
+            return connected
+        return async_to_sync(attempt)()
+
+    def test_access_token_connects(self):
+        self.assertTrue(self.connects(f'token={access_token(self.user)}'))
+
+    def test_user_id_alone_is_refused(self):
+        self.assertFalse(self.connects(f"user_id={self.user['_id']}"))
+
+    def test_refresh_token_is_refused(self):
+        self.assertFalse(self.connects(f"token={generate_tokens(self.user)['refresh']}"))
+
+    def test_invalid_token_is_refused(self):
+        self.assertFalse(self.connects('token=garbage'))
+
+    def notify(self, message):
+        return NotificationModel.create({'user': str(self.user['_id']), 'message': message, 'type': 'info',
+                                         'created_at': datetime.datetime.utcnow().isoformat()})
+
+    def test_reconnect_replays_what_was_missed(self):
+        seen = self.notify('seen')
+        self.notify('missed 1')
+        self.notify('missed 2')
+
+        async def replay():
+            communicator = self.socket(f"token={access_token(self.user)}&since={seen['_id']}")
+            await communicator.connect()
+            frame = await communicator.receive_json_from(timeout=5)
+            await communicator.disconnect()
+            return frame
+        frame = async_to_sync(replay)()
+        self.assertEqual([n['message'] for n in frame['batch']], ['missed 1', 'missed 2'])
+        self.assertFalse(frame['truncated'])
+
+    def test_bursts_are_coalesced_into_one_frame(self):
+        async def burst():
+            communicator = self.socket(f'token={access_token(self.user)}')
+            await communicator.connect()
+            layer = get_channel_layer()
+            for i in range(3):
+                await layer.group_send(f"user_notifications_{self.user['_id']}",
+                                       {'type': 'notification_message', 'notification': {'message': str(i)}})
+            frame = await communicator.receive_json_from(timeout=5)
+            nothing_else = await communicator.receive_nothing(timeout=0.2)
+            await communicator.disconnect()
+            return frame, nothing_else
+        frame, nothing_else = async_to_sync(burst)()
+        self.assertEqual(frame, {'batch': [{'message': '0'}, {'message': '1'}, {'message': '2'}], 'dropped': 0})
+        self.assertTrue(nothing_else)
+
+
+class InboxRetentionTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+        self.user_id = str(self.user['_id'])
+
+    def notify(self, **fields):
+        return NotificationModel.create(dict({'user': self.user_id, 'message': 'Hi', 'type': 'info'}, **fields))
+
+    def unread_count(self):
+        return self.client.get('/api/notifications/unread-count/', **self.auth(self.user)).json()['unread']
+
+    def test_unread_count_follows_reads(self):
+        first, _ = self.notify(), self.notify()
+        self.assertEqual(self.unread_count(), 2)
+        self.client.put(f"/api/notifications/{first['_id']}/read/", **self.auth(self.user))
+        self.assertEqual(self.unread_count(), 1)
+        self.client.put('/api/notifications/read-all/', **self.auth(self.user))
+        self.assertEqual(self.unread_count(), 0)
+
+    def test_reading_schedules_expiry(self):
+        notif = self.notify()
+        NotificationModel.mark_read(notif['_id'])
+        expire_at = NotificationModel.get_by_id(notif['_id'])['expire_at']
+        expected = datetime.datetime.utcnow() + datetime.timedelta(days=settings.NOTIFICATION_RETENTION['READ_DAYS'])
+        self.assertAlmostEqual(expire_at, expected, delta=datetime.timedelta(minutes=1))
+
+    def prune(self, *args):
+        out = io.StringIO()
+        call_command('prune_notifications', *args, stdout=out)
+        return out.getvalue()
+
+    def test_prune_deletes_stale_unread_and_fixes_the_counter(self):
+        days = settings.NOTIFICATION_RETENTION['UNREAD_DAYS'] + 1
+        stale_id = ObjectId.from_datetime(datetime.datetime.utcnow() - datetime.timedelta(days=days))
+        self.notify(_id=stale_id)
+        fresh = self.notify()
+        # Read before expire_at existed
+        legacy_read = self.notify(is_read=True)
+
+        self.assertIn('deleted 1 stale unread', self.prune())
+        self.assertIsNone(NotificationModel.get_by_id(stale_id))
+        self.assertIsNotNone(NotificationModel.get_by_id(fresh['_id']))
+        self.assertIn('expire_at', NotificationModel.get_by_id(legacy_read['_id']))
+        self.assertEqual(NotificationCounterModel.get(self.user_id), 1)
+
+    def test_reconcile_rebuilds_counters(self):
+        self.notify()
+        NotificationCounterModel.set_many({self.user_id: 7})
+        self.prune('--reconcile')
+        self.assertEqual(NotificationCounterModel.get(self.user_id), 1)
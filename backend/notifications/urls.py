@@ -1,9 +1,16 @@
+from django.conf import settings
 from django.urls import path
-from .views import SendNotificationView, UserNotificationsView, MarkNotificationReadView, MarkAllNotificationsReadView
+from .views import SendNotificationView, UserNotificationsView, UnreadCountView, MarkNotificationReadView, MarkAllNotificationsReadView, NotificationJobStatusView
+from .async_views import AsyncUserNotificationsView, AsyncUnreadCountView
+
+inbox_view = AsyncUserNotificationsView if settings.ASYNC_VIEWS else UserNotificationsView
+unread_count_view = AsyncUnreadCountView if settings.ASYNC_VIEWS else UnreadCountView
 
 urlpatterns = [
-    path('', UserNotificationsView.as_view(), name='user-notifications'),
+    path('', inbox_view.as_view(), name='user-notifications'),
+    path('unread-count/', unread_count_view.as_view(), name='unread-count'),
     path('send/', SendNotificationView.as_view(), name='send-notification'),
+    path('jobs/<str:job_id>/', NotificationJobStatusView.as_view(), name='notification-job-status'),
     path('<str:pk>/read/', MarkNotificationReadView.as_view(), name='mark-notification-read'),
     path('read-all/', MarkAllNotificationsReadView.as_view(), name='mark-all-read'),
 ]
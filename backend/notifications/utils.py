@@ -1,5 +1,6 @@
 from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+import asyncio
+from core.loop import background_loop
 
 def send_realtime_notification(user_id, notification_data):
     """
@@ -8,10 +9,48 @@ def send_realtime_notification(user_id, notification_data):
     """
     channel_layer = get_channel_layer()
     if channel_layer:
-        async_to_sync(channel_layer.group_send)(
+        # On the shared loop, so repeated sends reuse one async Mongo client
+        background_loop.run(channel_layer.group_send(
+            f"user_notifications_{user_id}",
+            {
+                "type": "notification_message",
+                "notification": notification_data
+            }
+        ))
+
+
+async def asend_realtime_notification(user_id, notification_data):
+    channel_layer = get_channel_layer()
+    if channel_layer:
+        await channel_layer.group_send(
             f"user_notifications_{user_id}",
             {
                 "type": "notification_message",
                 "notification": notification_data
             }
         )
+
+
+def send_realtime_notifications(items):
+    """
+    Batched variant of `send_realtime_notification` for fan-out: takes
+    (user_id, notification_data) pairs and issues all group sends concurrently
+    from a single hop onto the shared background loop.
+    """
+    channel_layer = get_channel_layer()
+    if not channel_layer or not items:
+        return
+
+    async def send_all():
+        await asyncio.gather(*[
+            channel_layer.group_send(
+                f"user_notifications_{user_id}",
+                {
+                    "type": "notification_message",
+                    "notification": notification_data
+                }
+            )
+            for user_id, notification_data in items
+        ], return_exceptions=True)
+
+    background_loop.run(send_all())
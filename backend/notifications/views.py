@@ -2,11 +2,11 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from .models import NotificationModel
+from .models import NotificationModel, NotificationJobModel, NotificationCounterModel
+from .jobs import start_broadcast
 from events.models import EventModel
 from core.permissions import IsOrganizer
-from registrations.models import RegistrationModel
-import datetime
+from core.pagination import get_page_params, page_response_data, InvalidPageParams
 
 # Helper to serialize Notification PyMongo dictionary
 def serialize_notification(notif):
@@ -20,6 +20,18 @@ def serialize_notification(notif):
         'created_at': notif.get('created_at')
     }
 
+def serialize_job(job):
+    return {
+        'id': str(job['_id']),
+        'event': job.get('event'),
+        'status': job.get('status'),
+        'total': job.get('total', 0),
+        'sent': job.get('sent', 0),
+        'error': job.get('error'),
+        'created_at': job.get('created_at'),
+        'finished_at': job.get('finished_at')
+    }
+
 class SendNotificationView(APIView):
     permission_classes = [IsAuthenticated, IsOrganizer]
 
@@ -35,27 +47,42 @@ class SendNotificationView(APIView):
         if not event or event.get('organizer') != str(request.user['_id']):
             return Response({'error': 'Event not found or permission denied'}, status=status.HTTP_403_FORBIDDEN)
 
-        regs = RegistrationModel.get_all({'event': event_id})
-        
-        # In a real app we'd bulk insert or use a background task like Celery
-        for reg in regs:
-            NotificationModel.create({
-                'user': reg.get('user'),
-                'message': message,
-                'type': notif_type,
-                'is_read': False,
-                'created_at': datetime.datetime.utcnow().isoformat()
-            })
+        # Fan-out runs in the background with chunked insert_many; poll the job for progress
+        job = start_broadcast(event_id, message, notif_type, request.user['_id'])
+
+        return Response({
+            'message': f"Notification queued for {job['total']} participants.",
+            'job': serialize_job(job)
+        }, status=status.HTTP_202_ACCEPTED)
+
+class NotificationJobStatusView(APIView):
+    permission_classes = [IsAuthenticated, IsOrganizer]
 
-        return Response({'message': f'Notification sent to {len(regs)} participants.'}, status=status.HTTP_200_OK)
+    def get(self, request, job_id):
+        job = NotificationJobModel.get_by_id(job_id)
+        if not job or job.get('created_by') != str(request.user['_id']):
+            return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(serialize_job(job))
 
 class UserNotificationsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         user_id = str(request.user['_id'])
-        notifs = NotificationModel.get_user_notifications(user_id)
-        return Response([serialize_notification(n) for n in notifs][:50]) # Limit to 50 for performance
+        try:
+            limit, after = get_page_params(request)
+        except InvalidPageParams as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        notifs, next_cursor = NotificationModel.get_page(user_id, limit, after)
+        return Response(page_response_data([serialize_notification(n) for n in notifs], next_cursor))
+
+class UnreadCountView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        # Single _id lookup on the stored counter; polled by the navbar badge
+        return Response({'unread': NotificationCounterModel.get(request.user['_id'])})
 
 class MarkNotificationReadView(APIView):
     permission_classes = [IsAuthenticated]
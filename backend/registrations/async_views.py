@@ -0,0 +1,61 @@
+import asyncio
+import datetime
+from pymongo.errors import DuplicateKeyError
+from rest_framework.permissions import IsAuthenticated
+from core.async_views import AsyncAPIView
+from core.loaders import get_loaders
+from core.permissions import IsParticipant
+from events.models import EventModel
+from notifications.models import NotificationModel
+from .models import RegistrationModel
+from .views import EventRegisterView, serialize_registration
+
+class AsyncEventRegisterView(AsyncAPIView):
+    sync_view = EventRegisterView
+    permission_classes = [IsAuthenticated, IsParticipant]
+
+    async def post(self, request):
+        event_id = self.parse_body(request).get('event')
+        user_id = str(request.user['_id'])
+
+        # Independent lookups run concurrently
+        event, already_registered = await asyncio.gather(
+            EventModel.aget_by_id(event_id),
+            RegistrationModel.acheck_exists(user_id, event_id),
+        )
+        if not event:
+            return self.respond({'error': 'Event not found'}, status=404)
+        if already_registered:
+            return self.respond({'error': 'Already registered for this event'}, status=400)
+
+        if not await EventModel.areserve_seat(event_id):
+            return self.respond({'error': 'Event is full'}, status=400)
+
+        data = {
+            'user': user_id,
+            'event': event_id,
+            'event_summary': EventModel.summary(event),
+            'registered_at': datetime.datetime.utcnow().isoformat()
+        }
+        try:
+            reg = await RegistrationModel.acreate(data)
+        except DuplicateKeyError:
+            await EventModel.arelease_seat(event_id)
+            return self.respond({'error': 'Already registered for this event'}, status=400)
+        except Exception:
+            await EventModel.arelease_seat(event_id)
+            raise
+
+        loaders = get_loaders(request)
+        loaders.events.seed(event)
+        await asyncio.gather(
+            NotificationModel.acreate({
+                'user': user_id,
+                'message': f"Successfully registered for {event.get('title')}",
+                'type': 'success',
+                'created_at': datetime.datetime.utcnow().isoformat(),
+                'is_read': False
+            }),
+            loaders.users.aload(user_id),
+        )
+        return self.respond(serialize_registration(reg, loaders), status=201)
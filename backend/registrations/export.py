@@ -0,0 +1,98 @@
+import csv
+import io
+import json
+from users.models import UserModel
+from .models import RegistrationModel
+
+# Registrations read per cursor batch; users are resolved with one $in per batch
+BATCH_SIZE = 500
+
+COLUMNS = ['registration_id', 'user_id', 'name', 'email', 'status', 'registered_at']
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+_REGISTRATION_FIELDS = {'user': 1, 'status': 1, 'registered_at': 1}
+
+
+def _row(reg, users):
+    user = users.get(reg.get('user')) or {}
+    return {
+        'registration_id': str(reg['_id']),
+        'user_id': reg.get('user'),
+        'name': user.get('name'),
+        'email': user.get('email'),
+        'status': reg.get('status'),
+        'registered_at': reg.get('registered_at'),
+    }
+
+
+def iter_participant_batches(event_id):
+    """Yields lists of export rows, one per cursor batch, so memory stays flat."""
+    batch = []
+    for reg in RegistrationModel.iter_event(event_id, BATCH_SIZE, _REGISTRATION_FIELDS):
+        batch.append(reg)
+        if len(batch) >= BATCH_SIZE:
+            yield _resolve(batch)
+            batch = []
+    if batch:
+        yield _resolve(batch)
+
+
+def _resolve(batch):
+    users = UserModel.get_many({r.get('user') for r in batch}, UserModel.reference_projection)
+    return [_row(r, users) for r in batch]
+
+
+async def aiter_participant_batches(event_id):
+    batch = []
+    async for reg in RegistrationModel.aiter_event(event_id, BATCH_SIZE, _REGISTRATION_FIELDS):
+        batch.append(reg)
+        if len(batch) >= BATCH_SIZE:
+            yield await _aresolve(batch)
+            batch = []
+    if batch:
+        yield await _aresolve(batch)
+
+
+async def _aresolve(batch):
+    users = await UserModel.aget_many({r.get('user') for r in batch}, UserModel.reference_projection)
+    return [_row(r, users) for r in batch]
+
+
+def _csv_cell(value):
+    # Stop spreadsheet apps from evaluating user supplied text as a formula
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return '' if value is None else value
+
+
+def encode_batch(output, rows):
+    if output == 'ndjson':
+        return ''.join(json.dumps(row) + '\n' for row in rows)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=COLUMNS)
+    for row in rows:
+        writer.writerow({key: _csv_cell(value) for key, value in row.items()})
+    return buffer.getvalue()
+
+
+def header(output):
+    if output == 'csv':
+        return ','.join(COLUMNS) + '\r\n'
+    return ''
+
+
+def stream_participants(event_id, output):
+    # The header goes out before the first query so the client gets its first byte at once
+    yield header(output)
+    for rows in iter_participant_batches(event_id):
+        yield encode_batch(output, rows)
+
+
+async def astream_participants(event_id, output):
+    yield header(output)
+    async for rows in aiter_participant_batches(event_id):
+        yield encode_batch(output, rows)
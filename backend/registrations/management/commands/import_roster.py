@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from events.models import EventModel
+from registrations.roster import CHUNK_SIZE, RosterImport, RosterError, detect_file_type, iter_rows
+
+
+class Command(BaseCommand):
+    help = 'Registers every user in a CSV/NDJSON roster (email, name) for an event'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id')
+        parser.add_argument('path')
+        parser.add_argument('--file-type', choices=['csv', 'ndjson'])
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--no-create-users', action='store_true',
+                            help='Report unknown emails instead of creating accounts for them')
+
+    def handle(self, *args, **options):
+        event = EventModel.get_by_id(options['event_id'])
+        if not event:
+            raise CommandError('Event not found')
+        try:
+            file_type = detect_file_type(options['path'], options['file_type'])
+        except RosterError as e:
+            raise CommandError(str(e))
+
+        with open(options['path'], 'rb') as roster:
+            report = RosterImport(event, not options['no_create_users']).run(
+                iter_rows(roster, file_type), options['chunk_size'])
+
+        for error in report['errors']:
+            self.stdout.write(f"row {error['row']}: {error['email'] or '-'}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['total']} rows: {report['registered']} registered, "
+            f"{report['already_registered']} already registered, {report['users_created']} users created, "
+            f"{report['error_count']} errors"
+        ))
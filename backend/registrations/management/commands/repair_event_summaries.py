@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from pymongo import UpdateMany
+from events.models import EventModel
+from registrations.models import RegistrationModel
+
+BATCH_SIZE = 1000
+
+
+def _flush(ops):
+    if not ops:
+        return 0
+    return RegistrationModel.collection.bulk_write(ops, ordered=False).modified_count
+
+
+class Command(BaseCommand):
+    help = 'Rewrites the event_summary snapshot on registrations whose copy differs from the event'
+
+    def handle(self, *args, **options):
+        ops = []
+        fixed = 0
+        events = EventModel.collection.find({}, EventModel.reference_projection).batch_size(BATCH_SIZE)
+        for event in events:
+            summary = EventModel.summary(event)
+            # Same filter as set_event_summary: only stale or missing snapshots are written
+            ops.append(UpdateMany(
+                {'event': str(event['_id']), 'event_summary': {'$ne': summary}},
+                {'$set': {'event_summary': summary}}
+            ))
+            if len(ops) >= BATCH_SIZE:
+                fixed += _flush(ops)
+                ops = []
+        fixed += _flush(ops)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the event snapshot on {fixed} registrations'))
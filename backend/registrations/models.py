@@ -1,13 +1,49 @@
-from core.mongo import db
+from core.mongo import db, get_async_db, read_collection
 from bson.objectid import ObjectId
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from core.pagination import fetch_page
+from events.models import EventStatsModel
 
 class RegistrationModel:
     collection = db['registrations']
 
+    indexes = [
+        IndexModel([('user', ASCENDING), ('event', ASCENDING)], name='user_event_unique', unique=True),
+        IndexModel([('user', ASCENDING), ('_id', DESCENDING)], name='user_recent'),
+        IndexModel([('event', ASCENDING), ('_id', DESCENDING)], name='event_recent'),
+    ]
+
+    query_shapes = [
+        {'filter': {'user': 'x', 'event': 'x'}},
+        {'filter': {'user': 'x', 'event': 'x', 'team': None}},
+        {'filter': {'event': 'x', 'team': None}, 'sort': [('_id', ASCENDING)]},
+        {'filter': {'user': 'x'}, 'sort': [('_id', DESCENDING)]},
+        {'filter': {'event': 'x'}, 'sort': [('_id', DESCENDING)]},
+        {'filter': {'event': 'x'}, 'sort': [('_id', ASCENDING)]},
+    ]
+
     @classmethod
     def get_all(cls, filters=None):
         return list(cls.collection.find(filters or {}))
         
+    @classmethod
+    def get_page(cls, filters=None, limit=10, after=None, projection=None):
+        return fetch_page(cls.collection, filters, limit, after, projection=projection)
+
+    @classmethod
+    def set_event_summary(cls, event_id, summary):
+        # Over the event_recent index; skips registrations already up to date
+        return cls.collection.update_many(
+            {'event': str(event_id), 'event_summary': {'$ne': summary}},
+            {'$set': {'event_summary': summary}}
+        ).modified_count
+
+    @classmethod
+    def iter_event(cls, event_id, batch_size=500, projection=None):
+        # Oldest first over the event_recent index; the server hands out one batch at a time.
+        # Exports are long scans, so they go to a secondary when one is allowed
+        return read_collection(cls.collection).find({'event': str(event_id)}, projection).sort('_id', ASCENDING).batch_size(batch_size)
+
     @classmethod
     def get_by_id(cls, reg_id):
         try:
@@ -20,16 +56,66 @@ class RegistrationModel:
         data['status'] = 'confirmed'
         result = cls.collection.insert_one(data)
         data['_id'] = result.inserted_id
+        EventStatsModel.add(data['event'], registrations=1, unteamed=1)
         return data
 
     @classmethod
     def delete(cls, reg_id):
         try:
-            result = cls.collection.delete_one({'_id': ObjectId(reg_id)})
-            return result.deleted_count > 0
+            reg = cls.collection.find_one_and_delete({'_id': ObjectId(reg_id)}, {'event': 1, 'team': 1})
         except:
             return False
+        if reg is None:
+            return False
+        EventStatsModel.add(reg.get('event'), registrations=-1, cancellations=1, unteamed=0 if reg.get('team') else -1)
+        return True
 
     @classmethod
     def check_exists(cls, user_id, event_id):
         return cls.collection.find_one({'user': str(user_id), 'event': str(event_id)}) is not None
+
+    @classmethod
+    def claim_team(cls, user_id, event_id, team_id):
+        """
+        Records team membership on the registration. Matches only if the user is
+        registered and not in a team yet, so one update enforces both rules.
+        """
+        result = cls.collection.update_one(
+            {'user': str(user_id), 'event': str(event_id), 'team': None},
+            {'$set': {'team': str(team_id)}}
+        )
+        if result.modified_count != 1:
+            return False
+        EventStatsModel.add(event_id, unteamed=-1)
+        return True
+
+    @classmethod
+    def release_team(cls, user_id, event_id, team_id):
+        result = cls.collection.update_one(
+            {'user': str(user_id), 'event': str(event_id), 'team': str(team_id)},
+            {'$unset': {'team': ''}}
+        )
+        if result.modified_count == 1:
+            EventStatsModel.add(event_id, unteamed=1)
+
+    # Async API used by the async views
+
+    @classmethod
+    def acollection(cls):
+        return get_async_db()[cls.collection.name]
+
+    @classmethod
+    async def acreate(cls, data):
+        data['status'] = 'confirmed'
+        result = await cls.acollection().insert_one(data)
+        data['_id'] = result.inserted_id
+        await EventStatsModel.aadd(data['event'], registrations=1, unteamed=1)
+        return data
+
+    @classmethod
+    def aiter_event(cls, event_id, batch_size=500, projection=None):
+        return read_collection(cls.acollection()).find({'event': str(event_id)}, projection).sort('_id', ASCENDING).batch_size(batch_size)
+
+    @classmethod
+    async def acheck_exists(cls, user_id, event_id):
+        return await cls.acollection().find_one({'user': str(user_id), 'event': str(event_id)}) is not None
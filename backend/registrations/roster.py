@@ -0,0 +1,186 @@
+import csv
+import datetime
+import io
+import json
+import re
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+from events.models import EventModel, EventStatsModel
+from notifications.models import NotificationModel
+from users.models import UserModel
+from .models import RegistrationModel
+
+# Rows handled per round of batched lookups and writes
+CHUNK_SIZE = 1000
+# The report lists at most this many failed rows; error_count has the total
+MAX_REPORTED_ERRORS = 1000
+
+FILE_TYPES = ('csv', 'ndjson')
+
+EMAIL = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+
+class RosterError(ValueError):
+    pass
+
+
+def detect_file_type(filename, declared=None):
+    file_type = (declared or '').lower() or filename.rsplit('.', 1)[-1].lower()
+    if file_type in ('jsonl', 'json'):
+        file_type = 'ndjson'
+    if file_type not in FILE_TYPES:
+        raise RosterError(f'file_type must be one of: {", ".join(FILE_TYPES)}')
+    return file_type
+
+
+def iter_rows(binary_file, file_type):
+    """
+    Yields (row_number, row_dict) one line at a time from an uploaded file.
+    Rows that cannot be read as a record are yielded as (row_number, None).
+    """
+    text = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+    if file_type == 'csv':
+        reader = csv.DictReader(text)
+        # Header is row 1, so data rows start at 2 like in a spreadsheet
+        for number, row in enumerate(reader, start=2):
+            if None in row:
+                # More cells than header columns; DictReader files the extras
+                # under a None key as a list
+                yield number, None
+                continue
+            yield number, {(k or '').strip().lower(): v.strip() if isinstance(v, str) else ''
+                           for k, v in row.items()}
+        return
+    for number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        if not isinstance(row, dict):
+            yield number, None
+            continue
+        yield number, {str(k).lower(): str(v).strip() if v is not None else '' for k, v in row.items()}
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class RosterImport:
+    """
+    Imports a roster into one event chunk by chunk: users are resolved (and
+    optionally created) with one $in per chunk, existing registrations are
+    filtered out with another, seats are reserved for the whole chunk at once
+    and registrations go in with one unordered bulk_write.
+    """
+    def __init__(self, event, create_users=True):
+        self.event = event
+        self.event_id = str(event['_id'])
+        self.create_users = create_users
+        self.seen = set()
+        self.report = {
+            'total': 0,
+            'registered': 0,
+            'already_registered': 0,
+            'users_created': 0,
+            'error_count': 0,
+            'errors': [],
+        }
+
+    def error(self, number, email, message):
+        self.report['error_count'] += 1
+        if len(self.report['errors']) < MAX_REPORTED_ERRORS:
+            self.report['errors'].append({'row': number, 'email': email, 'error': message})
+
+    def run(self, rows, chunk_size=CHUNK_SIZE):
+        for chunk in _chunks(rows, chunk_size):
+            self.import_chunk(chunk)
+        return self.report
+
+    def import_chunk(self, chunk):
+        valid = []
+        for number, row in chunk:
+            self.report['total'] += 1
+            if row is None:
+                self.error(number, None, 'Malformed row')
+                continue
+            email = row.get('email', '')
+            if not EMAIL.match(email):
+                self.error(number, email or None, 'Missing or invalid email')
+                continue
+            if email in self.seen:
+                self.error(number, email, 'Duplicate email in roster')
+                continue
+            self.seen.add(email)
+            valid.append((number, email, row.get('name') or email.split('@')[0]))
+        if not valid:
+            return
+
+        users = UserModel.get_by_emails([email for _, email, _ in valid], {'email': 1})
+        missing = [{'email': email, 'name': name} for _, email, name in valid if email not in users]
+        if missing and self.create_users:
+            self.report['users_created'] += UserModel.create_many(missing)
+            users.update(UserModel.get_by_emails([u['email'] for u in missing], {'email': 1}))
+
+        candidates = []
+        for number, email, _ in valid:
+            if email not in users:
+                self.error(number, email, 'No account with this email')
+            else:
+                candidates.append((number, email, str(users[email]['_id'])))
+
+        existing = {
+            reg['user'] for reg in RegistrationModel.collection.find(
+                {'event': self.event_id, 'user': {'$in': [user_id for _, _, user_id in candidates]}}, {'user': 1})
+        }
+        self.report['already_registered'] += sum(1 for _, _, user_id in candidates if user_id in existing)
+        candidates = [c for c in candidates if c[2] not in existing]
+        if not candidates:
+            return
+
+        # Whole-chunk seat reservation; rows past the remaining capacity are reported
+        seats = EventModel.reserve_seats(self.event_id, len(candidates))
+        for number, email, _ in candidates[seats:]:
+            self.error(number, email, 'Event is full')
+        candidates = candidates[:seats]
+        if not candidates:
+            return
+
+        now = datetime.datetime.utcnow().isoformat()
+        summary = EventModel.summary(self.event)
+        ops = [InsertOne({'user': user_id, 'event': self.event_id, 'event_summary': summary,
+                          'status': 'confirmed', 'registered_at': now})
+               for _, _, user_id in candidates]
+        failed = set()
+        try:
+            RegistrationModel.collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            # Mostly duplicates from a concurrent self-registration; their seats go back
+            for err in e.details.get('writeErrors', []):
+                failed.add(err['index'])
+                number, email, _ = candidates[err['index']]
+                if err.get('code') == 11000:
+                    self.report['already_registered'] += 1
+                else:
+                    self.error(number, email, err.get('errmsg', 'Write failed'))
+            EventModel.release_seat(self.event_id, len(failed))
+
+        registered = [c for index, c in enumerate(candidates) if index not in failed]
+        self.report['registered'] += len(registered)
+        EventStatsModel.add(self.event_id, registrations=len(registered), unteamed=len(registered))
+        NotificationModel.create_many([{
+            'user': user_id,
+            'message': f"You have been registered for {self.event.get('title')}",
+            'type': 'success',
+            'created_at': now,
+            'is_read': False,
+        } for _, _, user_id in registered])
@@ -0,0 +1,249 @@
+import csv
+import io
+import json
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from core.testing import TEST_PASSWORD, MongoQueryCountMixin, MongoTestCase
+from events.models import EventModel
+from users.models import UserModel
+from . import export
+from .models import RegistrationModel
+from .roster import RosterImport, iter_rows
+
+
+def csv_rows(*lines):
+    return iter_rows(io.BytesIO('\n'.join(lines).encode()), 'csv')
+
+
+class IterRowsTests(SimpleTestCase):
+    def test_csv_rows_are_normalized(self):
+        rows = list(csv_rows('Email,Name', ' a@test.local , Alice '))
+        self.assertEqual(rows, [(2, {'email': 'a@test.local', 'name': 'Alice'})])
+
+    def test_csv_row_with_extra_cells_is_malformed(self):
+        rows = list(csv_rows('email,name', 'a@test.local,Alice,surplus', 'b@test.local'))
+        self.assertEqual(rows, [(2, None), (3, {'email': 'b@test.local', 'name': ''})])
+
+    def test_ndjson_rows(self):
+        data = io.BytesIO(b'{"email": "a@test.local"}\n\n[1, 2]\nnot json\n')
+        rows = list(iter_rows(data, 'ndjson'))
+        self.assertEqual(rows, [(1, {'email': 'a@test.local'}), (3, None), (4, None)])
+
+
+class RosterImportTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.organizer = self.make_user('organizer')
+
+    def test_report_counts_every_outcome(self):
+        event = self.make_event(self.organizer)
+        existing = self.make_user(email='existing@test.local')
+        RegistrationModel.create({'user': str(existing['_id']), 'event': str(event['_id'])})
+        report = RosterImport(event).run(csv_rows(
+            'email,name',
+            'new@test.local,New',
+            'existing@test.local,Existing',
+            'new@test.local,Twice',
+            'not-an-email,Bad',
+            'extra@test.local,Extra,cell',
+        ))
+        self.assertEqual(report['total'], 5)
+        self.assertEqual(report['registered'], 1)
+        self.assertEqual(report['already_registered'], 1)
+        self.assertEqual(report['users_created'], 1)
+        self.assertEqual(report['error_count'], 3)
+        self.assertEqual(sorted(e['row'] for e in report['errors']), [4, 5, 6])
+
+    def test_seats_are_limited_across_chunks(self):
+        event = self.make_event(self.organizer, max_participants='3')
+        lines = ['email'] + [f'user{i}@test.local' for i in range(5)]
+        report = RosterImport(event).run(csv_rows(*lines), chunk_size=2)
+        self.assertEqual(report['registered'], 3)
+        self.assertEqual([e['error'] for e in report['errors']], ['Event is full'] * 2)
+        self.assertEqual(EventModel.get_by_id(event['_id'])['registered_count'], 3)
+        self.assertEqual(RegistrationModel.collection.count_documents({'event': str(event['_id'])}), 3)
+
+    def test_without_create_users_unknown_emails_fail(self):
+        event = self.make_event(self.organizer)
+        report = RosterImport(event, create_users=False).run(csv_rows('email', 'nobody@test.local'))
+        self.assertEqual((report['registered'], report['users_created']), (0, 0))
+        self.assertEqual(report['errors'][0]['error'], 'No account with this email')
+
+    def test_imported_user_can_claim_account_by_signing_up(self):
+        event = self.make_event(self.organizer)
+        RosterImport(event).run(csv_rows('email', 'claim@test.local'))
+        self.assertTrue(UserModel.is_claimable(UserModel.get_by_email('claim@test.local')))
+
+        body = {'email': 'claim@test.local', 'name': 'Claimed', 'password': TEST_PASSWORD}
+        response = self.client.post('/api/auth/register/', body, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post('/api/auth/login/', {'email': 'claim@test.local', 'password': TEST_PASSWORD},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        # Once claimed, the address is taken like any other
+        response = self.client.post('/api/auth/register/', body, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class RosterImportViewTests(MongoQueryCountMixin, MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.organizer = self.make_user('organizer')
+        self.event = self.make_event(self.organizer)
+
+    def upload(self, user, content, name='roster.csv'):
+        return self.client.post(f"/api/registrations/event/{self.event['_id']}/import/",
+                                {'file': SimpleUploadedFile(name, content)}, **self.auth(user))
+
+    def test_import_endpoint(self):
+        lines = ['email,name'] + [f'user{i}@test.local,User {i}' for i in range(50)]
+        response = self.upload(self.organizer, '\n'.join(lines).encode())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['registered'], 50)
+
+    def test_query_count_is_per_chunk_not_per_row(self):
+        lines = ['email'] + [f'user{i}@test.local' for i in range(200)]
+        # A fixed set of batched reads and writes for the chunk (a getMore
+        # where a lookup returns more than one batch), plus auth and the event
+        with self.assertMaxQueries(16):
+            response = self.upload(self.organizer, '\n'.join(lines).encode())
+        self.assertEqual(response.json()['registered'], 200)
+
+    def test_other_organizers_cannot_import(self):
+        response = self.upload(self.make_user('organizer'), b'email\nuser@test.local\n')
+        self.assertEqual(response.status_code, 403)
+
+    def test_unknown_file_type(self):
+        response = self.upload(self.organizer, b'email\n', name='roster.xlsx')
+        self.assertEqual(response.status_code, 400)
+
+
+class RegistrationListingTests(MongoQueryCountMixin, MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.organizer = self.make_user('organizer')
+        self.event = self.make_event(self.organizer)
+        self.users = [self.make_user() for _ in range(3)]
+        for user in self.users:
+            RegistrationModel.create({'user': str(user['_id']), 'event': str(self.event['_id']), 'status': 'registered'})
+
+    def roster(self, query=''):
+        return self.client.get(f"/api/registrations/event/{self.event['_id']}/{query}", **self.auth(self.organizer))
+
+    def test_full_documents_by_default(self):
+        row = self.roster().json()['results'][0]
+        self.assertEqual(set(row), {'id', 'user', 'user_details', 'event', 'event_details', 'status', 'registered_at'})
+
+    def test_fields_narrow_rows_and_skip_lookups(self):
+        self.roster()  # warm the principal cache
+        # Just the page: no user lookups when user_details is not asked for
+        with self.assertMaxQueries(2):
+            response = self.roster('?fields=status,user')
+        self.assertEqual(response.status_code, 200)
+        for row in response.json()['results']:
+            self.assertEqual(set(row), {'id', 'user', 'status'})
+
+    def test_my_registrations_accept_fields(self):
+        response = self.client.get('/api/registrations/my/?fields=event_details', **self.auth(self.users[0]))
+        self.assertEqual(response.json()['results'][0]['event_details']['id'], str(self.event['_id']))
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'event_details'})
+
+    def test_unknown_fields_are_rejected(self):
+        self.assertEqual(self.roster('?fields=password').status_code, 400)
+
+
+class ExportEncodingTests(SimpleTestCase):
+    def test_csv_neutralises_formulas(self):
+        rows = [{'registration_id': '1', 'user_id': 'u', 'name': '=HYPERLINK("x")', 'email': None,
+                 'status': 'registered', 'registered_at': '2030-01-01'}]
+        self.assertEqual(export.encode_batch('csv', rows), '1,u,"\'=HYPERLINK(""x"")",,registered,2030-01-01\r\n')
+
+    def test_ndjson_is_one_object_per_line(self):
+        rows = [{'registration_id': str(i)} for i in range(2)]
+        self.assertEqual(export.encode_batch('ndjson', rows), '{"registration_id": "0"}\n{"registration_id": "1"}\n')
+
+
+class ParticipantExportTests(MongoQueryCountMixin, MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.organizer = self.make_user('organizer')
+        self.event = self.make_event(self.organizer)
+        self.users = [self.make_user(name=f'User {i}') for i in range(5)]
+        for user in self.users:
+            RegistrationModel.create({'user': str(user['_id']), 'event': str(self.event['_id']), 'status': 'registered'})
+
+    def export(self, output, user=None):
+        return self.client.get(f"/api/registrations/event/{self.event['_id']}/?output={output}",
+                               **self.auth(user or self.organizer))
+
+    def test_csv_streams_every_participant(self):
+        response = self.export('csv')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], export.CONTENT_TYPES['csv'])
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(sorted(r['email'] for r in rows), sorted(u['email'] for u in self.users))
+
+    def test_ndjson_streams_every_participant(self):
+        body = b''.join(self.export('ndjson').streaming_content).decode()
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual({r['name'] for r in rows}, {u['name'] for u in self.users})
+
+    def test_users_are_resolved_per_batch(self):
+        self.export('csv')  # warm the principal cache
+        # Event, then per batch of two: the registrations read and one user $in
+        # (plus a getMore if the server only reports the cursor exhausted late)
+        with mock.patch.object(export, 'BATCH_SIZE', 2):
+            with self.assertMaxQueries(1 + 3 * 2 + 1):
+                response = self.export('csv')
+                rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(rows), 1 + len(self.users))
+
+    def test_unknown_output_is_rejected(self):
+        self.assertEqual(self.export('xlsx').status_code, 400)
+
+    def test_other_organizers_cannot_export(self):
+        self.assertEqual(self.export('csv', self.make_user('organizer')).status_code, 403)
+
+
+class EventSummaryTests(MongoQueryCountMixin, MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.organizer = self.make_user('organizer')
+        self.event = self.make_event(self.organizer, title='Before')
+        self.user = self.make_user()
+        response = self.client.post('/api/registrations/', {'event': str(self.event['_id'])},
+                                    content_type='application/json', **self.auth(self.user))
+        self.assertEqual(response.status_code, 201)
+        self.registration_id = response.json()['id']
+
+    def snapshot(self):
+        return RegistrationModel.get_by_id(self.registration_id).get('event_summary')
+
+    def my_titles(self):
+        response = self.client.get('/api/registrations/my/', **self.auth(self.user))
+        return [r['event_details']['title'] for r in response.json()['results']]
+
+    def test_registering_stores_the_snapshot(self):
+        self.assertEqual(self.snapshot(), EventModel.summary(EventModel.get_by_id(self.event['_id'])))
+
+    def test_event_updates_reach_the_snapshot(self):
+        response = self.client.put(f"/api/events/{self.event['_id']}/", {'title': 'After'},
+                                   content_type='application/json', **self.auth(self.organizer))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.snapshot()['title'], 'After')
+        self.assertEqual(self.my_titles(), ['After'])
+
+    def test_listing_does_not_look_events_up(self):
+        self.my_titles()  # warm the principal cache
+        with self.assertMaxQueries(1):
+            self.assertEqual(self.my_titles(), ['Before'])
+
+    def test_missing_snapshots_fall_back_and_are_repaired(self):
+        RegistrationModel.collection.update_many({}, {'$unset': {'event_summary': 1}})
+        self.assertEqual(self.my_titles(), ['Before'])
+        out = io.StringIO()
+        call_command('repair_event_summaries', stdout=out)
+        self.assertIn('on 1 registrations', out.getvalue())
+        self.assertEqual(self.snapshot()['title'], 'Before')
@@ -1,9 +1,14 @@
+from django.conf import settings
 from django.urls import path
-from .views import EventRegisterView, MyRegistrationsView, EventParticipantsView, RegistrationCancelView
+from .views import EventRegisterView, MyRegistrationsView, EventParticipantsView, RosterImportView, RegistrationCancelView
+from .async_views import AsyncEventRegisterView
+
+register_view = AsyncEventRegisterView if settings.ASYNC_VIEWS else EventRegisterView
 
 urlpatterns = [
-    path('', EventRegisterView.as_view(), name='register-event'),
+    path('', register_view.as_view(), name='register-event'),
     path('my/', MyRegistrationsView.as_view(), name='my-registrations'),
     path('event/<str:event_id>/', EventParticipantsView.as_view(), name='event-participants'),
+    path('event/<str:event_id>/import/', RosterImportView.as_view(), name='import-roster'),
     path('<str:pk>/', RegistrationCancelView.as_view(), name='cancel-registration'),
 ]
@@ -2,18 +2,38 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from pymongo.errors import DuplicateKeyError
 from .models import RegistrationModel
+from .export import CONTENT_TYPES, stream_participants, astream_participants
+from .roster import RosterImport, RosterError, detect_file_type, iter_rows
 from events.models import EventModel
-from users.models import UserModel
+from teams.models import TeamModel
 from core.permissions import IsOrganizer, IsParticipant
+from core.loaders import get_loaders
+from core.pagination import get_page_params, page_response_data, InvalidPageParams
+from core.fields import fields_projection, get_fields_param, InvalidFields
 import datetime
 
-# Helper to serialize and enrich registration with related document details
-def serialize_registration(reg):
-    if not reg: return None
-    
-    event = EventModel.get_by_id(reg.get('event'))
-    event_details = {
+# Every field serialize_registration can emit, in response order
+REGISTRATION_FIELDS = ('id', 'user', 'user_details', 'event', 'event_details', 'status', 'registered_at')
+
+# Stored fields behind serialized names that are not stored under the same key
+_STORED_AS = {'id': '_id', 'user_details': 'user', 'event_details': ('event', 'event_summary')}
+
+def get_registration_fields(request):
+    # ?fields=status,event_details narrows listings; raises InvalidFields
+    return get_fields_param(request, REGISTRATION_FIELDS, REGISTRATION_FIELDS)
+
+def _event_details(reg, loaders):
+    summary = reg.get('event_summary')
+    if summary is not None:
+        # Snapshot taken at registration time and kept current by EventModel.update
+        event = dict(summary, _id=reg.get('event'))
+    else:
+        event = loaders.events.load(reg.get('event'))
+    return {
         'id': str(event['_id']),
         'title': event.get('title'),
         'date': event.get('date'),
@@ -23,22 +43,39 @@ def serialize_registration(reg):
         'status': event.get('status')
     } if event else None
 
-    user = UserModel.get_by_id(reg.get('user'))
-    user_details = {
+def _user_details(reg, loaders):
+    user = loaders.users.load(reg.get('user'))
+    return {
         'id': str(user['_id']),
         'name': user.get('name'),
         'email': user.get('email')
     } if user else None
 
-    return {
-        'id': str(reg['_id']),
-        'user': reg.get('user'),
-        'user_details': user_details,
-        'event': reg.get('event'),
-        'event_details': event_details,
-        'status': reg.get('status'),
-        'registered_at': reg.get('registered_at')
-    }
+# Helper to serialize and enrich registration with related document details
+def serialize_registration(reg, loaders=None, fields=REGISTRATION_FIELDS):
+    if not reg: return None
+    loaders = loaders or get_loaders()
+
+    data = {}
+    for field in fields:
+        if field == 'id':
+            data['id'] = str(reg['_id'])
+        elif field == 'event_details':
+            data['event_details'] = _event_details(reg, loaders)
+        elif field == 'user_details':
+            data['user_details'] = _user_details(reg, loaders)
+        else:
+            data[field] = reg.get(field)
+    return data
+
+def serialize_registrations(regs, loaders, fields=REGISTRATION_FIELDS):
+    # Two $in queries for the whole page instead of two lookups per row; events
+    # are only fetched for registrations without an event snapshot
+    if 'event_details' in fields:
+        loaders.events.prime(r.get('event') for r in regs if r.get('event_summary') is None)
+    if 'user_details' in fields:
+        loaders.users.prime(r.get('user') for r in regs)
+    return [serialize_registration(r, loaders, fields) for r in regs]
 
 class EventRegisterView(APIView):
     permission_classes = [IsAuthenticated, IsParticipant]
@@ -54,25 +91,26 @@ class EventRegisterView(APIView):
         if RegistrationModel.check_exists(user_id, event_id):
             return Response({'error': 'Already registered for this event'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Capacity check
-        current_count = len(RegistrationModel.get_all({'event': event_id}))
-        max_cap = event.get('max_participants', 0)
-        
-        # Make sure it's int for comparison
-        try:
-           max_cap = int(max_cap)
-        except ValueError:
-           pass
-           
-        if isinstance(max_cap, int) and current_count >= max_cap:
+        # Capacity check: claims a seat with a conditional $inc so concurrent
+        # requests cannot oversell
+        if not EventModel.reserve_seat(event_id):
             return Response({'error': 'Event is full'}, status=status.HTTP_400_BAD_REQUEST)
 
         data = {
             'user': user_id,
             'event': event_id,
+            'event_summary': EventModel.summary(event),
             'registered_at': datetime.datetime.utcnow().isoformat()
         }
-        reg = RegistrationModel.create(data)
+        try:
+            reg = RegistrationModel.create(data)
+        except DuplicateKeyError:
+            # Lost a race with a concurrent request for the same (user, event)
+            EventModel.release_seat(event_id)
+            return Response({'error': 'Already registered for this event'}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception:
+            EventModel.release_seat(event_id)
+            raise
         
         # trigger notification manual via PyMongo (signals removed)
         from notifications.models import NotificationModel
@@ -84,15 +122,28 @@ class EventRegisterView(APIView):
             'is_read': False
         })
 
-        return Response(serialize_registration(reg), status=status.HTTP_201_CREATED)
+        loaders = get_loaders(request)
+        loaders.events.seed(event)
+        return Response(serialize_registration(reg, loaders), status=status.HTTP_201_CREATED)
 
 class MyRegistrationsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         user_id = str(request.user['_id'])
-        regs = RegistrationModel.get_all({'user': user_id})
-        return Response([serialize_registration(r) for r in regs])
+        try:
+            limit, after = get_page_params(request)
+            fields = get_registration_fields(request)
+        except (InvalidPageParams, InvalidFields) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        regs, next_cursor = RegistrationModel.get_page({'user': user_id}, limit, after,
+                                                       fields_projection(fields, _STORED_AS))
+        loaders = get_loaders(request)
+        # Events come from the snapshots and the user is the requester, so the
+        # page is the one user_recent query
+        loaders.users.seed(request.user)
+        return Response(page_response_data(serialize_registrations(regs, loaders, fields), next_cursor))
 
 class EventParticipantsView(APIView):
     permission_classes = [IsAuthenticated, IsOrganizer]
@@ -101,9 +152,60 @@ class EventParticipantsView(APIView):
         event = EventModel.get_by_id(event_id)
         if not event or event.get('organizer') != str(request.user['_id']):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+
+        # ?output=csv|ndjson streams every participant instead of one JSON page
+        output = request.query_params.get('output')
+        if output:
+            return self.export(request, event_id, output)
             
-        regs = RegistrationModel.get_all({'event': event_id})
-        return Response([serialize_registration(r) for r in regs])
+        try:
+            limit, after = get_page_params(request)
+            fields = get_registration_fields(request)
+        except (InvalidPageParams, InvalidFields) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        regs, next_cursor = RegistrationModel.get_page({'event': event_id}, limit, after,
+                                                       fields_projection(fields, _STORED_AS))
+        loaders = get_loaders(request)
+        # The event itself is already loaded, seed it instead of re-fetching
+        loaders.events.seed(event)
+        return Response(page_response_data(serialize_registrations(regs, loaders, fields), next_cursor))
+
+    def export(self, request, event_id, output):
+        if output not in CONTENT_TYPES:
+            return Response({'error': f'output must be one of: {", ".join(CONTENT_TYPES)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        # Under ASGI a sync iterator would be buffered whole, so hand the server an async one
+        if isinstance(request._request, ASGIRequest):
+            content = astream_participants(event_id, output)
+        else:
+            content = stream_participants(event_id, output)
+        response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[output])
+        response['Content-Disposition'] = f'attachment; filename="participants-{event_id}.{output}"'
+        # Ask reverse proxies (nginx) not to buffer the stream either
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+class RosterImportView(APIView):
+    permission_classes = [IsAuthenticated, IsOrganizer]
+
+    def post(self, request, event_id):
+        event = EventModel.get_by_id(event_id)
+        if not event or event.get('organizer') != str(request.user['_id']):
+            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({'error': 'A roster file is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            file_type = detect_file_type(upload.name, request.data.get('file_type'))
+        except RosterError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        create_users = str(request.data.get('create_users', 'true')).lower() not in ('false', '0', 'no')
+        # Rows are read off the upload as they are imported, never all at once
+        report = RosterImport(event, create_users).run(iter_rows(upload.file, file_type))
+        return Response(report)
 
 class RegistrationCancelView(APIView):
     permission_classes = [IsAuthenticated]
@@ -116,5 +218,15 @@ class RegistrationCancelView(APIView):
         if reg['user'] != str(request.user['_id']):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
             
-        RegistrationModel.delete(pk)
+        if RegistrationModel.delete(pk):
+            EventModel.release_seat(reg.get('event'))
+            team_id = reg.get('team')
+            if not team_id:
+                # Registrations from before the team claim was recorded only
+                # show their team in its members
+                team = TeamModel.get_user_team_for_event(reg['user'], reg.get('event'))
+                team_id = team and team['_id']
+            if team_id:
+                # Otherwise the user would keep a team slot for an event they left
+                TeamModel.remove_member(team_id, reg['user'])
         return Response(status=status.HTTP_204_NO_CONTENT)
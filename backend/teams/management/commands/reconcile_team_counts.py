@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+from registrations.models import RegistrationModel
+from teams.models import TeamModel
+
+BATCH_SIZE = 1000
+
+
+def _flush(collection, ops):
+    if not ops:
+        return 0
+    return collection.bulk_write(ops, ordered=False).modified_count
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds team member_count/open_slots and the team claims on registrations from team members'
+
+    def handle(self, *args, **options):
+        claims = {}
+        ops = []
+        fixed_teams = 0
+        projection = {'event': 1, 'members': 1, 'max_size': 1, 'member_count': 1, 'open_slots': 1}
+        for team in TeamModel.collection.find({}, projection).batch_size(BATCH_SIZE):
+            members = team.get('members', [])
+            expected = {
+                'member_count': len(members),
+                'open_slots': max(team.get('max_size', 4) - len(members), 0),
+            }
+            if any(team.get(k) != v for k, v in expected.items()):
+                ops.append(UpdateOne({'_id': team['_id']}, {'$set': expected}))
+            for member in members:
+                claims[(member, team.get('event'))] = str(team['_id'])
+            if len(ops) >= BATCH_SIZE:
+                fixed_teams += _flush(TeamModel.collection, ops)
+                ops = []
+        fixed_teams += _flush(TeamModel.collection, ops)
+
+        ops = []
+        fixed_claims = 0
+        for reg in RegistrationModel.collection.find({}, {'user': 1, 'event': 1, 'team': 1}).batch_size(BATCH_SIZE):
+            team_id = claims.get((reg.get('user'), reg.get('event')))
+            if reg.get('team') == team_id:
+                continue
+            update = {'$set': {'team': team_id}} if team_id else {'$unset': {'team': ''}}
+            ops.append(UpdateOne({'_id': reg['_id']}, update))
+            if len(ops) >= BATCH_SIZE:
+                fixed_claims += _flush(RegistrationModel.collection, ops)
+                ops = []
+        fixed_claims += _flush(RegistrationModel.collection, ops)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Reconciled counters on {fixed_teams} teams and team claims on {fixed_claims} registrations'
+        ))
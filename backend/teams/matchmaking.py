@@ -0,0 +1,198 @@
+import datetime
+import re
+from collections import deque
+from bson.objectid import ObjectId
+from pymongo import InsertOne, UpdateOne
+from events.models import EventStatsModel
+from notifications.models import NotificationModel
+from registrations.models import RegistrationModel
+from users.models import UserModel
+from .models import TeamModel
+
+# Users are fetched with one $in per chunk
+USER_CHUNK_SIZE = 1000
+
+BALANCE_FIELD = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+class MatchmakingError(ValueError):
+    pass
+
+
+def _unteamed_users(event_id):
+    cursor = RegistrationModel.collection.find({'event': str(event_id), 'team': None}, {'user': 1}).sort('_id', 1)
+    users = [reg['user'] for reg in cursor if reg.get('user')]
+    # Registrations from before the team claim was recorded have no `team`
+    # even when their user is in one; leave those users where they are
+    teamed = set()
+    for start in range(0, len(users), USER_CHUNK_SIZE):
+        teamed |= TeamModel.members_in_teams(event_id, users[start:start + USER_CHUNK_SIZE])
+    return [user for user in users if user not in teamed]
+
+
+def _balance_order(user_ids, field):
+    """
+    Groups users by `field` and interleaves the groups, so striping the result
+    over teams gives each team a mix of values instead of clustering them.
+    """
+    values = {}
+    for start in range(0, len(user_ids), USER_CHUNK_SIZE):
+        chunk = user_ids[start:start + USER_CHUNK_SIZE]
+        for user_id, user in UserModel.get_many(chunk, {field: 1}).items():
+            values[user_id] = str(user.get(field) or '')
+    groups = {}
+    for user_id in user_ids:
+        groups.setdefault(values.get(user_id, ''), deque()).append(user_id)
+    ordered = []
+    queues = sorted(groups.values(), key=len, reverse=True)
+    while queues:
+        for queue in queues:
+            ordered.append(queue.popleft())
+        queues = [queue for queue in queues if queue]
+    return ordered
+
+
+def plan(event_id, team_size, balance_on=None):
+    """
+    Works out assignments without writing anything. Open teams are topped up
+    first, the rest are striped over ceil(n / team_size) new teams so their
+    sizes differ by at most one. Returns (fills, new_teams, leftover): fills maps
+    an existing team id to (team, users it receives), new_teams is a list of
+    member lists and leftover is a lone user who cannot form a team.
+    """
+    users = _unteamed_users(event_id)
+    if balance_on:
+        users = _balance_order(users, balance_on)
+
+    fills = {}
+    remaining = users
+    open_teams = TeamModel.collection.find(
+        {'event': str(event_id), 'open_slots': {'$gt': 0}},
+        {'team_name': 1, 'open_slots': 1}
+    ).sort('_id', 1)
+    for team in open_teams:
+        if not remaining:
+            break
+        take, remaining = remaining[:team['open_slots']], remaining[team['open_slots']:]
+        fills[team['_id']] = (team, take)
+
+    new_teams = []
+    if len(remaining) >= 2:
+        count = -(-len(remaining) // team_size)
+        new_teams = [remaining[i::count] for i in range(count)]
+        remaining = []
+    return fills, new_teams, remaining
+
+
+def run(event_id, team_size, balance_on=None, dry_run=False):
+    """
+    Assigns every unteamed registrant of `event_id` to a team. Registration
+    claims, team updates/inserts and notifications are each one bulk write.
+    Returns a summary dict.
+    """
+    if team_size < 2:
+        raise MatchmakingError('team_size must be at least 2')
+    if balance_on and not BALANCE_FIELD.match(balance_on):
+        raise MatchmakingError('balance_on must be a plain user field name')
+
+    fills, new_teams, leftover = plan(event_id, team_size, balance_on)
+    summary = {
+        'teams_filled': len(fills),
+        'teams_created': len(new_teams),
+        'assigned': sum(len(users) for _, users in fills.values()) + sum(len(m) for m in new_teams),
+        'unassigned': len(leftover),
+        'dry_run': dry_run,
+    }
+    if dry_run or not summary['assigned']:
+        return summary
+
+    event_id = str(event_id)
+    now = datetime.datetime.utcnow().isoformat()
+    assignments = {}
+    for team_id, (_, users) in fills.items():
+        assignments.update((user, team_id) for user in users)
+    new_docs = []
+    first_number = TeamModel.collection.count_documents({'event': event_id}) + 1
+    for number, members in enumerate(new_teams, start=first_number):
+        doc = {
+            '_id': ObjectId(),
+            'event': event_id,
+            'team_name': f'Team {number}',
+            'leader': members[0],
+            'members': members,
+            'max_size': team_size,
+            'member_count': len(members),
+            'open_slots': team_size - len(members),
+            'created_at': now,
+            'auto_assigned': True,
+        }
+        new_docs.append(doc)
+        assignments.update((user, doc['_id']) for user in members)
+
+    # 1. Claim registrations; a user who joined a team meanwhile is skipped
+    claims = RegistrationModel.collection.bulk_write([
+        UpdateOne({'user': user, 'event': event_id, 'team': None}, {'$set': {'team': str(team_id)}})
+        for user, team_id in assignments.items()
+    ], ordered=False)
+    if claims.modified_count != len(assignments):
+        claimed = {
+            reg['user'] for reg in RegistrationModel.collection.find(
+                {'event': event_id, 'user': {'$in': list(assignments)}}, {'user': 1, 'team': 1})
+            if reg.get('team') == str(assignments[reg['user']])
+        }
+        assignments = {user: team_id for user, team_id in assignments.items() if user in claimed}
+        for team_id, (team, users) in list(fills.items()):
+            fills[team_id] = (team, [u for u in users if u in claimed])
+        for doc in new_docs:
+            doc['members'] = [u for u in doc['members'] if u in claimed]
+            doc['member_count'] = len(doc['members'])
+            doc['open_slots'] = team_size - doc['member_count']
+            if doc['members']:
+                doc['leader'] = doc['members'][0]
+        new_docs = [doc for doc in new_docs if doc['members']]
+
+    # 2. Team writes; the open_slots guard keeps a concurrent manual join from overfilling
+    team_ops = [InsertOne(doc) for doc in new_docs]
+    for team_id, (team, users) in fills.items():
+        if users:
+            team_ops.append(UpdateOne(
+                {'_id': team_id, 'open_slots': {'$gte': len(users)}},
+                {'$push': {'members': {'$each': users}}, '$inc': {'member_count': len(users), 'open_slots': -len(users)}}
+            ))
+    result = TeamModel.collection.bulk_write(team_ops, ordered=False) if team_ops else None
+    if result is not None and result.modified_count != len(team_ops) - len(new_docs):
+        # Some team filled up in the meantime: release the claims of users it did not take
+        members = {t['_id']: set(t.get('members', [])) for t in TeamModel.collection.find(
+            {'_id': {'$in': list(fills)}}, {'members': 1})}
+        lost = [user for team_id, (_, users) in fills.items() for user in users
+                if user not in members.get(team_id, set())]
+        if lost:
+            RegistrationModel.collection.bulk_write([
+                UpdateOne({'user': user, 'event': event_id, 'team': str(assignments[user])}, {'$unset': {'team': ''}})
+                for user in lost
+            ], ordered=False)
+        for user in lost:
+            assignments.pop(user, None)
+
+    # Everybody still assigned left the unteamed pool for a new or existing team
+    EventStatsModel.add(event_id, unteamed=-len(assignments), team_members=len(assignments),
+                        teams=len(new_docs), team_capacity=team_size * len(new_docs))
+
+    # 3. One notification batch for everybody placed
+    names = {doc['_id']: doc['team_name'] for doc in new_docs}
+    names.update((team_id, team.get('team_name')) for team_id, (team, _) in fills.items())
+    NotificationModel.create_many([{
+        'user': user,
+        'message': f"You were placed in team '{names.get(team_id)}'",
+        'type': 'success',
+        'created_at': now,
+        'is_read': False,
+    } for user, team_id in assignments.items()])
+
+    summary.update({
+        'teams_filled': sum(1 for _, users in fills.values() if users),
+        'teams_created': len(new_docs),
+        'assigned': len(assignments),
+        'unassigned': summary['unassigned'] + summary['assigned'] - len(assignments),
+    })
+    return summary
@@ -1,13 +1,49 @@
-from core.mongo import db
+from core.mongo import db, read_collection
 from bson.objectid import ObjectId
+from pymongo import IndexModel, ReturnDocument, ASCENDING, DESCENDING
+from core.pagination import fetch_page
+from events.models import EventStatsModel
+
+# Update-pipeline stage deriving the counters from `members`, so teams
+# written before member_count/open_slots existed are corrected on write
+RECOUNT = {'$set': {
+    'member_count': {'$size': '$members'},
+    'open_slots': {'$max': [{'$subtract': [{'$ifNull': ['$max_size', 4]}, {'$size': '$members'}]}, 0]},
+}}
+
+# Matches teams with a free slot, including ones without a stored open_slots
+HAS_OPEN_SLOT = {'$or': [
+    {'open_slots': {'$gt': 0}},
+    {'open_slots': {'$exists': False},
+     '$expr': {'$lt': [{'$size': {'$ifNull': ['$members', []]}}, {'$ifNull': ['$max_size', 4]}]}},
+]}
 
 class TeamModel:
     collection = db['teams']
 
+    indexes = [
+        IndexModel([('event', ASCENDING), ('members', ASCENDING)], name='event_members'),
+        IndexModel([('event', ASCENDING), ('_id', DESCENDING)], name='event_recent'),
+        # Only teams with a free slot, for ?open=true listings
+        IndexModel([('event', ASCENDING), ('_id', DESCENDING)], name='event_open_recent',
+                   partialFilterExpression={'open_slots': {'$gt': 0}}),
+    ]
+
+    query_shapes = [
+        {'filter': {'event': 'x', 'members': 'x'}},
+        {'filter': {'event': 'x', 'members': {'$in': ['x']}}},
+        {'filter': {'event': 'x'}, 'sort': [('_id', DESCENDING)]},
+        {'filter': {'event': 'x', 'open_slots': {'$gt': 0}}, 'sort': [('_id', DESCENDING)]},
+    ]
+
     @classmethod
     def get_all(cls, filters=None):
         return list(cls.collection.find(filters or {}))
 
+    @classmethod
+    def get_page(cls, filters=None, limit=10, after=None, projection=None):
+        return fetch_page(read_collection(cls.collection), filters, limit, after, projection=projection)
+
     @classmethod
     def get_by_id(cls, team_id):
         try:
@@ -17,8 +53,13 @@ class TeamModel:
 
     @classmethod
     def create(cls, data):
+        # Denormalized so joins can check capacity inside the update filter
+        data['member_count'] = len(data.get('members', []))
+        data['open_slots'] = max(data.get('max_size', 4) - data['member_count'], 0)
         result = cls.collection.insert_one(data)
         data['_id'] = result.inserted_id
+        EventStatsModel.add(data.get('event'), teams=1, team_members=data['member_count'],
+                            team_capacity=data.get('max_size', 4))
         return data
 
     @classmethod
@@ -30,30 +71,83 @@ class TeamModel:
             return None
 
     @classmethod
-    def get_user_team_for_event(cls, user_id, event_id):
-        return cls.collection.find_one({
-            'event': str(event_id),
-            'members': str(user_id)
-        })
+    def get_user_team_for_event(cls, user_id, event_id, exclude=None):
+        query = {'event': str(event_id), 'members': str(user_id)}
+        if exclude is not None:
+            query['_id'] = {'$ne': ObjectId(exclude)}
+        return cls.collection.find_one(query)
+
+    @classmethod
+    def members_in_teams(cls, event_id, user_ids):
+        """The subset of `user_ids` that belong to a team of the event (event_members index)."""
+        user_ids = set(user_ids)
+        found = set()
+        for team in cls.collection.find({'event': str(event_id), 'members': {'$in': list(user_ids)}}, {'members': 1}):
+            found.update(team.get('members', []))
+        return found & user_ids
 
     @classmethod
-    def add_member(cls, team_id, user_id):
+    def join(cls, team_id, user_id):
+        """
+        Adds the user in one conditional update that only matches while the team
+        has an open slot and the user is not a member yet, so concurrent joins
+        cannot overfill it. Returns the updated team or None.
+        """
         try:
-            cls.collection.update_one(
-                {'_id': ObjectId(team_id)},
-                {'$addToSet': {'members': str(user_id)}}
+            team = cls.collection.find_one_and_update(
+                dict(HAS_OPEN_SLOT, _id=ObjectId(team_id), members={'$ne': str(user_id)}),
+                [{'$set': {'members': {'$concatArrays': [{'$ifNull': ['$members', []]}, [str(user_id)]]}}}, RECOUNT],
+                return_document=ReturnDocument.AFTER
             )
-            return True
         except:
-            return False
+            return None
+        if team:
+            EventStatsModel.add(team.get('event'), team_members=1)
+        return team
+
+    @classmethod
+    def leave(cls, team_id, user_id):
+        """Removes a non-leader member and frees the slot. Returns the updated team or None."""
+        try:
+            team = cls.collection.find_one_and_update(
+                {'_id': ObjectId(team_id), 'members': str(user_id), 'leader': {'$ne': str(user_id)}},
+                [cls._without_member(user_id), RECOUNT],
+                return_document=ReturnDocument.AFTER
+            )
+        except:
+            return None
+        if team:
+            EventStatsModel.add(team.get('event'), team_members=-1)
+        return team
+
+    @classmethod
+    def _without_member(cls, user_id):
+        return {'$set': {'members': {'$filter': {
+            'input': {'$ifNull': ['$members', []]}, 'cond': {'$ne': ['$$this', str(user_id)]},
+        }}}}
 
     @classmethod
     def remove_member(cls, team_id, user_id):
+        """
+        Drops a member whose registration was cancelled and frees the slot. A
+        leader hands the team to the longest-standing remaining member; a team
+        left empty is deleted. Returns the updated team, or None.
+        """
         try:
-            cls.collection.update_one(
-                {'_id': ObjectId(team_id)},
-                {'$pull': {'members': str(user_id)}}
+            team = cls.collection.find_one_and_update(
+                {'_id': ObjectId(team_id), 'members': str(user_id)},
+                [cls._without_member(user_id),
+                 {'$set': {'leader': {'$cond': [
+                     {'$eq': ['$leader', str(user_id)]}, {'$arrayElemAt': ['$members', 0]}, '$leader'
+                 ]}}},
+                 RECOUNT],
+                return_document=ReturnDocument.AFTER
             )
-            return True
         except:
-            return False
+            return None
+        if not team:
+            return None
+        EventStatsModel.add(team.get('event'), team_members=-1)
+        if not team['members'] and cls.collection.delete_one({'_id': team['_id'], 'members': []}).deleted_count:
+            EventStatsModel.add(team.get('event'), teams=-1, team_capacity=-team.get('max_size', 4))
+        return team
@@ -0,0 +1,247 @@
+from concurrent.futures import ThreadPoolExecutor
+from core.testing import MongoQueryCountMixin, MongoTestCase
+from registrations.models import RegistrationModel
+from users.models import UserModel
+from notifications.models import NotificationModel
+from .matchmaking import MatchmakingError, run as run_matchmaking
+from .models import TeamModel
+
+
+class TeamListingQueryTests(MongoQueryCountMixin, MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.event = self.make_event(self.make_user('organizer'))
+        self.member = self.make_user()
+        for i in range(5):
+            leader = str(self.make_user()['_id'])
+            TeamModel.create({'event': str(self.event['_id']), 'team_name': f'Team {i}',
+                              'leader': leader, 'members': [leader], 'max_size': 3})
+
+    def test_event_teams_query_count(self):
+        # Page, one $in each for events and members however many teams there are,
+        # and the user lookup if the principal cache misses
+        with self.assertMaxQueries(4):
+            response = self.client.get(f"/api/teams/event/{self.event['_id']}/?open=true", **self.auth(self.member))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 5)
+
+    def test_fields_narrow_the_listing(self):
+        path = f"/api/teams/event/{self.event['_id']}/"
+        self.client.get(path, **self.auth(self.member))  # warm the principal cache
+        # Just the page: no event or member lookups for the narrowed rows
+        with self.assertMaxQueries(1):
+            response = self.client.get(f'{path}?fields=team_name,open_slots', **self.auth(self.member))
+        self.assertEqual({tuple(sorted(t)) for t in response.json()['results']}, {('id', 'open_slots', 'team_name')})
+        self.assertEqual(self.client.get(f'{path}?fields=secret', **self.auth(self.member)).status_code, 400)
+
+
+class TeamJoinTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.leader = self.make_user()
+        self.event = self.make_event(self.make_user('organizer'))
+
+    def make_team(self, max_size):
+        leader_id = str(self.leader['_id'])
+        return TeamModel.create({'event': str(self.event['_id']), 'team_name': 'Test Team',
+                                 'leader': leader_id, 'members': [leader_id], 'max_size': max_size})
+
+    def test_join_stops_when_full(self):
+        team = self.make_team(max_size=2)
+        joined = TeamModel.join(team['_id'], 'user-a')
+        self.assertEqual((joined['member_count'], joined['open_slots']), (2, 0))
+        self.assertIsNone(TeamModel.join(team['_id'], 'user-b'))
+
+    def test_join_is_idempotent_per_user(self):
+        team = self.make_team(max_size=4)
+        self.assertIsNotNone(TeamModel.join(team['_id'], 'user-a'))
+        self.assertIsNone(TeamModel.join(team['_id'], 'user-a'))
+        self.assertEqual(TeamModel.get_by_id(team['_id'])['member_count'], 2)
+
+    def test_concurrent_joins_never_overfill(self):
+        team = self.make_team(max_size=3)
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            results = list(pool.map(lambda i: TeamModel.join(team['_id'], f'user-{i}'), range(10)))
+        self.assertEqual(sum(1 for r in results if r), 2)
+        stored = TeamModel.get_by_id(team['_id'])
+        self.assertEqual(len(stored['members']), 3)
+        self.assertEqual((stored['member_count'], stored['open_slots']), (3, 0))
+
+    def test_legacy_team_without_counters_is_joinable(self):
+        result = TeamModel.collection.insert_one({'event': str(self.event['_id']), 'team_name': 'Legacy',
+                                                  'leader': 'user-a', 'members': ['user-a'], 'max_size': 2})
+        joined = TeamModel.join(result.inserted_id, 'user-b')
+        self.assertEqual((joined['member_count'], joined['open_slots']), (2, 0))
+        self.assertIsNone(TeamModel.join(result.inserted_id, 'user-c'))
+
+    def test_leave_frees_the_slot(self):
+        team = self.make_team(max_size=2)
+        TeamModel.join(team['_id'], 'user-a')
+        left = TeamModel.leave(team['_id'], 'user-a')
+        self.assertEqual((left['member_count'], left['open_slots']), (1, 1))
+        # The leader cannot leave
+        self.assertIsNone(TeamModel.leave(team['_id'], str(self.leader['_id'])))
+
+
+class TeamCancellationTests(MongoQueryCountMixin, MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.event = self.make_event(self.make_user('organizer'))
+        self.leader, self.member = self.make_user(), self.make_user()
+        self.registrations = {str(user['_id']): self.register(user) for user in (self.leader, self.member)}
+        response = self.client.post('/api/teams/', {'event': str(self.event['_id']), 'team_name': 'Team', 'max_size': 3},
+                                    content_type='application/json', **self.auth(self.leader))
+        self.assertEqual(response.status_code, 201)
+        self.team_id = response.json()['id']
+        response = self.client.post(f'/api/teams/{self.team_id}/join/', **self.auth(self.member))
+        self.assertEqual(response.status_code, 200)
+
+    def register(self, user):
+        response = self.client.post('/api/registrations/', {'event': str(self.event['_id'])},
+                                    content_type='application/json', **self.auth(user))
+        self.assertEqual(response.status_code, 201)
+        return response.json()['id']
+
+    def cancel(self, user):
+        registration = self.registrations[str(user['_id'])]
+        response = self.client.delete(f'/api/registrations/{registration}/', **self.auth(user))
+        self.assertEqual(response.status_code, 204)
+
+    def test_cancelling_member_releases_slot(self):
+        self.cancel(self.member)
+        team = TeamModel.get_by_id(self.team_id)
+        self.assertEqual(team['members'], [str(self.leader['_id'])])
+        self.assertEqual((team['member_count'], team['open_slots']), (1, 2))
+
+    def test_cancelling_leader_hands_team_over(self):
+        self.cancel(self.leader)
+        team = TeamModel.get_by_id(self.team_id)
+        self.assertEqual(team['members'], [str(self.member['_id'])])
+        self.assertEqual(team['leader'], str(self.member['_id']))
+
+    def test_last_member_cancelling_removes_team(self):
+        self.cancel(self.member)
+        self.cancel(self.leader)
+        self.assertIsNone(TeamModel.get_by_id(self.team_id))
+
+
+class LegacyTeamClaimTests(MongoTestCase):
+    """Registrations written before the `team` claim existed, in a team all the same."""
+
+    def setUp(self):
+        super().setUp()
+        self.event = self.make_event(self.make_user('organizer'))
+        self.event_id = str(self.event['_id'])
+        self.user = self.make_user()
+        self.user_id = str(self.user['_id'])
+        self.registration = RegistrationModel.create({'user': self.user_id, 'event': self.event_id})
+        # Inserted directly, as it was before claim_team recorded anything
+        self.legacy_team = TeamModel.collection.insert_one({
+            'event': self.event_id, 'team_name': 'Legacy', 'leader': self.user_id,
+            'members': [self.user_id], 'max_size': 4,
+        }).inserted_id
+
+    def claim(self):
+        return RegistrationModel.get_by_id(self.registration['_id']).get('team')
+
+    def test_cannot_create_a_second_team(self):
+        response = self.client.post('/api/teams/', {'event': self.event_id, 'team_name': 'Second'},
+                                    content_type='application/json', **self.auth(self.user))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(TeamModel.collection.count_documents({'event': self.event_id}), 1)
+        # The claim now records the team the user is really in
+        self.assertEqual(self.claim(), str(self.legacy_team))
+
+    def test_cannot_join_a_second_team(self):
+        leader = self.make_user()
+        other = TeamModel.create({'event': self.event_id, 'team_name': 'Other', 'leader': str(leader['_id']),
+                                  'members': [str(leader['_id'])], 'max_size': 4})
+        response = self.client.post(f"/api/teams/{other['_id']}/join/", **self.auth(self.user))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(TeamModel.get_by_id(other['_id'])['members'], [str(leader['_id'])])
+        self.assertEqual(self.claim(), str(self.legacy_team))
+
+    def test_cancelling_leaves_the_legacy_team(self):
+        response = self.client.delete(f"/api/registrations/{self.registration['_id']}/", **self.auth(self.user))
+        self.assertEqual(response.status_code, 204)
+        self.assertIsNone(TeamModel.get_by_id(self.legacy_team))
+
+
+class MatchmakingTests(MongoQueryCountMixin, MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.organizer = self.make_user('organizer')
+        self.event = self.make_event(self.organizer)
+        self.event_id = str(self.event['_id'])
+
+    def register(self, count, **fields):
+        users = [str(self.make_user(**fields)['_id']) for _ in range(count)]
+        for user in users:
+            RegistrationModel.create({'user': user, 'event': self.event_id})
+        return users
+
+    def teams(self):
+        return list(TeamModel.collection.find({'event': self.event_id}).sort('_id', 1))
+
+    def test_new_teams_differ_in_size_by_at_most_one(self):
+        users = self.register(7)
+        summary = run_matchmaking(self.event_id, 3)
+        self.assertEqual((summary['teams_created'], summary['assigned'], summary['unassigned']), (3, 7, 0))
+        self.assertEqual(sorted(len(t['members']) for t in self.teams()), [2, 2, 3])
+        claims = {r['user']: r.get('team') for r in RegistrationModel.collection.find({'event': self.event_id})}
+        self.assertTrue(all(claims[user] for user in users))
+        self.assertEqual(NotificationModel.collection.count_documents({'message': {'$regex': '^You were placed'}}), 7)
+
+    def test_open_teams_are_topped_up_first(self):
+        leader = self.register(1)[0]
+        team = TeamModel.create({'event': self.event_id, 'team_name': 'Open', 'leader': leader,
+                                 'members': [leader], 'max_size': 3})
+        RegistrationModel.claim_team(leader, self.event_id, team['_id'])
+        self.register(2)
+        summary = run_matchmaking(self.event_id, 3)
+        self.assertEqual((summary['teams_filled'], summary['teams_created']), (1, 0))
+        stored = TeamModel.get_by_id(team['_id'])
+        self.assertEqual((len(stored['members']), stored['open_slots']), (3, 0))
+
+    def test_a_lone_user_is_left_over(self):
+        self.register(1)
+        self.assertEqual(run_matchmaking(self.event_id, 4)['unassigned'], 1)
+        self.assertEqual(self.teams(), [])
+
+    def test_dry_run_writes_nothing(self):
+        self.register(4)
+        summary = run_matchmaking(self.event_id, 2, dry_run=True)
+        self.assertEqual((summary['teams_created'], summary['dry_run']), (2, True))
+        self.assertEqual(self.teams(), [])
+        self.assertEqual(RegistrationModel.collection.count_documents({'team': {'$exists': True}}), 0)
+
+    def test_balance_on_spreads_a_field_over_teams(self):
+        self.register(2, organization='A')
+        self.register(2, organization='B')
+        run_matchmaking(self.event_id, 2, balance_on='organization')
+        for team in self.teams():
+            organizations = {UserModel.get_by_id(m)['organization'] for m in team['members']}
+            self.assertEqual(organizations, {'A', 'B'})
+
+    def test_members_without_a_claim_are_left_alone(self):
+        legacy, *_ = self.register(3)
+        TeamModel.collection.insert_one({'event': self.event_id, 'team_name': 'Legacy', 'leader': legacy,
+                                         'members': [legacy], 'max_size': 1, 'open_slots': 0})
+        self.assertEqual(run_matchmaking(self.event_id, 2)['assigned'], 2)
+        self.assertEqual(TeamModel.collection.count_documents({'members': legacy}), 1)
+
+    def test_writes_are_batched(self):
+        self.register(40)
+        # Reads for the plan, then one bulk write each for claims, teams, stats,
+        # notifications and unread counters, however many users are placed
+        with self.assertMaxQueries(10):
+            self.assertEqual(run_matchmaking(self.event_id, 4)['assigned'], 40)
+
+    def test_invalid_options_are_rejected(self):
+        with self.assertRaises(MatchmakingError):
+            run_matchmaking(self.event_id, 1)
+        with self.assertRaises(MatchmakingError):
+            run_matchmaking(self.event_id, 2, balance_on='$where')
+        response = self.client.post(f'/api/teams/event/{self.event_id}/matchmake/', {'team_size': 'x'},
+                                    content_type='application/json', **self.auth(self.organizer))
+        self.assertEqual(response.status_code, 400)
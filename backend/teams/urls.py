@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import TeamCreateView, EventTeamsView, JoinTeamView, LeaveTeamView, MyTeamView
+from .views import TeamCreateView, EventTeamsView, JoinTeamView, LeaveTeamView, MyTeamView, MatchmakingView
 
 urlpatterns = [
     path('', TeamCreateView.as_view(), name='create-team'),
     path('event/<str:event_id>/', EventTeamsView.as_view(), name='event-teams'),
+    path('event/<str:event_id>/matchmake/', MatchmakingView.as_view(), name='event-matchmaking'),
     path('<str:pk>/join/', JoinTeamView.as_view(), name='join-team'),
     path('<str:pk>/leave/', LeaveTeamView.as_view(), name='leave-team'),
     path('my-team/<str:event_id>/', MyTeamView.as_view(), name='my-team'),
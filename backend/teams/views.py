@@ -2,42 +2,84 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
+from bson.objectid import ObjectId
 from .models import TeamModel
+from .matchmaking import run as run_matchmaking, MatchmakingError
 from events.models import EventModel
-from users.models import UserModel
 from registrations.models import RegistrationModel
+from core.permissions import IsOrganizer
+from core.loaders import get_loaders
+from core.pagination import get_page_params, page_response_data, InvalidPageParams
+from core.fields import fields_projection, get_fields_param, InvalidFields
 import datetime
 
+# Every field serialize_team can emit, in response order
+TEAM_FIELDS = (
+    'id', 'event', 'event_details', 'team_name', 'leader', 'members', 'members_details',
+    'max_size', 'member_count', 'open_slots', 'created_at',
+)
+
+# Stored fields behind serialized names that are not stored under the same key
+# (member_count falls back to counting members on teams created before it existed)
+_STORED_AS = {
+    'id': '_id', 'event_details': 'event', 'members_details': 'members',
+    'member_count': ('member_count', 'members'),
+}
+
 # Helper to serialize Team with hydrated member info
-def serialize_team(team):
+def serialize_team(team, loaders=None, fields=TEAM_FIELDS):
     if not team: return None
-    
-    event = EventModel.get_by_id(team.get('event'))
-    event_details = {
-        'id': str(event['_id']),
-        'title': event.get('title')
-    } if event else None
-
-    members_details = []
-    for m_id in team.get('members', []):
-        u = UserModel.get_by_id(m_id)
-        if u:
-            members_details.append({
+    loaders = loaders or get_loaders()
+
+    data = {}
+    for field in fields:
+        if field == 'id':
+            data['id'] = str(team['_id'])
+        elif field == 'event_details':
+            event = loaders.events.load(team.get('event'))
+            data['event_details'] = {
+                'id': str(event['_id']),
+                'title': event.get('title')
+            } if event else None
+        elif field == 'members':
+            data['members'] = team.get('members', [])
+        elif field == 'members_details':
+            data['members_details'] = [{
                 'id': str(u['_id']),
                 'name': u.get('name')
-            })
-
-    return {
-        'id': str(team['_id']),
-        'event': team.get('event'),
-        'event_details': event_details,
-        'team_name': team.get('team_name'),
-        'leader': team.get('leader'),
-        'members': team.get('members', []),
-        'members_details': members_details,
-        'max_size': team.get('max_size', 4),
-        'created_at': team.get('created_at')
-    }
+            } for u in loaders.users.load_many(team.get('members', []))]
+        elif field == 'max_size':
+            data['max_size'] = team.get('max_size', 4)
+        elif field == 'member_count':
+            data['member_count'] = team.get('member_count', len(team.get('members', [])))
+        else:
+            data[field] = team.get(field)
+    return data
+
+def serialize_teams(teams, loaders, fields=TEAM_FIELDS):
+    if 'event_details' in fields:
+        loaders.events.prime(t.get('event') for t in teams)
+    if 'members_details' in fields:
+        loaders.users.prime(m for t in teams for m in t.get('members', []))
+    return [serialize_team(t, loaders, fields) for t in teams]
+
+def claim_registration(user_id, event_id, team_id):
+    """
+    RegistrationModel.claim_team, plus a check of team members for
+    registrations written before the `team` claim was recorded: until
+    reconcile_team_counts has run those carry no `team` even when the user is in
+    a team, so the claim alone would let them into a second one. Such a claim
+    is moved to the team the user is really in. Returns False when the user is
+    unregistered or already in a team.
+    """
+    if not RegistrationModel.claim_team(user_id, event_id, team_id):
+        return False
+    current = TeamModel.get_user_team_for_event(user_id, event_id, exclude=team_id)
+    if current:
+        RegistrationModel.release_team(user_id, event_id, team_id)
+        RegistrationModel.claim_team(user_id, event_id, current['_id'])
+        return False
+    return True
 
 class TeamCreateView(APIView):
     permission_classes = [IsAuthenticated]
@@ -47,14 +89,14 @@ class TeamCreateView(APIView):
         user_id = str(request.user['_id'])
         event_id = data.get('event')
 
-        # Check if already in a team for this event
-        if TeamModel.get_user_team_for_event(user_id, event_id):
-             return Response({'error': 'You are already in a team for this event'}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Check if user is actually registered for the event before creating a team
-        if not RegistrationModel.check_exists(user_id, event_id):
-            return Response({'error': 'You must register for the event before forming a team'}, status=status.HTTP_400_BAD_REQUEST)
+        # Claim the leader's registration first: fails unless registered and teamless
+        team_id = ObjectId()
+        if not claim_registration(user_id, event_id, team_id):
+            if not RegistrationModel.check_exists(user_id, event_id):
+                return Response({'error': 'You must register for the event before forming a team'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'error': 'You are already in a team for this event'}, status=status.HTTP_400_BAD_REQUEST)
 
+        data['_id'] = team_id
         data['leader'] = user_id
         data['members'] = [user_id]
         data['created_at'] = datetime.datetime.utcnow().isoformat()
@@ -62,44 +104,59 @@ class TeamCreateView(APIView):
         # Default max size if not provided or invalid
         try:
            data['max_size'] = int(data.get('max_size', 4))
-        except ValueError:
+        except (TypeError, ValueError):
            data['max_size'] = 4
            
-        team = TeamModel.create(data)
-        return Response(serialize_team(team), status=status.HTTP_201_CREATED)
+        try:
+            team = TeamModel.create(data)
+        except Exception:
+            RegistrationModel.release_team(user_id, event_id, team_id)
+            raise
+        return Response(serialize_team(team, get_loaders(request)), status=status.HTTP_201_CREATED)
 
 class EventTeamsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, event_id):
-        teams = TeamModel.get_all({'event': str(event_id)})
-        return Response([serialize_team(t) for t in teams])
+        try:
+            limit, after = get_page_params(request)
+            # ?fields=team_name,open_slots narrows the listing
+            fields = get_fields_param(request, TEAM_FIELDS, TEAM_FIELDS)
+        except (InvalidPageParams, InvalidFields) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        filters = {'event': str(event_id)}
+        # ?open=true lists only teams with a free slot (partial event_open_recent index)
+        if request.query_params.get('open') == 'true':
+            filters['open_slots'] = {'$gt': 0}
+        teams, next_cursor = TeamModel.get_page(filters, limit, after, fields_projection(fields, _STORED_AS))
+        return Response(page_response_data(serialize_teams(teams, get_loaders(request), fields), next_cursor))
 
 class JoinTeamView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk):
         user_id = str(request.user['_id'])
-        team = TeamModel.get_by_id(pk)
 
+        # Capacity and membership are checked inside the update itself
+        team = TeamModel.join(pk, user_id)
         if not team:
-            return Response({'error': 'Team not found'}, status=status.HTTP_404_NOT_FOUND)
+            # Failure path only: find out which condition did not hold
+            current = TeamModel.get_by_id(pk)
+            if not current:
+                return Response({'error': 'Team not found'}, status=status.HTTP_404_NOT_FOUND)
+            if user_id in current.get('members', []):
+                return Response({'error': 'You are already in this team'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'error': 'Team is full'}, status=status.HTTP_400_BAD_REQUEST)
 
         event_id = team.get('event')
 
-        # Verify Registration
-        if not RegistrationModel.check_exists(user_id, event_id):
-            return Response({'error': 'You must register for the event first'}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Verify not already in a team
-        if TeamModel.get_user_team_for_event(user_id, event_id):
-             return Response({'error': 'You are already in a team for this event'}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Verify capacity
-        if len(team.get('members', [])) >= team.get('max_size', 4):
-             return Response({'error': 'Team is full'}, status=status.HTTP_400_BAD_REQUEST)
-
-        TeamModel.add_member(pk, user_id)
+        # Registered and not in another team, enforced by the registration claim
+        if not claim_registration(user_id, event_id, pk):
+            TeamModel.leave(pk, user_id)
+            if not RegistrationModel.check_exists(user_id, event_id):
+                return Response({'error': 'You must register for the event first'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'error': 'You are already in a team for this event'}, status=status.HTTP_400_BAD_REQUEST)
         
         # trigger notification manual via PyMongo
         from notifications.models import NotificationModel
@@ -125,18 +182,17 @@ class LeaveTeamView(APIView):
 
     def delete(self, request, pk):
         user_id = str(request.user['_id'])
-        team = TeamModel.get_by_id(pk)
+        team = TeamModel.leave(pk, user_id)
 
         if not team:
-            return Response({'error': 'Team not found'}, status=status.HTTP_404_NOT_FOUND)
-
-        if user_id not in team.get('members', []):
-             return Response({'error': 'You are not in this team'}, status=status.HTTP_400_BAD_REQUEST)
-             
-        if user_id == team.get('leader'):
-             return Response({'error': 'Leader cannot leave. Delete team instead or transfer leadership (not implemented).'}, status=status.HTTP_400_BAD_REQUEST)
-
-        TeamModel.remove_member(pk, user_id)
+            current = TeamModel.get_by_id(pk)
+            if not current:
+                return Response({'error': 'Team not found'}, status=status.HTTP_404_NOT_FOUND)
+            if user_id == current.get('leader'):
+                return Response({'error': 'Leader cannot leave. Delete team instead or transfer leadership (not implemented).'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'error': 'You are not in this team'}, status=status.HTTP_400_BAD_REQUEST)
+
+        RegistrationModel.release_team(user_id, team.get('event'), pk)
         
         # Notify leader
         from notifications.models import NotificationModel
@@ -160,4 +216,28 @@ class MyTeamView(APIView):
         if not team:
             return Response({'error': 'You are not in a team for this event'}, status=status.HTTP_404_NOT_FOUND)
 
-        return Response(serialize_team(team))
+        return Response(serialize_team(team, get_loaders(request)))
+
+class MatchmakingView(APIView):
+    permission_classes = [IsAuthenticated, IsOrganizer]
+
+    def post(self, request, event_id):
+        event = EventModel.get_by_id(event_id)
+        if not event or event.get('organizer') != str(request.user['_id']):
+            return Response({'error': 'Event not found or permission denied'}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            team_size = int(request.data.get('team_size', 4))
+        except (TypeError, ValueError):
+            return Response({'error': 'team_size must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Puts every registrant without a team into open teams, then new ones
+        try:
+            summary = run_matchmaking(
+                event_id, team_size,
+                balance_on=request.data.get('balance_on') or None,
+                dry_run=str(request.data.get('dry_run', '')).lower() in ('1', 'true')
+            )
+        except MatchmakingError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary)
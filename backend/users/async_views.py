@@ -0,0 +1,80 @@
+from pymongo.errors import DuplicateKeyError
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.permissions import AllowAny
+from core.async_views import AsyncAPIView
+from .hashing import HashingPoolSaturated
+from .models import UserModel
+from .tokens import InvalidRefreshToken, agenerate_tokens, arotate
+from .views import RegisterView, LoginView, TokenRefreshView, HASHING_BUSY, serialize_user
+
+
+class HashingAPIView(AsyncAPIView):
+    permission_classes = [AllowAny]
+
+    def busy(self):
+        response = self.respond(HASHING_BUSY, status=503)
+        response['Retry-After'] = '1'
+        return response
+
+
+class AsyncRegisterView(HashingAPIView):
+    sync_view = RegisterView
+
+    async def post(self, request):
+        data = self.parse_body(request)
+        email = data.get('email')
+        name = data.get('name')
+        password = data.get('password')
+        role = data.get('role', 'participant')
+
+        if not email or not name or not password:
+            return self.respond({'error': 'Please provide email, name, and password.'}, status=400)
+
+        existing = await UserModel.aget_by_email(email)
+        if existing and not UserModel.is_claimable(existing):
+            return self.respond({'error': 'User with this email already exists.'}, status=400)
+
+        # The event loop keeps serving other requests while the hash is computed
+        try:
+            if existing:
+                user = await UserModel.aclaim_user(existing, name=name, password=password, role=role)
+                if user is None:
+                    return self.respond({'error': 'User with this email already exists.'}, status=400)
+            else:
+                user = await UserModel.acreate_user(email=email, name=name, password=password, role=role)
+        except HashingPoolSaturated:
+            return self.busy()
+        except DuplicateKeyError:
+            return self.respond({'error': 'User with this email already exists.'}, status=400)
+        return self.respond({'user': serialize_user(user), 'tokens': await agenerate_tokens(user)}, status=201)
+
+
+class AsyncLoginView(HashingAPIView):
+    sync_view = LoginView
+
+    async def post(self, request):
+        data = self.parse_body(request)
+        user = await UserModel.aget_by_email(data.get('email'))
+        try:
+            valid = bool(user) and await UserModel.averify_password(user, data.get('password'))
+        except HashingPoolSaturated:
+            return self.busy()
+        if not valid:
+            return self.respond({'detail': 'Invalid credentials'}, status=401)
+        return self.respond(await agenerate_tokens(user))
+
+
+class AsyncTokenRefreshView(AsyncAPIView):
+    sync_view = TokenRefreshView
+    permission_classes = [AllowAny]
+
+    async def initial(self, request):
+        # The access token is usually expired by now; only the refresh token counts
+        request.user, request.auth = AnonymousUser(), None
+
+    async def post(self, request):
+        try:
+            tokens = await arotate(self.parse_body(request).get('refresh'))
+        except InvalidRefreshToken:
+            return self.respond({'detail': 'Invalid or expired refresh token'}, status=401)
+        return self.respond(tokens)
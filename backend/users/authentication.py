@@ -28,9 +28,53 @@ from rest_framework import exceptions
 import jwt
 from django.conf import settings
 from .models import UserModel
+from .cache import principal_cache
 
 class PyMongoJWTAuthentication(authentication.BaseAuthentication):
     def authenticate(self, request):
+        decoded = self.decode_token(request)
+        if decoded is None:
+            return None
+        payload, token = decoded
+
+        mongo_user = self.principal_from_claims(payload)
+        if mongo_user is None:
+            user_id = str(payload.get('user_id'))
+            mongo_user = principal_cache.get(user_id)
+            if mongo_user is None:
+                user = UserModel.get_by_id(user_id)
+                if not user:
+                    raise exceptions.AuthenticationFailed('User not found')
+                mongo_user = PyMongoUser(user)
+                principal_cache.set(user_id, mongo_user)
+            
+        return (mongo_user, token)
+
+    async def aauthenticate(self, request):
+        """Async counterpart of `authenticate` for the async views."""
+        decoded = self.decode_token(request)
+        if decoded is None:
+            return None
+        payload, token = decoded
+
+        mongo_user = self.principal_from_claims(payload)
+        if mongo_user is None:
+            user_id = str(payload.get('user_id'))
+            mongo_user = principal_cache.get(user_id)
+            if mongo_user is None:
+                user = await UserModel.aget_by_id(user_id)
+                if not user:
+                    raise exceptions.AuthenticationFailed('User not found')
+                mongo_user = PyMongoUser(user)
+                principal_cache.set(user_id, mongo_user)
+
+        return (mongo_user, token)
+
+    def authenticate_header(self, request):
+        # Makes DRF answer 401 rather than 403, which is what triggers a refresh
+        return 'Bearer'
+
+    def decode_token(self, request):
         auth_header = request.headers.get('Authorization')
         if not auth_header:
             return None
@@ -41,18 +85,28 @@ class PyMongoJWTAuthentication(authentication.BaseAuthentication):
                 return None
         except ValueError:
             return None
-        
+        return self.decode_jwt(token), token
+
+    def decode_jwt(self, token):
+        """Verified access token claims; also used by the notification socket."""
         try:
             payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
         except jwt.ExpiredSignatureError:
             raise exceptions.AuthenticationFailed('Token has expired')
         except jwt.InvalidTokenError:
             raise exceptions.AuthenticationFailed('Invalid token')
-            
-        user = UserModel.get_by_id(payload.get('user_id'))
-        if not user:
-            raise exceptions.AuthenticationFailed('User not found')
-            
-        mongo_user = PyMongoUser(user)
-            
-        return (mongo_user, token)
+        # Refresh tokens are only accepted by the refresh endpoint
+        if payload.get('type') == 'refresh':
+            raise exceptions.AuthenticationFailed('Invalid token')
+        return payload
+
+    def principal_from_claims(self, payload):
+        if settings.AUTH_TRUST_TOKEN_CLAIMS and 'role' in payload:
+            # Claims are covered by the signature, so no lookup is needed
+            return PyMongoUser({
+                '_id': str(payload.get('user_id')),
+                'email': payload.get('email'),
+                'name': payload.get('name'),
+                'role': payload['role'],
+            })
+        return None
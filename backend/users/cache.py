@@ -0,0 +1,12 @@
+from django.conf import settings
+from core.cache import TTLCache
+from core import metrics
+
+# Authenticated PyMongoUser principals keyed by user id. Entries are dropped by
+# UserModel.update when role/active flag change; the TTL bounds staleness for
+# changes made by other processes.
+principal_cache = TTLCache(
+    maxsize=settings.AUTH_PRINCIPAL_CACHE['MAX_SIZE'],
+    ttl=settings.AUTH_PRINCIPAL_CACHE['TTL'],
+)
+metrics.register('auth_principal_cache', principal_cache.stats)
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, check_password
+from core import metrics
+
+
+class HashingPoolSaturated(Exception):
+    """Raised instead of queueing when the pool already has MAX_QUEUE jobs waiting."""
+
+
+def _verify(raw_password, encoded):
+    # Django calls the setter only for a correct password whose hasher or
+    # iteration count is out of date; the new hash is made in the same job
+    rehashed = []
+    valid = check_password(raw_password, encoded, setter=lambda raw: rehashed.append(make_password(raw)))
+    return valid, (rehashed[0] if rehashed else None)
+
+
+class PasswordHashingPool:
+    """
+    Bounded worker pool for the deliberately slow password hashers, so a login
+    storm queues here instead of tying up every request worker. hashlib's PBKDF2
+    (and the argon2/bcrypt bindings) release the GIL, so threads run in parallel.
+    Jobs beyond `workers + max_queue` are rejected at once.
+    """
+    def __init__(self, workers, max_queue):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HashingPoolSaturated()
+            self._pending += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+            self.completed += 1
+
+    def hash(self, raw_password):
+        return self.submit(make_password, raw_password).result()
+
+    def verify(self, raw_password, encoded):
+        """Returns (valid, new_hash); new_hash is set when the stored hash needs upgrading."""
+        return self.submit(_verify, raw_password, encoded).result()
+
+    async def ahash(self, raw_password):
+        return await asyncio.wrap_future(self.submit(make_password, raw_password))
+
+    async def averify(self, raw_password, encoded):
+        return await asyncio.wrap_future(self.submit(_verify, raw_password, encoded))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'pending': self._pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+            }
+
+
+password_pool = PasswordHashingPool(
+    workers=settings.PASSWORD_HASHING['WORKERS'],
+    max_queue=settings.PASSWORD_HASHING['MAX_QUEUE'],
+)
+metrics.register('password_hashing', password_pool.stats)
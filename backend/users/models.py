@@ -1,16 +1,33 @@
-from django.contrib.auth.hashers import make_password, check_password
-from core.mongo import db
+from django.contrib.auth.hashers import make_password, check_password, is_password_usable
+from pymongo import IndexModel, ASCENDING
+from pymongo.errors import BulkWriteError
+from core.mongo import db, get_async_db, to_object_ids
+from core.versions import CollectionVersionModel
+from .cache import principal_cache
+from .hashing import password_pool
 
 # This class replaces Django ORM queries for the user collection
 class UserModel:
     collection = db['users']
 
+    indexes = [
+        IndexModel([('email', ASCENDING)], name='email_unique', unique=True),
+    ]
+
+    # Representative filters/sorts issued by this model, checked by `check_query_plans`
+    query_shapes = [
+        {'filter': {'email': 'user@example.com'}},
+    ]
+
+    # Fields other responses embed about a user (organizer/member/participant details)
+    reference_projection = {'name': 1, 'email': 1}
+
     @classmethod
     def create_user(cls, email, name, password, role='participant'):
         user_data = {
             'email': email,
             'name': name,
-            'password': make_password(password),
+            'password': password_pool.hash(password),
             'role': role,
             'is_active': True,
         }
@@ -22,6 +39,55 @@ class UserModel:
     def get_by_email(cls, email):
         return cls.collection.find_one({'email': email})
 
+    @classmethod
+    def get_by_emails(cls, emails, projection=None):
+        # One $in over the email_unique index; keyed by email
+        if not emails:
+            return {}
+        return {u['email']: u for u in cls.collection.find({'email': {'$in': list(emails)}}, projection)}
+
+    @classmethod
+    def create_many(cls, users):
+        """
+        Inserts imported accounts in one unordered insert_many. They get an
+        unusable password, so nobody can log in as them until the owner
+        signs up with that email (see `claim_user`).
+        Emails that already exist (e.g. a concurrent sign-up) are skipped.
+        """
+        docs = [{
+            'email': user['email'],
+            'name': user['name'],
+            'password': make_password(None),
+            'role': 'participant',
+            'is_active': True,
+        } for user in users]
+        if not docs:
+            return 0
+        try:
+            return len(cls.collection.insert_many(docs, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            return e.details.get('nInserted', 0)
+
+    @classmethod
+    def is_claimable(cls, user):
+        # Created by a roster import and never signed up for
+        return not is_password_usable(user.get('password'))
+
+    @classmethod
+    def claim_user(cls, user, name, password, role='participant'):
+        """
+        Sets the profile and password of an imported account. Matches on the
+        old (unusable) hash, so only one of two concurrent claims succeeds;
+        returns None for the loser.
+        """
+        data = {'name': name, 'password': password_pool.hash(password), 'role': role}
+        result = cls.collection.update_one({'_id': user['_id'], 'password': user['password']}, {'$set': data})
+        if not result.modified_count:
+            return None
+        principal_cache.invalidate(str(user['_id']))
+        CollectionVersionModel.bump('users')
+        return dict(user, _id=str(user['_id']), **data)
+
     @classmethod
     def get_by_id(cls, user_id):
         from bson.objectid import ObjectId
@@ -30,6 +96,159 @@ class UserModel:
         except:
             return None
 
+    @classmethod
+    def get_many(cls, user_ids, projection=None):
+        object_ids = to_object_ids(user_ids)
+        if not object_ids:
+            return {}
+        return {str(u['_id']): u for u in cls.collection.find({'_id': {'$in': object_ids}}, projection)}
+
+    @classmethod
+    def update(cls, user_id, data):
+        from bson.objectid import ObjectId
+        try:
+            cls.collection.update_one({'_id': ObjectId(user_id)}, {'$set': data})
+        except:
+            return None
+        # Any profile field may be baked into the cached principal or an
+        # organizer_details block in a cached catalogue response
+        principal_cache.invalidate(str(user_id))
+        CollectionVersionModel.bump('users')
+        return cls.get_by_id(user_id)
+
     @classmethod
     def check_password(cls, raw_password, hashed_password):
         return check_password(raw_password, hashed_password)
+
+    @classmethod
+    def verify_password(cls, user, raw_password):
+        # Runs in the hashing pool; a hash made with old parameters is upgraded on success
+        valid, new_hash = password_pool.verify(raw_password, user['password'])
+        if new_hash:
+            cls.collection.update_one({'_id': user['_id'], 'password': user['password']}, {'$set': {'password': new_hash}})
+        return valid
+
+    # Async API used by the async views and authentication
+
+    @classmethod
+    def acollection(cls):
+        return get_async_db()[cls.collection.name]
+
+    @classmethod
+    async def acreate_user(cls, email, name, password, role='participant'):
+        user_data = {
+            'email': email,
+            'name': name,
+            'password': await password_pool.ahash(password),
+            'role': role,
+            'is_active': True,
+        }
+        result = await cls.acollection().insert_one(user_data)
+        user_data['_id'] = str(result.inserted_id)
+        return user_data
+
+    @classmethod
+    async def aclaim_user(cls, user, name, password, role='participant'):
+        data = {'name': name, 'password': await password_pool.ahash(password), 'role': role}
+        result = await cls.acollection().update_one(
+            {'_id': user['_id'], 'password': user['password']}, {'$set': data})
+        if not result.modified_count:
+            return None
+        principal_cache.invalidate(str(user['_id']))
+        await CollectionVersionModel.abump('users')
+        return dict(user, _id=str(user['_id']), **data)
+
+    @classmethod
+    async def aget_by_email(cls, email):
+        return await cls.acollection().find_one({'email': email})
+
+    @classmethod
+    async def averify_password(cls, user, raw_password):
+        valid, new_hash = await password_pool.averify(raw_password, user['password'])
+        if new_hash:
+            await cls.acollection().update_one(
+                {'_id': user['_id'], 'password': user['password']}, {'$set': {'password': new_hash}})
+        return valid
+
+    @classmethod
+    async def aget_by_id(cls, user_id):
+        from bson.objectid import ObjectId
+        try:
+            return await cls.acollection().find_one({'_id': ObjectId(user_id)})
+        except:
+            return None
+
+    @classmethod
+    async def aget_many(cls, user_ids, projection=None):
+        object_ids = to_object_ids(user_ids)
+        if not object_ids:
+            return {}
+        users = await cls.acollection().find({'_id': {'$in': object_ids}}, projection).to_list(None)
+        return {str(u['_id']): u for u in users}
+
+
+class RefreshTokenModel:
+    """
+    Server side state of refresh tokens, one small document per token:
+    {_id: jti, user, family, used, expires_at}. A refresh is one find-and-modify
+    on _id; the TTL index drops expired tokens.
+    """
+    collection = db['refresh_tokens']
+
+    indexes = [
+        IndexModel([('family', ASCENDING)], name='family'),
+        IndexModel([('expires_at', ASCENDING)], name='expires_at_ttl', expireAfterSeconds=0),
+    ]
+
+    query_shapes = [
+        {'filter': {'family': 'x'}},
+    ]
+
+    @classmethod
+    def create(cls, jti, user_id, family, expires_at):
+        cls.collection.insert_one({
+            '_id': jti, 'user': str(user_id), 'family': family, 'used': False, 'expires_at': expires_at,
+        })
+
+    @classmethod
+    def consume(cls, jti):
+        """
+        Marks the token used and returns it, or None when it is unknown, revoked
+        or already used. Presenting a used token means it was copied, so the
+        whole family (every token rotated from the same login) is revoked.
+        """
+        token = cls.collection.find_one_and_update({'_id': jti, 'used': False}, {'$set': {'used': True}})
+        if token is None:
+            replayed = cls.collection.find_one({'_id': jti}, {'family': 1})
+            if replayed:
+                cls.revoke_family(replayed['family'])
+        return token
+
+    @classmethod
+    def revoke_family(cls, family):
+        cls.collection.delete_many({'family': family})
+
+    # Async API used by the async views
+
+    @classmethod
+    def acollection(cls):
+        return get_async_db()[cls.collection.name]
+
+    @classmethod
+    async def acreate(cls, jti, user_id, family, expires_at):
+        await cls.acollection().insert_one({
+            '_id': jti, 'user': str(user_id), 'family': family, 'used': False, 'expires_at': expires_at,
+        })
+
+    @classmethod
+    async def aconsume(cls, jti):
+        token = await cls.acollection().find_one_and_update({'_id': jti, 'used': False}, {'$set': {'used': True}})
+        if token is None:
+            replayed = await cls.acollection().find_one({'_id': jti}, {'family': 1})
+            if replayed:
+                await cls.arevoke_family(replayed['family'])
+        return token
+
+    @classmethod
+    async def arevoke_family(cls, family):
+        await cls.acollection().delete_many({'family': family})
@@ -0,0 +1,182 @@
+import datetime
+import threading
+from unittest import mock
+import jwt
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from core.testing import TEST_PASSWORD, MongoQueryCountMixin, MongoTestCase
+from registrations.async_views import AsyncEventRegisterView
+from .authentication import PyMongoJWTAuthentication
+from .hashing import HashingPoolSaturated, PasswordHashingPool
+from .models import RefreshTokenModel, UserModel
+from .tokens import InvalidRefreshToken, access_token, generate_tokens, revoke, rotate
+
+
+class PrincipalCacheTests(MongoQueryCountMixin, MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+
+    def authenticate(self):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {access_token(self.user)}')
+        return PyMongoJWTAuthentication().authenticate(request)[0]
+
+    def test_principal_is_looked_up_once(self):
+        with self.assertMaxQueries(1):
+            self.authenticate()
+        with self.assertMaxQueries(0):
+            principal = self.authenticate()
+        self.assertEqual(principal['_id'], str(self.user['_id']))
+
+    def test_update_drops_the_cached_principal(self):
+        self.assertEqual(self.authenticate().role, 'participant')
+        UserModel.update(self.user['_id'], {'role': 'organizer'})
+        self.assertEqual(self.authenticate().role, 'organizer')
+
+    @override_settings(AUTH_TRUST_TOKEN_CLAIMS=True)
+    def test_trusted_claims_skip_the_lookup(self):
+        with self.assertMaxQueries(0):
+            principal = self.authenticate()
+        self.assertEqual((principal.role, principal.email), ('participant', self.user['email']))
+
+
+class PasswordHashingPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = PasswordHashingPool(workers=1, max_queue=1)
+        self.addCleanup(self.pool._executor.shutdown)
+
+    def test_jobs_beyond_the_queue_are_rejected(self):
+        gate = threading.Event()
+        running = [self.pool.submit(gate.wait), self.pool.submit(gate.wait)]
+        with self.assertRaises(HashingPoolSaturated):
+            self.pool.submit(gate.wait)
+        gate.set()
+        for future in running:
+            future.result(timeout=5)
+        # Joins the worker, so the completion callbacks have run
+        self.pool._executor.shutdown(wait=True)
+        stats = self.pool.stats()
+        self.assertEqual((stats['pending'], stats['completed'], stats['rejected']), (0, 2, 1))
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.PBKDF2PasswordHasher',
+                                         'django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_outdated_hash_is_upgraded_on_success(self):
+        encoded = make_password('secret', hasher='md5')
+        valid, new_hash = self.pool.verify('secret', encoded)
+        self.assertTrue(valid)
+        self.assertTrue(new_hash.startswith('pbkdf2_sha256$'))
+        self.assertEqual(self.pool.verify('wrong', encoded), (False, None))
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_async_hash(self):
+        encoded = async_to_sync(self.pool.ahash)('secret')
+        self.assertTrue(check_password('secret', encoded))
+
+
+class HashingBusyTests(MongoTestCase):
+    def test_saturated_pool_answers_503(self):
+        user = self.make_user()
+        with mock.patch('users.models.password_pool.verify', side_effect=HashingPoolSaturated):
+            response = self.client.post('/api/auth/login/', {'email': user['email'], 'password': TEST_PASSWORD},
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+
+class TokenRotationTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+
+    def refresh(self, token):
+        return self.client.post('/api/auth/refresh/', {'refresh': token}, content_type='application/json')
+
+    def test_login_issues_a_pair(self):
+        response = self.client.post('/api/auth/login/', {'email': self.user['email'], 'password': TEST_PASSWORD},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {'access', 'refresh'})
+
+    def test_rotate_issues_a_new_pair_in_the_same_family(self):
+        first = generate_tokens(self.user)
+        second = rotate(first['refresh'])
+        self.assertNotEqual(first['refresh'], second['refresh'])
+        self.assertEqual(RefreshTokenModel.collection.count_documents({'user': str(self.user['_id'])}), 2)
+        self.assertEqual(len(RefreshTokenModel.collection.distinct('family')), 1)
+
+    def test_reusing_a_refresh_token_revokes_the_family(self):
+        first = generate_tokens(self.user)
+        second = rotate(first['refresh'])
+        with self.assertRaises(InvalidRefreshToken):
+            rotate(first['refresh'])
+        # The legitimate holder's newer token died with the family
+        with self.assertRaises(InvalidRefreshToken):
+            rotate(second['refresh'])
+
+    def test_refresh_endpoint(self):
+        tokens = generate_tokens(self.user)
+        response = self.refresh(tokens['refresh'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.refresh(tokens['refresh']).status_code, 401)
+        self.assertEqual(self.refresh('garbage').status_code, 401)
+
+    def test_access_token_is_not_a_refresh_token(self):
+        self.assertEqual(self.refresh(generate_tokens(self.user)['access']).status_code, 401)
+
+    def test_logout_revokes_every_token_of_the_login(self):
+        tokens = rotate(generate_tokens(self.user)['refresh'])
+        response = self.client.post('/api/auth/logout/', {'refresh': tokens['refresh']}, content_type='application/json')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(RefreshTokenModel.collection.count_documents({}), 0)
+        self.assertEqual(self.refresh(tokens['refresh']).status_code, 401)
+
+    def test_revoke_accepts_an_expired_token(self):
+        tokens = generate_tokens(self.user)
+        RefreshTokenModel.collection.update_many({}, {'$set': {'expires_at': datetime.datetime(2000, 1, 1)}})
+        revoke(tokens['refresh'])
+        self.assertEqual(RefreshTokenModel.collection.count_documents({}), 0)
+
+
+class AccessTokenTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user()
+
+    def get_me(self, token):
+        return self.client.get('/api/auth/me/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_valid_access_token(self):
+        response = self.get_me(generate_tokens(self.user)['access'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['email'], self.user['email'])
+
+    def test_expired_access_token_gets_a_401_challenge(self):
+        # 401 (not 403) is what makes the frontend refresh
+        token = jwt.encode({'type': 'access', 'user_id': str(self.user['_id']),
+                            'exp': datetime.datetime.utcnow() - datetime.timedelta(minutes=1)},
+                           settings.SECRET_KEY, algorithm='HS256')
+        response = self.get_me(token)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+
+    def test_refresh_token_is_not_an_access_token(self):
+        response = self.get_me(generate_tokens(self.user)['refresh'])
+        self.assertEqual(response.status_code, 401)
+
+    def test_other_views_answer_401_too(self):
+        token = generate_tokens(self.user)['refresh']
+        response = self.client.post('/api/registrations/', {'event': 'x'}, content_type='application/json',
+                                    HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+
+    def test_async_views_answer_401_too(self):
+        # Routed only under ASGI, so called directly
+        token = generate_tokens(self.user)['refresh']
+        request = RequestFactory().post('/api/registrations/', {'event': 'x'}, content_type='application/json',
+                                        HTTP_AUTHORIZATION=f'Bearer {token}')
+        response = async_to_sync(AsyncEventRegisterView.as_view())(request)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer')
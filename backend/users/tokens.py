@@ -0,0 +1,109 @@
+import datetime
+import uuid
+import jwt
+from django.conf import settings
+from .cache import principal_cache
+from .models import UserModel, RefreshTokenModel
+
+
+class InvalidRefreshToken(Exception):
+    pass
+
+
+def access_token(user):
+    # Verified statelessly by PyMongoJWTAuthentication, so it is kept short lived
+    now = datetime.datetime.utcnow()
+    payload = {
+        'type': 'access',
+        'user_id': str(user['_id']),
+        # Signed profile claims let authentication skip the users lookup
+        # when AUTH_TRUST_TOKEN_CLAIMS is enabled
+        'role': user.get('role', 'participant'),
+        'name': user.get('name'),
+        'email': user.get('email'),
+        'exp': now + settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'],
+        'iat': now,
+    }
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
+
+
+def _refresh_token(user_id, family):
+    now = datetime.datetime.utcnow()
+    record = {
+        'jti': uuid.uuid4().hex,
+        'user_id': str(user_id),
+        # Every token rotated from one login shares a family, revoked as a whole
+        'family': family or uuid.uuid4().hex,
+        'expires_at': now + settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME'],
+    }
+    token = jwt.encode({
+        'type': 'refresh',
+        'user_id': record['user_id'],
+        'jti': record['jti'],
+        'family': record['family'],
+        'exp': record['expires_at'],
+        'iat': now,
+    }, settings.SECRET_KEY, algorithm='HS256')
+    return token, record
+
+
+def refresh_token(user_id, family=None):
+    token, record = _refresh_token(user_id, family)
+    RefreshTokenModel.create(record['jti'], record['user_id'], record['family'], record['expires_at'])
+    return token
+
+
+async def arefresh_token(user_id, family=None):
+    token, record = _refresh_token(user_id, family)
+    await RefreshTokenModel.acreate(record['jti'], record['user_id'], record['family'], record['expires_at'])
+    return token
+
+
+def generate_tokens(user, family=None):
+    return {'access': access_token(user), 'refresh': refresh_token(user['_id'], family)}
+
+
+async def agenerate_tokens(user, family=None):
+    return {'access': access_token(user), 'refresh': await arefresh_token(user['_id'], family)}
+
+
+def decode_refresh_token(token, verify_exp=True):
+    try:
+        payload = jwt.decode(token or '', settings.SECRET_KEY, algorithms=['HS256'],
+                             options={'verify_exp': verify_exp})
+    except jwt.InvalidTokenError:
+        raise InvalidRefreshToken()
+    if payload.get('type') != 'refresh' or not payload.get('jti'):
+        raise InvalidRefreshToken()
+    return payload
+
+
+def rotate(token):
+    """
+    Trades a refresh token for a new access/refresh pair. Costs a signature
+    check and a find-and-modify on _id; the user document is only read when
+    the principal cache misses. No password hashing is involved.
+    """
+    payload = decode_refresh_token(token)
+    if not RefreshTokenModel.consume(payload['jti']):
+        raise InvalidRefreshToken()
+    user = principal_cache.get(payload['user_id']) or UserModel.get_by_id(payload['user_id'])
+    if not user:
+        raise InvalidRefreshToken()
+    return generate_tokens(user, payload['family'])
+
+
+async def arotate(token):
+    payload = decode_refresh_token(token)
+    if not await RefreshTokenModel.aconsume(payload['jti']):
+        raise InvalidRefreshToken()
+    user = principal_cache.get(payload['user_id']) or await UserModel.aget_by_id(payload['user_id'])
+    if not user:
+        raise InvalidRefreshToken()
+    return await agenerate_tokens(user, payload['family'])
+
+
+def revoke(token):
+    # Logging out ends every token rotated from the same login
+    payload = decode_refresh_token(token, verify_exp=False)
+    RefreshTokenModel.revoke_family(payload['family'])
@@ -1,11 +1,16 @@
+from django.conf import settings
 from django.urls import path
-from .views import RegisterView, LoginView, UserProfileView
+from .views import RegisterView, LoginView, TokenRefreshView, LogoutView, UserProfileView
+from .async_views import AsyncRegisterView, AsyncLoginView, AsyncTokenRefreshView
+
+register_view = AsyncRegisterView if settings.ASYNC_VIEWS else RegisterView
+login_view = AsyncLoginView if settings.ASYNC_VIEWS else LoginView
+refresh_view = AsyncTokenRefreshView if settings.ASYNC_VIEWS else TokenRefreshView
 
 urlpatterns = [
-    path('register/', RegisterView.as_view(), name='register'),
-    path('login/', LoginView.as_view(), name='login'),
-    # Note: refresh is just an alias for login token right now for simplicity 
-    # since we are manually handling JWTs via PyMongo
-    path('refresh/', LoginView.as_view(), name='token_refresh'), 
+    path('register/', register_view.as_view(), name='register'),
+    path('login/', login_view.as_view(), name='login'),
+    path('refresh/', refresh_view.as_view(), name='token_refresh'),
+    path('logout/', LogoutView.as_view(), name='logout'),
     path('me/', UserProfileView.as_view(), name='user_profile'),
 ]
@@ -2,20 +2,25 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
-from django.conf import settings
-import jwt
-import datetime
+from pymongo.errors import DuplicateKeyError
 
 from .models import UserModel
+from .hashing import HashingPoolSaturated
+from .tokens import InvalidRefreshToken, generate_tokens, rotate, revoke
 
-def generate_tokens(user_id):
-    access_payload = {
-        'user_id': str(user_id),
-        'exp': datetime.datetime.utcnow() + datetime.timedelta(days=1),
-        'iat': datetime.datetime.utcnow()
+# Returned with 503 + Retry-After when the password hashing pool is full
+HASHING_BUSY = {'error': 'Too many sign-in requests right now, please try again shortly.'}
+
+def serialize_user(user):
+    return {
+        'id': str(user['_id']),
+        'email': user['email'],
+        'name': user['name'],
+        'role': user['role']
     }
-    access_token = jwt.encode(access_payload, settings.SECRET_KEY, algorithm='HS256')
-    return {'access': access_token, 'refresh': access_token} # Simplified for manual PyMongo implementation
+
+def hashing_busy_response():
+    return Response(HASHING_BUSY, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'})
 
 class RegisterView(APIView):
     permission_classes = [AllowAny]
@@ -29,19 +34,26 @@ class RegisterView(APIView):
         if not email or not name or not password:
             return Response({'error': 'Please provide email, name, and password.'}, status=status.HTTP_400_BAD_REQUEST)
             
-        if UserModel.get_by_email(email):
+        existing = UserModel.get_by_email(email)
+        if existing and not UserModel.is_claimable(existing):
             return Response({'error': 'User with this email already exists.'}, status=status.HTTP_400_BAD_REQUEST)
             
-        user = UserModel.create_user(email=email, name=name, password=password, role=role)
-        tokens = generate_tokens(user['_id'])
+        try:
+            if existing:
+                # Imported from a roster without a password; signing up claims it
+                user = UserModel.claim_user(existing, name=name, password=password, role=role)
+                if user is None:
+                    return Response({'error': 'User with this email already exists.'}, status=status.HTTP_400_BAD_REQUEST)
+            else:
+                user = UserModel.create_user(email=email, name=name, password=password, role=role)
+        except HashingPoolSaturated:
+            return hashing_busy_response()
+        except DuplicateKeyError:
+            return Response({'error': 'User with this email already exists.'}, status=status.HTTP_400_BAD_REQUEST)
+        tokens = generate_tokens(user)
         
         return Response({
-            'user': {
-                'id': str(user['_id']),
-                'email': user['email'],
-                'name': user['name'],
-                'role': user['role']
-            },
+            'user': serialize_user(user),
             'tokens': tokens
         }, status=status.HTTP_201_CREATED)
 
@@ -53,12 +65,39 @@ class LoginView(APIView):
         password = request.data.get('password')
         
         user = UserModel.get_by_email(email)
-        if not user or not UserModel.check_password(password, user['password']):
+        try:
+            valid = bool(user) and UserModel.verify_password(user, password)
+        except HashingPoolSaturated:
+            return hashing_busy_response()
+        if not valid:
             return Response({'detail': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
             
-        tokens = generate_tokens(user['_id'])
+        tokens = generate_tokens(user)
+        return Response(tokens, status=status.HTTP_200_OK)
+
+class TokenRefreshView(APIView):
+    permission_classes = [AllowAny]
+    # The access token is usually expired by now; only the refresh token counts
+    authentication_classes = []
+
+    def post(self, request):
+        try:
+            tokens = rotate(request.data.get('refresh'))
+        except InvalidRefreshToken:
+            return Response({'detail': 'Invalid or expired refresh token'}, status=status.HTTP_401_UNAUTHORIZED)
         return Response(tokens, status=status.HTTP_200_OK)
 
+class LogoutView(APIView):
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def post(self, request):
+        try:
+            revoke(request.data.get('refresh'))
+        except InvalidRefreshToken:
+            pass
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 class UserProfileView(APIView):
     # We will need to set our custom auth class in settings or view
     def get(self, request):
@@ -18,6 +18,20 @@ api.interceptors.request.use(
     (error) => Promise.reject(error)
 );
 
+// Refresh tokens are single use, so requests failing together share one refresh
+let refreshing = null;
+
+const refreshTokens = async () => {
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (!refreshToken) {
+        throw new Error('No refresh token available');
+    }
+    const res = await axios.post(`${baseURL}/auth/refresh/`, { refresh: refreshToken });
+    localStorage.setItem('access_token', res.data.access);
+    localStorage.setItem('refresh_token', res.data.refresh);
+    return res.data.access;
+};
+
 // Response Interceptor: refresh token if 401
 api.interceptors.response.use(
     (response) => response,
@@ -28,15 +42,10 @@ api.interceptors.response.use(
         if (error.response?.status === 401 && !originalRequest._retry && !originalRequest.url.includes('/auth/')) {
             originalRequest._retry = true;
             try {
-                const refreshToken = localStorage.getItem('refresh_token');
-                if (!refreshToken) {
-                    throw new Error('No refresh token available');
-                }
-
-                const res = await axios.post(`${baseURL}/auth/refresh/`, { refresh: refreshToken });
-                localStorage.setItem('access_token', res.data.access);
+                refreshing = refreshing || refreshTokens().finally(() => { refreshing = null; });
+                const access = await refreshing;
 
-                originalRequest.headers['Authorization'] = `Bearer ${res.data.access}`;
+                originalRequest.headers['Authorization'] = `Bearer ${access}`;
                 return api(originalRequest);
 
             } catch (refreshError) {
@@ -12,25 +12,45 @@ const Navbar = () => {
     const [unreadCount, setUnreadCount] = useState(0);
     const navigate = useNavigate();
     const ws = useRef(null);
+    const lastSeenId = useRef(null);
 
     useEffect(() => {
         if (user) {
             fetchNotifications();
 
-            // Setup WebSocket
-            const wsUrl = `ws://localhost:8000/ws/notifications/?user_id=${user.id}`;
-            ws.current = new WebSocket(wsUrl);
-
-            ws.current.onmessage = (event) => {
-                const newNotif = JSON.parse(event.data);
-                setNotifications(prev => [
-                    { ...newNotif, id: Date.now(), is_read: false, created_at: new Date().toISOString() },
-                    ...prev
-                ]);
-                setUnreadCount(prev => prev + 1);
+            // Setup WebSocket; reconnects resume from the last notification seen
+            let closed = false;
+            let retry = null;
+            const connect = () => {
+                const since = lastSeenId.current ? `&since=${lastSeenId.current}` : '';
+                // Read on every (re)connect so a refreshed access token is picked up
+                const token = localStorage.getItem('access_token');
+                const wsUrl = `ws://localhost:8000/ws/notifications/?token=${token}${since}`;
+                ws.current = new WebSocket(wsUrl);
+
+                ws.current.onmessage = (event) => {
+                    const frame = JSON.parse(event.data);
+                    // Server could not keep up with this client; resync over REST
+                    if (frame.summary || frame.truncated || frame.dropped) {
+                        fetchNotifications();
+                        return;
+                    }
+                    const incoming = frame.batch || [frame];
+                    if (incoming.length === 0) return;
+                    lastSeenId.current = incoming[incoming.length - 1].id;
+                    setNotifications(prev => [...incoming.slice().reverse(), ...prev]);
+                    setUnreadCount(prev => prev + incoming.filter(n => !n.is_read).length);
+                };
+
+                ws.current.onclose = () => {
+                    if (!closed) retry = setTimeout(connect, 3000);
+                };
             };
+            connect();
 
             return () => {
+                closed = true;
+                clearTimeout(retry);
                 if (ws.current) ws.current.close();
             };
         }
@@ -38,9 +58,14 @@ const Navbar = () => {
 
     const fetchNotifications = async () => {
         try {
-            const res = await api.get('/notifications/');
-            setNotifications(res.data);
-            setUnreadCount(res.data.filter(n => !n.is_read).length);
+            // The dropdown shows the latest few; the badge comes from the stored counter
+            const [res, countRes] = await Promise.all([
+                api.get('/notifications/?limit=5'),
+                api.get('/notifications/unread-count/')
+            ]);
+            setNotifications(res.data.results);
+            setUnreadCount(countRes.data.unread);
+            if (res.data.results.length > 0) lastSeenId.current = res.data.results[0].id;
         } catch (error) {
             console.error('Failed to fetch notifications', error);
         }
@@ -58,6 +58,11 @@ export const AuthProvider = ({ children }) => {
     };
 
     const logout = () => {
+        const refresh = localStorage.getItem('refresh_token');
+        if (refresh) {
+            // Revoke server side too; the local tokens are dropped either way
+            api.post('/auth/logout/', { refresh }).catch(() => {});
+        }
         localStorage.removeItem('access_token');
         localStorage.removeItem('refresh_token');
         setUser(null);
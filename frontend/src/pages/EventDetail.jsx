@@ -34,8 +34,8 @@ const EventDetail = () => {
 
     const checkRegistration = async () => {
         try {
-            const res = await api.get('/registrations/my/');
-            const registered = res.data.some(reg => reg.event_details.id === parseInt(id));
+            const res = await api.get('/registrations/my/?limit=100');
+            const registered = res.data.results.some(reg => reg.event_details.id === parseInt(id));
             setIsRegistered(registered);
         } catch (error) {
             console.error(error);
@@ -17,10 +17,11 @@ const EventsList = () => {
             if (search) params.append('search', search);
             if (category) params.append('category', category);
             if (status) params.append('status', status);
+            // Soonest first from the starts_at index instead of newest created
+            if (status === 'upcoming') params.append('upcoming', 'true');
 
             const res = await api.get(`/events/?${params.toString()}`);
-            // Assuming DRF pagination returns { results: [...] }
-            setEvents(res.data.results || res.data);
+            setEvents(res.data.results);
         } catch (error) {
             console.error('Failed to fetch events', error);
         } finally {
@@ -14,8 +14,8 @@ const MyRegistrations = () => {
 
     const fetchMyRegistrations = async () => {
         try {
-            const res = await api.get('/registrations/my/');
-            setRegistrations(res.data);
+            const res = await api.get('/registrations/my/?limit=100');
+            setRegistrations(res.data.results);
         } catch (error) {
             console.error(error);
         } finally {
@@ -5,6 +5,7 @@ import toast from 'react-hot-toast';
 
 const Notifications = () => {
     const [notifications, setNotifications] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [loading, setLoading] = useState(true);
 
     useEffect(() => {
@@ -13,8 +14,9 @@ const Notifications = () => {
 
     const fetchNotifications = async () => {
         try {
-            const res = await api.get('/notifications/');
-            setNotifications(res.data);
+            const res = await api.get('/notifications/?limit=50');
+            setNotifications(res.data.results);
+            setNextCursor(res.data.next);
         } catch (error) {
             console.error(error);
         } finally {
@@ -22,6 +24,16 @@ const Notifications = () => {
         }
     };
 
+    const loadMore = async () => {
+        try {
+            const res = await api.get(`/notifications/?limit=50&cursor=${nextCursor}`);
+            setNotifications(prev => [...prev, ...res.data.results]);
+            setNextCursor(res.data.next);
+        } catch (error) {
+            console.error(error);
+        }
+    };
+
     const markAsRead = async (id) => {
         try {
             await api.put(`/notifications/${id}/read/`);
@@ -94,6 +106,11 @@ const Notifications = () => {
                     ))
                 )}
             </div>
+            {nextCursor && (
+                <div className="text-center mt-6">
+                    <button onClick={loadMore} className="btn-secondary text-xs py-1.5 px-3">Load older</button>
+                </div>
+            )}
         </div>
     );
 };
@@ -3,7 +3,7 @@ import { Link } from 'react-router-dom';
 import api from '../../api/axios';
 import { AuthContext } from '../../context/AuthContext';
 import { BarChart, Bar, XAxis, YAxis, Tooltip, ResponsiveContainer, CartesianGrid } from 'recharts';
-import { FiPlus, FiUsers, FiCalendar, FiActivity, FiEdit, FiTrash2, FiSend } from 'react-icons/fi';
+import { FiPlus, FiUsers, FiCalendar, FiActivity, FiEdit, FiTrash2, FiSend, FiDownload, FiShuffle } from 'react-icons/fi';
 import toast from 'react-hot-toast';
 
 const OrganizerDashboard = () => {
@@ -26,22 +26,19 @@ const OrganizerDashboard = () => {
 
     const fetchOrganizerData = async () => {
         try {
-            const res = await api.get('/events/my-events/');
-            const myEvents = res.data;
+            const res = await api.get('/events/my-events/?limit=100');
+            const myEvents = res.data.results;
             setEvents(myEvents);
 
-            let totReg = 0;
-            let cData = [];
-
-            const topEvents = myEvents.slice(0, 5);
-            for (const ev of topEvents) {
-                try {
-                    const pRes = await api.get(`/registrations/event/${ev.id}/`);
-                    const count = pRes.data.length;
-                    totReg += count;
-                    cData.push({ name: ev.title.substring(0, 10) + '...', registrations: count });
-                } catch (e) { }
-            }
+            // One request for the cached counters of every listed event
+            const sRes = await api.get('/events/stats/', { params: { ids: myEvents.map(ev => ev.id).join(',') } });
+            const counts = Object.fromEntries(sRes.data.results.map(st => [st.event, st]));
+
+            const totReg = sRes.data.results.reduce((sum, st) => sum + st.registrations, 0);
+            const cData = myEvents.slice(0, 5).map(ev => ({
+                name: ev.title.substring(0, 10) + '...',
+                registrations: counts[ev.id]?.registrations || 0,
+            }));
 
             setStats({
                 totalEvents: myEvents.length,
@@ -86,6 +83,30 @@ const OrganizerDashboard = () => {
         }
     };
 
+    const handleMatchmake = async (event) => {
+        if (!window.confirm(`Put every participant of "${event.title}" without a team into a team?`)) return;
+        try {
+            const res = await api.post(`/teams/event/${event.id}/matchmake/`, { team_size: 4 });
+            toast.success(`Assigned ${res.data.assigned} participants (${res.data.teams_created} new teams)`);
+        } catch (error) {
+            toast.error(error.response?.data?.error || 'Matchmaking failed');
+        }
+    };
+
+    const handleExport = async (event) => {
+        try {
+            const res = await api.get(`/registrations/event/${event.id}/?output=csv`, { responseType: 'blob' });
+            const url = URL.createObjectURL(res.data);
+            const link = document.createElement('a');
+            link.href = url;
+            link.download = `participants-${event.id}.csv`;
+            link.click();
+            URL.revokeObjectURL(url);
+        } catch (error) {
+            toast.error('Failed to export participants');
+        }
+    };
+
     if (loading) return <div className="text-center p-20"><div className="animate-spin rounded-full h-8 w-8 border-b-2 border-white mx-auto"></div></div>;
 
     return (
@@ -181,6 +202,12 @@ const OrganizerDashboard = () => {
                                     >
                                         <FiSend size={14} />
                                     </button>
+                                    <button onClick={() => handleMatchmake(event)} className="text-[#666] hover:text-white p-1.5 rounded transition" title="Auto-assign Teams">
+                                        <FiShuffle size={14} />
+                                    </button>
+                                    <button onClick={() => handleExport(event)} className="text-[#666] hover:text-white p-1.5 rounded transition" title="Export Participants (CSV)">
+                                        <FiDownload size={14} />
+                                    </button>
                                     <button onClick={() => handleDelete(event.id)} className="text-[#666] hover:text-red-500 p-1.5 rounded ml-auto transition" title="Delete">
                                         <FiTrash2 size={14} />
                                     </button>
@@ -14,8 +14,8 @@ const OrganizerEventsList = () => {
 
     const fetchEvents = async () => {
         try {
-            const res = await api.get('/events/my-events/');
-            setEvents(res.data);
+            const res = await api.get('/events/my-events/?limit=100');
+            setEvents(res.data.results);
         } catch (error) {
             toast.error('Failed to load events');
         } finally {
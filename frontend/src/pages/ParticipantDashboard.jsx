@@ -19,11 +19,11 @@ const ParticipantDashboard = () => {
         setLoading(true);
         try {
             const [regRes, notifRes] = await Promise.all([
-                api.get('/registrations/my/'),
-                api.get('/notifications/')
+                api.get('/registrations/my/?limit=100'),
+                api.get('/notifications/?limit=5')
             ]);
-            setRegistrations(regRes.data);
-            setNotifications(notifRes.data.slice(0, 5)); // Just show recent 5
+            setRegistrations(regRes.data.results);
+            setNotifications(notifRes.data.results); // Just show recent 5
         } catch (error) {
             console.error(error);
         } finally {
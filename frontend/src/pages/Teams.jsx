@@ -11,6 +11,7 @@ const Teams = () => {
     const [teams, setTeams] = useState([]);
     const [myTeam, setMyTeam] = useState(null);
     const [loading, setLoading] = useState(true);
+    const [openOnly, setOpenOnly] = useState(false);
 
     const [showCreateModal, setShowCreateModal] = useState(false);
     const [newTeamName, setNewTeamName] = useState('');
@@ -19,12 +20,12 @@ const Teams = () => {
     useEffect(() => {
         fetchTeams();
         if (user) fetchMyTeam();
-    }, [id, user]);
+    }, [id, user, openOnly]);
 
     const fetchTeams = async () => {
         try {
-            const res = await api.get(`/teams/event/${id}/`);
-            setTeams(res.data);
+            const res = await api.get(`/teams/event/${id}/?limit=100${openOnly ? '&open=true' : ''}`);
+            setTeams(res.data.results);
         } catch (error) {
             console.error(error);
         } finally {
@@ -144,7 +145,13 @@ const Teams = () => {
             )}
 
             <div>
-                <h2 className="text-[15px] font-medium mb-6 text-white pb-3 border-b border-[#2e2e2e]">All Teams ({teams.length})</h2>
+                <div className="flex justify-between items-center mb-6 pb-3 border-b border-[#2e2e2e]">
+                    <h2 className="text-[15px] font-medium text-white">{openOnly ? 'Open Teams' : 'All Teams'} ({teams.length})</h2>
+                    <label className="flex items-center text-xs text-[#a1a1a1] cursor-pointer">
+                        <input type="checkbox" className="mr-2" checked={openOnly} onChange={(e) => setOpenOnly(e.target.checked)} />
+                        Only teams with open slots
+                    </label>
+                </div>
                 <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
                     {teams.map(team => (
                         <div key={team.id} className="card p-6 flex flex-col h-full hover:border-[#444] transition-colors">